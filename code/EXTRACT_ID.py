@@ -2,6 +2,12 @@ import os
 import re
 import csv
 from datetime import datetime
+from functools import lru_cache
+
+from lookup_tables import load_table
+from delta_outputs import write_changes
+from checkpoint import atomic_output
+from employee_resolver import EmployeeResolver, load_aliases, save_aliases
 
 # ----------------------------------------------------
 #  PATHS
@@ -10,16 +16,24 @@ INPUT_TXT = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process\pdf_to_text.txt"
 OUTPUT_CSV = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process\bill_id.csv"
 MISSING_NAMES = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process\missing_name.txt"
 EMPLOYEE_TABLE = r"D:\TABLE FINAL\Employee.csv"
+# learned + hand-added spellings of server names (see employee_resolver.py)
+ALIAS_CSV = r"D:\TABLE FINAL\employee_alias.csv"
+
+BILL_ID_FIELDS = ["bill_id", "employee_id", "table_id", "date", "time", "is_redistribuee"]
+
+# Also write <output>_changes.csv (insert/update/delete vs previous run)
+DELTA_MODE = False
 
 # ----------------------------------------------------
 #  LOAD EMPLOYEE TABLE (name → employee_id)
 # ----------------------------------------------------
-employee_map = {}
+def employee_key(name):
+    return name.strip().upper()
 
-with open(EMPLOYEE_TABLE, "r", encoding="utf-8-sig") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        employee_map[row["name"].strip().upper()] = row["employee_id"]
+
+@lru_cache(maxsize=None)
+def load_employee_map(path=EMPLOYEE_TABLE):
+    return load_table(path, "name", "employee_id", employee_key).normalized
 
 # ----------------------------------------------------
 #  PATTERNS
@@ -30,106 +44,136 @@ bill_id_pattern = re.compile(r"(\d{5})\s*\(\d{5}\)")
 table_pattern = re.compile(r"Table#(\d+)", re.IGNORECASE)
 
 # ----------------------------------------------------
-#  READ INPUT TXT
+#  PROCESS LINES
 # ----------------------------------------------------
-with open(INPUT_TXT, "r", encoding="utf-8") as f:
-    lines = [line.strip() for line in f]
+def extract_bill_headers(lines, employee_map, resolver=None):
+    """Return (records, missing_server_names) for the stripped text lines."""
+    if resolver is None:
+        resolver = EmployeeResolver(employee_map)
 
-records = []
-missing_server_names = []
+    records = []
+    missing_server_names = []
 
-# ----------------------------------------------------
-#  PROCESS LINES
-# ----------------------------------------------------
-for i, line in enumerate(lines):
+    for i, line in enumerate(lines):
+        # ----------- FIND DATE LINE -----------
+        if date_pattern.match(line):
 
-    # ----------- FIND DATE LINE -----------
-    if date_pattern.match(line):
+            raw_dt = line.strip()
+            parts = raw_dt.split()
 
-        raw_dt = line.strip()
-        parts = raw_dt.split()
+            date_part = parts[0]
+            time_part = parts[1]
 
-        date_part = parts[0]
-        time_part = parts[1]
+            # zero-pad hour
+            hour = time_part.split(":")[0]
+            if len(hour) == 1:
+                time_part = "0" + time_part
 
-        # zero-pad hour
-        hour = time_part.split(":")[0]
-        if len(hour) == 1:
-            time_part = "0" + time_part
+            # convert to datetime
+            dt = datetime.strptime(f"{date_part} {time_part}", "%d/%m/%y %H:%M")
 
-        # convert to datetime
-        dt = datetime.strptime(f"{date_part} {time_part}", "%d/%m/%y %H:%M")
+            sql_date = dt.strftime("%Y-%m-%d")
+            sql_time = dt.strftime("%H:%M:%S")
 
-        sql_date = dt.strftime("%Y-%m-%d")
-        sql_time = dt.strftime("%H:%M:%S")
+            # ----------- SERVER NAME ABOVE DATE -----------
+            employee_id = None
 
-        # ----------- SERVER NAME ABOVE DATE -----------
-        employee_id = None
+            if i > 0 and server_pattern.match(lines[i - 1]):
+                raw_server = lines[i - 1].split(".", 1)[1].strip().upper()
 
-        if i > 0 and server_pattern.match(lines[i - 1]):
-            raw_server = lines[i - 1].split(".", 1)[1].strip().upper()
+                employee_id = resolver.resolve(raw_server)
+                if employee_id is None:
+                    missing_server_names.append(raw_server)
 
-            if raw_server in employee_map:
-                employee_id = employee_map[raw_server]
-            else:
-                missing_server_names.append(raw_server)
+            # ----------- FIND BILL ID + TABLE ID + REDISTRIBUTION -----------
+            bill_id = None
+            table_id = 0
+            is_redistribuee = False
 
-        # ----------- FIND BILL ID + TABLE ID + REDISTRIBUTION -----------
-        bill_id = None
-        table_id = 0
-        is_redistribuee = False
+            for j in range(i + 1, min(i + 6, len(lines))):
+                line_check = lines[j]
 
-        for j in range(i + 1, min(i + 6, len(lines))):
-            line_check = lines[j]
+                # look for bill id
+                match = bill_id_pattern.search(line_check)
+                if match:
+                    bill_id = match.group(1)
 
-            # look for bill id
-            match = bill_id_pattern.search(line_check)
-            if match:
-                bill_id = match.group(1)
+                    # table id
+                    tmatch = table_pattern.search(line_check)
+                    if tmatch:
+                        table_id = int(tmatch.group(1))
 
-                # table id
-                tmatch = table_pattern.search(line_check)
-                if tmatch:
-                    table_id = int(tmatch.group(1))
+                    # check if next line is Redistribuée
+                    if j + 1 < len(lines) and lines[j + 1].strip().upper() == "REDISTRIBUÉE":
+                        is_redistribuee = True
+                    else:
+                        is_redistribuee = False
 
-                # check if next line is Redistribuée
-                if j + 1 < len(lines) and lines[j + 1].strip().upper() == "REDISTRIBUÉE":
-                    is_redistribuee = True
-                else:
-                    is_redistribuee = False
+                    break
 
-                break
+            # ----------- SAVE ROW -----------
+            if bill_id:
+                records.append({
+                    "bill_id": bill_id,
+                    "employee_id": employee_id,
+                    "table_id": table_id,
+                    "date": sql_date,
+                    "time": sql_time,
+                    "is_redistribuee": is_redistribuee
+                })
 
-        # ----------- SAVE ROW -----------
-        if bill_id:
-            records.append({
-                "bill_id": bill_id,
-                "employee_id": employee_id,
-                "table_id": table_id,
-                "date": sql_date,
-                "time": sql_time,
-                "is_redistribuee": is_redistribuee
-            })
+    return records, missing_server_names
 
 # ----------------------------------------------------
-#  WRITE CSV
+#  WRITE OUTPUTS
 # ----------------------------------------------------
-with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
-    writer = csv.DictWriter(
-        f,
-        fieldnames=["bill_id", "employee_id", "table_id", "date", "time", "is_redistribuee"]
-    )
-    writer.writeheader()
-    writer.writerows(records)
+def write_bill_id_csv(records, path=OUTPUT_CSV):
+    if DELTA_MODE:
+        write_changes(path, records, BILL_ID_FIELDS, ["bill_id"])
 
-# ----------------------------------------------------
-#  WRITE missing_name.txt
-# ----------------------------------------------------
-if missing_server_names:
-    with open(MISSING_NAMES, "w", encoding="utf-8") as f:
-        for name in sorted(set(missing_server_names)):
-            f.write(name + "\n")
-
-print("Processing complete.")
-print(f"CSV saved → {OUTPUT_CSV}")
-print(f"Missing names saved → {MISSING_NAMES}")
+    with atomic_output(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=BILL_ID_FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def write_missing_names(missing_server_names, path=MISSING_NAMES):
+    if missing_server_names:
+        with open(path, "w", encoding="utf-8") as f:
+            for name in sorted(set(missing_server_names)):
+                f.write(name + "\n")
+
+
+def write_learned_aliases(learned, path=ALIAS_CSV):
+    # keep existing rows (incl. hand-added and confirmed ones), add this run's suggestions
+    if learned:
+        aliases = load_aliases(path)
+        for name, entry in learned.items():
+            aliases.setdefault(name, entry)
+        save_aliases(path, aliases)
+
+
+def main():
+    employee_map = load_employee_map(EMPLOYEE_TABLE)
+    resolver = EmployeeResolver(employee_map, load_aliases(ALIAS_CSV))
+
+    # ----------------------------------------------------
+    #  READ INPUT TXT
+    # ----------------------------------------------------
+    with open(INPUT_TXT, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+
+    records, missing_server_names = extract_bill_headers(lines, employee_map, resolver)
+
+    write_bill_id_csv(records, OUTPUT_CSV)
+    write_missing_names(missing_server_names, MISSING_NAMES)
+    write_learned_aliases(resolver.learned, ALIAS_CSV)
+
+    print("Processing complete.")
+    print(f"CSV saved → {OUTPUT_CSV}")
+    print(f"Missing names saved → {MISSING_NAMES}")
+    print(f"Server names: {resolver.summary()} ({len(resolver.learned)} aliases to confirm → {ALIAS_CSV})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import os
 import re
-import pdfplumber
-import pandas as pd
+import csv
 import unicodedata
 
+from lookup_tables import load_table
+
 # ---------------- CONFIG ----------------
 SCRIPT_DIR = r"D:\Get_price"
 INPUT_FOLDER = SCRIPT_DIR
@@ -41,24 +42,23 @@ def load_item_table():
     if not os.path.exists(ITEM_ID_FILE):
         raise FileNotFoundError("item_id.csv not found in D:\\Get_price")
 
-    df = pd.read_csv(ITEM_ID_FILE)
-
-    # Add price column if missing
-    if "price" not in df.columns:
-        df["price"] = None
+    table = load_table(ITEM_ID_FILE, "name", "item_id", normalize)
 
-    # Build lookup dictionary (normalized name → row index)
-    lookup = {}
-    for idx, row in df.iterrows():
-        if isinstance(row["name"], str):
-            lookup[normalize(row["name"])] = idx
+    # Editable copy of the rows; add price column if missing
+    fieldnames = list(table.fieldnames)
+    if "price" not in fieldnames:
+        fieldnames.append("price")
+    rows = [dict(row) for row in table.rows]
 
-    return df, lookup
+    # Lookup dictionary (normalized name → row index)
+    return fieldnames, rows, table.positions
 
 # ---------- Extract from PDF ----------
 
 def extract_prices_from_pdf(pdf_path):
     """Return a list of (item_name, unit_price)."""
+    import pdfplumber
+
     with pdfplumber.open(pdf_path) as pdf:
         text = ""
         for page in pdf.pages:
@@ -95,7 +95,7 @@ def extract_prices_from_pdf(pdf_path):
 # ---------- MAIN ----------
 
 def main():
-    df, lookup = load_item_table()
+    fieldnames, rows, lookup = load_item_table()
 
     print("Scanning PDFs in:", INPUT_FOLDER)
     pdf_files = [f for f in os.listdir(INPUT_FOLDER) if f.lower().endswith(".pdf")]
@@ -120,17 +120,20 @@ def main():
             row = lookup[clean_name]
 
             # DO NOT OVERWRITE EXISTING PRICES
-            existing_price = df.at[row, "price"]
-            if pd.notna(existing_price):
+            existing_price = rows[row].get("price")
+            if existing_price not in (None, ""):
                 print(f" → SKIPPED {item_name}: price already exists ({existing_price})")
                 continue
 
             # Update price only if empty
-            df.at[row, "price"] = price
+            rows[row]["price"] = price
             print(f" → Added price for {item_name}: {price}")
 
     # Save updated CSV
-    df.to_csv(ITEM_ID_FILE, index=False, encoding="utf-8-sig")
+    with open(ITEM_ID_FILE, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
     print("\n✅ item_id.csv updated successfully (no overwriting).")
 
 if __name__ == "__main__":
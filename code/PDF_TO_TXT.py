@@ -1,6 +1,8 @@
 import os
 import re
-from PyPDF2 import PdfReader
+
+from checkpoint import PageCheckpoint, atomic_output
+from bill_index import build_index
 
 # --------------------------------------------------------
 # PATHS
@@ -10,60 +12,131 @@ input_folder = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Input"
 output_folder = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process"
 output_file = os.path.join(output_folder, "pdf_to_text.txt")
 
+# pages per committed chunk (a rerun after a crash resumes from the last chunk)
+CHUNK_PAGES = 100
+
+bill_id_pattern = re.compile(r"(\d{5})\s*\(\d{5}\)")
+
+# venue name printed at the top of every receipt page (one per venue shard)
+VENUE_HEADERS = ("AUBERGE LE CAMP DE BASE",)
+
 # --------------------------------------------------------
 # FIND THE PDF FILE (only one expected in the folder)
 # --------------------------------------------------------
 
-pdf_files = [f for f in os.listdir(input_folder) if f.lower().endswith(".pdf")]
+def find_pdf(folder=input_folder):
+    pdf_files = [f for f in os.listdir(folder) if f.lower().endswith(".pdf")]
 
-if not pdf_files:
-    raise FileNotFoundError("No PDF file found in the Input folder.")
+    if not pdf_files:
+        raise FileNotFoundError("No PDF file found in the Input folder.")
 
-pdf_path = os.path.join(input_folder, pdf_files[0])
+    return os.path.join(folder, pdf_files[0])
 
 # --------------------------------------------------------
 # EXTRACT TEXT FROM PDF
 # --------------------------------------------------------
 
-reader = PdfReader(pdf_path)
-all_text = ""
+def extract_text(pdf_path):
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(pdf_path)
+    all_text = ""
+
+    for page in reader.pages:
+        all_text += page.extract_text() + "\n"
 
-for page in reader.pages:
-    all_text += page.extract_text() + "\n"
+    return all_text
 
 # --------------------------------------------------------
 # CLEAN LINES
 # --------------------------------------------------------
 
-cleaned_lines = []
-for line in all_text.splitlines():
+def clean_lines(all_text):
+    cleaned_lines = []
+    for line in all_text.splitlines():
 
-    # Remove blank lines
-    if not line.strip():
-        continue
+        # Remove blank lines
+        if not line.strip():
+            continue
 
-    # 1. Remove date/time + PAGE header
-    #    Example: "1/12/25 19:41 ... PAGE 1"
-    if re.match(r"^\d{1,2}/\d{1,2}/\d{2}.*PAGE\s+\d+", line):
-        continue
+        # 1. Remove date/time + PAGE header
+        #    Example: "1/12/25 19:41 ... PAGE 1"
+        if re.match(r"^\d{1,2}/\d{1,2}/\d{2}.*PAGE\s+\d+", line):
+            continue
 
-    # 2. Remove "AUBERGE LE CAMP DE BASE"
-    if line.strip() == "AUBERGE LE CAMP DE BASE":
-        continue
+        # 2. Remove the venue name ("AUBERGE LE CAMP DE BASE")
+        if line.strip() in VENUE_HEADERS:
+            continue
 
-    # 3. Remove "Veloce X.XX.XX"
-    if line.strip().startswith("Veloce"):
-        continue
+        # 3. Remove "Veloce X.XX.XX"
+        if line.strip().startswith("Veloce"):
+            continue
 
-    # Otherwise keep the line (in same order)
-    cleaned_lines.append(line.strip())
+        # Otherwise keep the line (in same order)
+        cleaned_lines.append(line.strip())
+
+    return cleaned_lines
 
 # --------------------------------------------------------
 # WRITE TO OUTPUT TXT
 # --------------------------------------------------------
 
-with open(output_file, "w", encoding="utf-8") as f:
-    for line in cleaned_lines:
-        f.write(line + "\n")
+def write_lines(cleaned_lines, path=output_file):
+    with atomic_output(path, "w", encoding="utf-8") as f:
+        for line in cleaned_lines:
+            f.write(line + "\n")
+
+# --------------------------------------------------------
+# CHECKPOINTED RUN
+# Every page's text ends with "\n", so cleaning page by page
+# gives exactly the lines of the whole text (and the page of
+# every line, used by the bill index).
+# --------------------------------------------------------
+
+def last_bill_id(lines):
+    for line in reversed(lines):
+        m = bill_id_pattern.search(line)
+        if m:
+            return m.group(1)
+    return None
+
+
+def convert_with_checkpoints(pdf_path, path=output_file, chunk_pages=CHUNK_PAGES):
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(pdf_path)
+    total = len(reader.pages)
+
+    ckpt = PageCheckpoint(path, pdf_path)
+    state = ckpt.resume()
+    if state["pages_done"]:
+        print(f"Resuming at page {state['pages_done'] + 1}/{total} "
+              f"(last bill {state['last_bill_id']})")
+
+    for start in range(state["pages_done"], total, chunk_pages):
+        end = min(start + chunk_pages, total)
+        lines, page_lines = [], []
+        for p in range(start, end):
+            page = clean_lines(reader.pages[p].extract_text() + "\n")
+            lines.extend(page)
+            page_lines.append(len(page))
+        ckpt.commit(lines, end, last_bill_id(lines), page_lines)
+        print(f"  pages {end}/{total}")
+
+    ckpt.finish()
+    return ckpt.state
+
+
+def main():
+    pdf_path = find_pdf(input_folder)
+    state = convert_with_checkpoints(pdf_path, output_file, CHUNK_PAGES)
+    bills, duplicates = build_index(output_file, state["page_lines"])
+
+    print(f"Done! {state['lines']} lines cleaned text saved to:\n{output_file}")
+    print(f"Bill index: {bills} bills → {output_file}.idx / .zblk")
+    if duplicates:
+        print(f"  {len(duplicates)} repeated bill id(s) kept at first occurrence: {sorted(set(duplicates))[:10]}")
+
 
-print(f"Done! Cleaned text saved to:\n{output_file}")
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 import os
-import pdfplumber
 import re
-import pandas as pd
+import csv
+import itertools
 import unicodedata
 from datetime import datetime
+from functools import lru_cache
+
+from lookup_tables import load_table, parse_week_time
+from delta_outputs import write_changes
+
+# pandas / pdfplumber are imported where they are used, so importing
+# this module (or starting a worker process) stays cheap.
 
 # === CONFIGURATION ===
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -11,8 +18,10 @@ INPUT_FOLDER = SCRIPT_DIR                # PDFs in same folder
 OUTPUT_FOLDER = os.path.join(SCRIPT_DIR, "Output")
 ITEM_ID_FILE = os.path.join(SCRIPT_DIR, "item_id.csv")
 WEEK_ID_FILE = os.path.join(SCRIPT_DIR, "week_id_table.csv")  # UPDATED
+EMPLOYEE_FILE = os.path.join(SCRIPT_DIR, "Employee.csv")
 
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+# Also write <output>_changes.csv (insert/update/delete vs previous run)
+DELTA_MODE = False
 
 # Regex to capture date line like: 1/06/25 @ 4:00 -> 8/06/25 @ 3:59
 DATE_LINE_PATTERN = re.compile(
@@ -22,6 +31,10 @@ DATE_LINE_PATTERN = re.compile(
 # Regex for valid item lines
 LINE_PATTERN = re.compile(r"^\s*(.+?)\s+([\d\.]+)\s+\$[\d\.,]+", re.MULTILINE)
 
+# Numbered header inside "VENTES PAR ITEMS PAR EMPLOYES", no amount on the line:
+# an employee ("6.MARIE") or a category within that employee ("3.TAPAS")
+EMPLOYEE_LINE_PATTERN = re.compile(r"^\s*\d{1,3}\.\s*([A-Z][A-Z \-']*)$")
+
 # FIXED — Normalize STOP_TEXT to match normalized PDF text
 def normalize(text):
     if not isinstance(text, str):
@@ -44,31 +57,83 @@ BLACKLIST = {
 
 }
 
+# === LOOKUPS ===
+# Built on first use and cached per file path (not at import).
+
 # Load item ID table
-def load_item_id_table():
-    if not os.path.exists(ITEM_ID_FILE):
+@lru_cache(maxsize=None)
+def _read_item_id_table(path):
+    if not os.path.exists(path):
         print("WARNING: item_id.csv not found. No matching will be done.")
         return {}
 
-    df = pd.read_csv(ITEM_ID_FILE)
-    df["clean_name"] = df["name"].astype(str).apply(normalize)
+    return load_table(path, "name", "item_id", normalize, int).normalized
+
+def load_item_id_table():
+    return _read_item_id_table(ITEM_ID_FILE)
 
-    return dict(zip(df["clean_name"], df["item_id"]))
+# Load week_id lookup table: (week_start, week_end) -> week_id
+@lru_cache(maxsize=None)
+def _read_week_lookup(path):
+    if not os.path.exists(path):
+        print("ERROR: week_id_table.csv not found!")
+        return None
 
-ITEM_LOOKUP = load_item_id_table()
+    weeks = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            start = parse_week_time(row["week_start"])
+            end = parse_week_time(row["week_end"])
+            if start is None or end is None:
+                print(f"WARNING: {path} line {line_no}: unreadable week {row['week_start']!r} -> {row['week_end']!r}, skipped")
+                continue
+            weeks.setdefault((start, end), int(row["week_id"]))
+    return weeks
 
-# Load week_id lookup table
 def load_week_lookup():
-    if not os.path.exists(WEEK_ID_FILE):
+    return _read_week_lookup(WEEK_ID_FILE)
+
+# The week table itself, as before: DataFrame with datetime week_start / week_end
+@lru_cache(maxsize=None)
+def _read_week_table(path):
+    import pandas as pd
+
+    if not os.path.exists(path):
         print("ERROR: week_id_table.csv not found!")
         return None
 
-    df = pd.read_csv(WEEK_ID_FILE)
+    df = pd.read_csv(path)
     df["week_start"] = pd.to_datetime(df["week_start"])
     df["week_end"] = pd.to_datetime(df["week_end"])
     return df
 
-WEEK_TABLE = load_week_lookup()
+def load_week_table():
+    return _read_week_table(WEEK_ID_FILE)
+
+# Load employee lookup (same Employee.csv as the bill pipeline)
+@lru_cache(maxsize=None)
+def _read_employee_table(path):
+    if not os.path.exists(path):
+        print("WARNING: Employee.csv not found. No employee matching will be done.")
+        return {}
+
+    return load_table(path, "name", "employee_id", normalize, int).normalized
+
+def load_employee_table():
+    return _read_employee_table(EMPLOYEE_FILE)
+
+# ITEM_LOOKUP / WEEK_TABLE / EMPLOYEE_LOOKUP stay available as module
+# attributes, resolved lazily on first access.
+_LAZY_LOOKUPS = {
+    "ITEM_LOOKUP": load_item_id_table,
+    "WEEK_TABLE": load_week_table,
+    "EMPLOYEE_LOOKUP": load_employee_table,
+}
+
+def __getattr__(name):
+    if name in _LAZY_LOOKUPS:
+        return _LAZY_LOOKUPS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def detect_week_id(pdf_text):
     m = DATE_LINE_PATTERN.search(pdf_text)
@@ -81,37 +146,51 @@ def detect_week_id(pdf_text):
     start_dt = datetime.strptime(start_date_raw + " " + start_time_raw, "%d/%m/%y %H:%M")
     end_dt = datetime.strptime(end_date_raw + " " + end_time_raw, "%d/%m/%y %H:%M")
 
-    match = WEEK_TABLE[
-        (WEEK_TABLE["week_start"] == start_dt) &
-        (WEEK_TABLE["week_end"] == end_dt)
-    ]
+    week_id = load_week_lookup().get((start_dt, end_dt))
 
-    if match.empty:
+    if week_id is None:
         print(f"WARNING: No matching week_id found for range {start_dt} -> {end_dt}")
         return None
 
-    return int(match.iloc[0]["week_id"])
+    return week_id
+
+def iter_page_texts(pdf_path):
+    """Stream extract_text() of each page, one page at a time."""
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            yield page.extract_text() or ""
+
+def pages_before_section(pages):
+    """Pages up to and including the one where STOP_TEXT starts."""
+    for extracted in pages:
+        yield extracted
+        if STOP_TEXT in normalize(extracted):
+            return
 
-def extract_items_from_pdf(pdf_path):
+def extract_items_from_pdf(pdf_path, pages=None):
+    if pages is None:
+        pages = iter_page_texts(pdf_path)
+
+    item_lookup = load_item_id_table()
     text_raw = ""
     text_normalized = ""
     missing_items = []
 
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            extracted = page.extract_text()
-            if not extracted:
-                continue
+    for extracted in pages:
+        if not extracted:
+            continue
 
-            text_raw += extracted + "\n"
-            norm = normalize(extracted)
+        text_raw += extracted + "\n"
+        norm = normalize(extracted)
 
-            # FIX: STOP correctly when encountering the STOP_TEXT
-            if STOP_TEXT in norm:
-                text_normalized += norm[:norm.index(STOP_TEXT)]
-                break
-            else:
-                text_normalized += norm + "\n"
+        # FIX: STOP correctly when encountering the STOP_TEXT
+        if STOP_TEXT in norm:
+            text_normalized += norm[:norm.index(STOP_TEXT)]
+            break
+        else:
+            text_normalized += norm + "\n"
 
     week_id = detect_week_id(text_raw)
 
@@ -130,8 +209,8 @@ def extract_items_from_pdf(pdf_path):
         if re.match(r"^\d+\.\w+", item_name):
             continue
 
-        if clean_item in ITEM_LOOKUP:
-            item_output = ITEM_LOOKUP[clean_item]
+        if clean_item in item_lookup:
+            item_output = item_lookup[clean_item]
         else:
             if item_name not in missing_items:
                 missing_items.append(item_name)
@@ -141,7 +220,154 @@ def extract_items_from_pdf(pdf_path):
 
     return week_id, rows, missing_items
 
+def employee_section_lines(pages):
+    """Normalized, non-empty lines after STOP_TEXT, over all pages."""
+    in_section = False
+    for extracted in pages:
+        if not extracted:
+            continue
+
+        norm = normalize(extracted)
+
+        if not in_section:
+            if STOP_TEXT not in norm:
+                continue
+            in_section = True
+            norm = norm[norm.index(STOP_TEXT) + len(STOP_TEXT):]
+
+        for line in norm.splitlines():
+            line = line.strip()
+            if line:
+                yield line
+
+def is_employee_header(name, next_line, first, employee_lookup):
+    """
+    Employee or category header? A name in Employee.csv is an employee.
+    An unknown name opens an employee block only as the first header of
+    the section or when another header follows it directly (an employee
+    is followed by its first category, a category by its items).
+    next_line is the following section line, None at the end.
+    """
+    if name in employee_lookup:
+        return True
+    if first:
+        return True
+    return next_line is not None and EMPLOYEE_LINE_PATTERN.match(next_line) is not None
+
+def read_week_header(pages):
+    """(pages, week_id): week from the first page with a date range, pages unchanged."""
+    pages = iter(pages)
+    seen = []
+    for extracted in pages:
+        seen.append(extracted)
+        # the range is in the report header, so this stops on page 1
+        if extracted and DATE_LINE_PATTERN.search(extracted):
+            return itertools.chain(seen, pages), detect_week_id(extracted)
+    return iter(seen), None
+
+def iter_employee_item_rows(pages, missing_items, missing_employees, week_id=None):
+    """
+    Stream (week_id, employee_id, item_id, quantity) rows from the
+    "VENTES PAR ITEMS PAR EMPLOYES" section of the page texts.
+    Pages are read as the rows are consumed; week_id is taken from
+    the report header unless given. Unknown names are appended to
+    missing_items / missing_employees.
+    """
+    item_lookup = load_item_id_table()
+    employee_lookup = load_employee_table()
+    employee_id = None
+    first = True
+
+    if week_id is None:
+        pages, week_id = read_week_header(pages)
+
+    # one line of lookahead: a header is told apart by the line after it
+    lines = employee_section_lines(pages)
+    following = next(lines, None)
+    while following is not None:
+        line, following = following, next(lines, None)
+
+        # ----------- EMPLOYEE / CATEGORY HEADER -----------
+        e = EMPLOYEE_LINE_PATTERN.match(line)
+        if e:
+            name = e.group(1).strip()
+            if name in BLACKLIST or not is_employee_header(name, following, first, employee_lookup):
+                continue
+            first = False
+            employee_id = employee_lookup.get(name)
+            if employee_id is None and name not in missing_employees:
+                missing_employees.append(name)
+            continue
+
+        # ----------- ITEM LINE -----------
+        m = LINE_PATTERN.match(line)
+        if not m or employee_id is None:
+            continue
+
+        item_name = m.group(1).strip()
+
+        if item_name in BLACKLIST:
+            continue
+
+        # Skip category subtotals like "10.BLAH"
+        if re.match(r"^\d+\.\w+", item_name):
+            continue
+
+        item_id = item_lookup.get(item_name)
+        if item_id is None:
+            if item_name not in missing_items:
+                missing_items.append(item_name)
+            continue
+
+        yield week_id, employee_id, item_id, float(m.group(2))
+
+def extract_employee_items_from_pdf(pdf_path, pages=None, week_id=None):
+    """Aggregate the streamed rows to one row per (week_id, employee_id, item_id)."""
+    if pages is None:
+        pages = iter_page_texts(pdf_path)
+    missing_items = []
+    missing_employees = []
+    totals = {}
+
+    for week_id, employee_id, item_id, quantity in iter_employee_item_rows(
+        pages, missing_items, missing_employees, week_id
+    ):
+        key = (week_id, employee_id, item_id)
+        totals[key] = totals.get(key, 0.0) + quantity
+
+    rows = [[w, e, i, q] for (w, e, i), q in totals.items()]
+    return rows, missing_items, missing_employees
+
+def process_employee_items(pdf_path, filename, pages=None, week_id=None):
+    import pandas as pd
+
+    data, missing_items, missing_employees = extract_employee_items_from_pdf(pdf_path, pages, week_id)
+
+    df = pd.DataFrame(data, columns=["week_id", "employee_id", "item_id", "quantity"])
+
+    base = os.path.splitext(filename)[0]
+    out_csv = os.path.join(OUTPUT_FOLDER, f"{base}_employee_items.csv")
+    if DELTA_MODE:
+        write_changes(out_csv, df.to_dict("records"), list(df.columns),
+                      ["week_id", "employee_id", "item_id"])
+    df.to_csv(out_csv, index=False, encoding="utf-8-sig")
+    print(f"Saved: {out_csv}")
+
+    if missing_items or missing_employees:
+        missing_file = os.path.join(OUTPUT_FOLDER, f"{base}_employee_missing.txt")
+        with open(missing_file, "w", encoding="utf-8") as f:
+            for name in missing_employees:
+                f.write("EMPLOYEE: " + name + "\n")
+            for name in missing_items:
+                f.write("ITEM: " + name + "\n")
+
+        print(f"Missing employee/items saved: {missing_file}")
+
 def process_all_pdfs():
+    import pandas as pd
+
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+
     for filename in os.listdir(INPUT_FOLDER):
         if not filename.lower().endswith(".pdf"):
             continue
@@ -151,13 +377,19 @@ def process_all_pdfs():
 
         print(f"\nProcessing: {filename}")
 
-        week_id, data, missing_items = extract_items_from_pdf(pdf_path)
+        # one pass over the PDF: the item section is read up to the page
+        # where the employee section starts, which then streams the rest
+        pages = iter_page_texts(pdf_path)
+        head = list(pages_before_section(pages))
+        week_id, data, missing_items = extract_items_from_pdf(pdf_path, head)
 
         df = pd.DataFrame(data, columns=["item_id", "quantity"])
         df = df.groupby("item_id", as_index=False)["quantity"].sum()
         df.insert(0, "week_id", week_id)
 
         out_csv = os.path.join(OUTPUT_FOLDER, csv_name)
+        if DELTA_MODE:
+            write_changes(out_csv, df.to_dict("records"), list(df.columns), ["week_id", "item_id"])
         df.to_csv(out_csv, index=False, encoding="utf-8-sig")
         print(f"Saved: {out_csv}")
 
@@ -174,6 +406,9 @@ def process_all_pdfs():
         else:
             print("No missing items.")
 
+        # Per-server item sales (section after STOP_TEXT)
+        process_employee_items(pdf_path, filename, itertools.chain(head[-1:], pages), week_id)
+
 if __name__ == "__main__":
     process_all_pdfs()
     print("\n=== Extraction Complete ===")
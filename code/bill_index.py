@@ -0,0 +1,196 @@
+import os
+import sys
+import mmap
+import zlib
+import struct
+
+from line_classifier import classify_line, HEADER_DATE, SERVER, BILL_ID
+
+# ----------------------------------------------------
+# Random access to single bills in pdf_to_text.txt.
+#   pdf_to_text.txt.zblk  the text in FRAME_SIZE-byte frames,
+#                         each zlib-compressed on its own
+#   pdf_to_text.txt.idx   header, then one fixed slot per
+#                         possible 5-digit bill id:
+#                           offset, length (bytes in the text), page
+#                         then the frame table:
+#                           compressed offset, compressed length
+# A lookup reads slot bill_id straight from the mmap'd index
+# and inflates only the frames that bill overlaps, so it
+# costs the same whatever the size of the season.
+#
+#   python bill_index.py 12345 12346
+# ----------------------------------------------------
+
+# ----------------------------------------------------
+# PATHS
+# ----------------------------------------------------
+INPUT_TXT = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process\pdf_to_text.txt"
+
+FRAME_SIZE = 64 * 1024
+BILL_SLOTS = 100000          # bill ids are 5 digits
+
+MAGIC = b"BILLIDX1"
+HEADER = struct.Struct("<8sIIQ")     # magic, slots, frames, frame size
+SLOT = struct.Struct("<QII")         # offset, length (0 = no bill), page
+FRAME = struct.Struct("<QQ")         # compressed offset, compressed length
+
+
+def index_paths(text_path):
+    return text_path + ".idx", text_path + ".zblk"
+
+# ----------------------------------------------------
+# BUILD
+# ----------------------------------------------------
+def bill_spans(data):
+    """
+    Yield (bill_id, offset, length, first_line) for every bill.
+    A bill runs from its server/date header to the next one.
+    """
+    lines = data.split(b"\n")
+    offsets = [0]
+    for line in lines:
+        offsets.append(min(offsets[-1] + len(line) + 1, len(data)))
+    tokens = [classify_line(line.decode("utf-8", "replace")) for line in lines]
+
+    starts, dates = [], []
+    for i, (token, _) in enumerate(tokens):
+        if token == HEADER_DATE:
+            starts.append(i - 1 if i > 0 and tokens[i - 1][0] == SERVER else i)
+            dates.append(i)
+
+    for k, (start, date_line) in enumerate(zip(starts, dates)):
+        end = starts[k + 1] if k + 1 < len(starts) else len(lines)
+        # same window EXTRACT_ID uses: bill id within 5 lines of the date
+        for j in range(date_line + 1, min(date_line + 6, end)):
+            token, value = tokens[j]
+            if token == BILL_ID:
+                yield value[0], offsets[start], offsets[end] - offsets[start], start
+                break
+
+
+def page_of_lines(page_lines):
+    """Cumulative line starts -> function(line number) -> 1-based page (0 if unknown)."""
+    from bisect import bisect_right
+    starts, n = [], 0
+    for count in page_lines or ():
+        starts.append(n)
+        n += count
+
+    def page(line_no):
+        return bisect_right(starts, line_no) if starts else 0
+    return page
+
+
+def build_index(text_path=INPUT_TXT, page_lines=None):
+    """Write <text>.zblk and <text>.idx; return (bills indexed, duplicate ids)."""
+    idx_path, blk_path = index_paths(text_path)
+    with open(text_path, "rb") as f:
+        data = f.read()
+
+    slots = bytearray(SLOT.size * BILL_SLOTS)
+    page = page_of_lines(page_lines)
+    bills, duplicates = 0, []
+    for bill_id, offset, length, first_line in bill_spans(data):
+        n = int(bill_id)
+        at = n * SLOT.size
+        if SLOT.unpack_from(slots, at)[1]:
+            duplicates.append(bill_id)   # keep the first occurrence
+            continue
+        SLOT.pack_into(slots, at, offset, length, page(first_line))
+        bills += 1
+
+    frames = []
+    with open(blk_path + ".tmp", "wb") as f:
+        pos = 0
+        for start in range(0, len(data), FRAME_SIZE):
+            block = zlib.compress(data[start:start + FRAME_SIZE], 6)
+            f.write(block)
+            frames.append(FRAME.pack(pos, len(block)))
+            pos += len(block)
+
+    with open(idx_path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, BILL_SLOTS, len(frames), FRAME_SIZE))
+        f.write(slots)
+        f.write(b"".join(frames))
+
+    os.replace(blk_path + ".tmp", blk_path)
+    os.replace(idx_path + ".tmp", idx_path)
+    return bills, duplicates
+
+# ----------------------------------------------------
+# LOOKUP
+# ----------------------------------------------------
+class BillIndex:
+    def __init__(self, text_path=INPUT_TXT):
+        idx_path, blk_path = index_paths(text_path)
+        self._idx_file = open(idx_path, "rb")
+        self._blk_file = open(blk_path, "rb")
+        self._idx = mmap.mmap(self._idx_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._blk = mmap.mmap(self._blk_file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if os.path.getsize(blk_path) else b""
+
+        magic, self.slots, self.frames, self.frame_size = HEADER.unpack_from(self._idx, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a bill index: {idx_path}")
+        self._frames_at = HEADER.size + self.slots * SLOT.size
+
+    def locate(self, bill_id):
+        """(offset, length, page) or None."""
+        n = int(bill_id)
+        if not 0 <= n < self.slots:
+            return None
+        offset, length, page = SLOT.unpack_from(self._idx, HEADER.size + n * SLOT.size)
+        return (offset, length, page) if length else None
+
+    def _frame(self, k):
+        pos, size = FRAME.unpack_from(self._idx, self._frames_at + k * FRAME.size)
+        return zlib.decompress(self._blk[pos:pos + size])
+
+    def raw(self, bill_id):
+        """The bill's bytes as stored in pdf_to_text.txt, or None."""
+        loc = self.locate(bill_id)
+        if loc is None:
+            return None
+        offset, length, _ = loc
+        first, last = offset // self.frame_size, (offset + length - 1) // self.frame_size
+        data = b"".join(self._frame(k) for k in range(first, last + 1))
+        start = offset - first * self.frame_size
+        return data[start:start + length]
+
+    def lines(self, bill_id):
+        data = self.raw(bill_id)
+        return None if data is None else data.decode("utf-8").splitlines()
+
+    def close(self):
+        for m in (self._idx, self._blk):
+            if isinstance(m, mmap.mmap):
+                m.close()
+        self._idx_file.close()
+        self._blk_file.close()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python bill_index.py BILL_ID [BILL_ID ...]")
+        return 1
+
+    index = BillIndex(INPUT_TXT)
+    try:
+        for bill_id in argv:
+            loc = index.locate(bill_id)
+            if loc is None:
+                print(f"--- {bill_id}: not found")
+                continue
+            offset, length, page = loc
+            print(f"--- {bill_id}: page {page or '?'}, bytes {offset}-{offset + length}")
+            for line in index.lines(bill_id):
+                print(line)
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
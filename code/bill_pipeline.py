@@ -0,0 +1,210 @@
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import PDF_TO_TXT
+import EXTRACT_ID
+import get_the_item
+import bill_total
+from bill_index import build_index
+
+# ----------------------------------------------------
+# In-memory run of the whole bill chain:
+#   PDF -> cleaned lines -> headers / items / totals
+# The cleaned text is placed once in shared memory and the
+# three parsers read it from there in parallel processes.
+# Each parser hands its records back the same way: one column
+# per field as a NumPy array, all packed into one shared-memory
+# block (see PACKED RECORDS), so only a small layout list is
+# pickled. Nothing goes through pdf_to_text.txt or the CSVs
+# until the very end, where every output is written once,
+# concurrently.
+# ----------------------------------------------------
+
+# ----------------------------------------------------
+# SHARED TEXT BUFFER
+# ----------------------------------------------------
+def _share_lines(lines):
+    data = "\n".join(lines).encode("utf-8")
+    shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    shm.buf[:len(data)] = data
+    return shm, len(data)
+
+
+def _attach_lines(name, size):
+    if size == 0:
+        return []
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        text = bytes(shm.buf[:size]).decode("utf-8")
+    finally:
+        shm.close()
+    return text.split("\n")
+
+# ----------------------------------------------------
+# PACKED RECORDS
+# Column kinds:
+#   str   fixed-width unicode ("U<n>") + None mask
+#   num   float64 + "was an int" mask, so 1 and 1.0 stay apart
+#   bool  bool
+# ----------------------------------------------------
+def _column(values):
+    import numpy as np
+
+    if all(type(v) is bool for v in values):
+        return "bool", [np.array(values, dtype=bool)]
+    if all(type(v) in (int, float) for v in values):
+        return "num", [np.array(values, dtype=np.float64),
+                       np.array([type(v) is int for v in values], dtype=bool)]
+    if not all(v is None or isinstance(v, str) for v in values):
+        raise TypeError(f"cannot pack column of {sorted({type(v).__name__ for v in values})}")
+    width = max((len(v) for v in values if v is not None), default=1) or 1
+    return "str", [np.array(["" if v is None else v for v in values], dtype=f"U{width}"),
+                   np.array([v is None for v in values], dtype=bool)]
+
+
+def _pack_records(records, fields):
+    """records -> (shared-memory name, layout, row count); the caller of _unpack unlinks it."""
+    columns = []
+    size = 0
+    for field in fields:
+        kind, arrays = _column([r[field] for r in records])
+        parts = []
+        for a in arrays:
+            size = (size + 7) // 8 * 8
+            parts.append((a.dtype.str, size))
+            size += a.nbytes
+        columns.append((field, kind, parts, arrays))
+
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        import numpy as np
+        for _, _, parts, arrays in columns:
+            for (dtype, offset), a in zip(parts, arrays):
+                np.ndarray(a.shape, dtype=dtype, buffer=shm.buf, offset=offset)[:] = a
+        layout = [(field, kind, parts) for field, kind, parts, _ in columns]
+        return shm.name, layout, len(records)
+    finally:
+        shm.close()
+
+
+def _unpack_records(name, layout, n):
+    """Read a _pack_records block back into dicts and free it."""
+    import numpy as np
+
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        fields, columns = [], []
+        for field, kind, parts in layout:
+            arrays = [np.ndarray((n,), dtype=dtype, buffer=shm.buf, offset=offset).tolist()
+                      for dtype, offset in parts]
+            if kind == "num":
+                values = [int(v) if is_int else v for v, is_int in zip(*arrays)]
+            elif kind == "str":
+                values = [None if missing else v for v, missing in zip(*arrays)]
+            else:
+                values = arrays[0]
+            fields.append(field)
+            columns.append(values)
+    finally:
+        shm.close()
+        shm.unlink()
+    return [dict(zip(fields, row)) for row in zip(*columns)]
+
+# ----------------------------------------------------
+# STAGES (run in worker processes)
+# ----------------------------------------------------
+# Lookups are reloaded inside each worker from their snapshots
+# (see lookup_tables.py) instead of being pickled across.
+def _run_headers(name, size, employee_table, alias_csv):
+    records, missing, learned = _headers(_attach_lines(name, size), employee_table, alias_csv)
+    return _pack_records(records, EXTRACT_ID.BILL_ID_FIELDS), missing, learned
+
+
+def _headers(lines, employee_table, alias_csv):
+    # learned aliases travel back with the records and are saved at the end
+    employee_map = EXTRACT_ID.load_employee_map(employee_table)
+    resolver = EXTRACT_ID.EmployeeResolver(employee_map, EXTRACT_ID.load_aliases(alias_csv))
+    records, missing = EXTRACT_ID.extract_bill_headers(lines, employee_map, resolver)
+    return records, missing, resolver.learned
+
+
+def _run_items(name, size, item_table):
+    item_map, item_list = get_the_item.load_item_table(item_table)
+    # no nested pool inside a worker
+    records, missing_counts = get_the_item.extract_bill_items(_attach_lines(name, size), item_map, item_list, 0)
+    return _pack_records(records, get_the_item.BILL_ITEM_FIELDS), missing_counts
+
+
+def _run_totals(name, size):
+    return _pack_records(bill_total.extract_bill_totals(_attach_lines(name, size)), bill_total.BILL_TOTAL_FIELDS)
+
+# ----------------------------------------------------
+# RUN
+# ----------------------------------------------------
+def run_in_memory(parallel=True):
+    """Return (lines, headers, items, totals) without touching intermediate files."""
+    pdf_path = PDF_TO_TXT.find_pdf(PDF_TO_TXT.input_folder)
+    lines = PDF_TO_TXT.clean_lines(PDF_TO_TXT.extract_text(pdf_path))
+
+    if not parallel:
+        item_map, item_list = get_the_item.load_item_table(get_the_item.ITEM_TABLE)
+        headers = _headers(lines, EXTRACT_ID.EMPLOYEE_TABLE, EXTRACT_ID.ALIAS_CSV)
+        items = get_the_item.extract_bill_items(lines, item_map, item_list, get_the_item.WORKERS)
+        totals = bill_total.extract_bill_totals(lines)
+        return lines, headers, items, totals
+
+    shm, size = _share_lines(lines)
+    try:
+        with ProcessPoolExecutor(3) as pool:
+            f_headers = pool.submit(_run_headers, shm.name, size,
+                                    EXTRACT_ID.EMPLOYEE_TABLE, EXTRACT_ID.ALIAS_CSV)
+            f_items = pool.submit(_run_items, shm.name, size, get_the_item.ITEM_TABLE)
+            f_totals = pool.submit(_run_totals, shm.name, size)
+            packed, missing, learned = f_headers.result()
+            headers = (_unpack_records(*packed), missing, learned)
+            packed, missing_counts = f_items.result()
+            items = (_unpack_records(*packed), missing_counts)
+            totals = _unpack_records(*f_totals.result())
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return lines, headers, items, totals
+
+
+def write_outputs(lines, headers, items, totals):
+    """Write every file the stand-alone scripts would have written, in parallel."""
+    records, missing_server_names, learned_aliases = headers
+    item_records, missing_counts = items
+
+    jobs = [
+        (PDF_TO_TXT.write_lines, lines, PDF_TO_TXT.output_file),
+        (EXTRACT_ID.write_bill_id_csv, records, EXTRACT_ID.OUTPUT_CSV),
+        (EXTRACT_ID.write_missing_names, missing_server_names, EXTRACT_ID.MISSING_NAMES),
+        (EXTRACT_ID.write_learned_aliases, learned_aliases, EXTRACT_ID.ALIAS_CSV),
+        (get_the_item.write_bill_items_csv, item_records, get_the_item.OUTPUT_CSV),
+        (get_the_item.write_missing_items, missing_counts, get_the_item.MISSING_TXT),
+        (bill_total.write_bill_total_csv, totals, bill_total.OUTPUT_CSV),
+    ]
+
+    with ThreadPoolExecutor(len(jobs)) as pool:
+        for future in [pool.submit(fn, data, path) for fn, data, path in jobs]:
+            future.result()
+
+
+def main():
+    parallel = "--serial" not in sys.argv
+
+    lines, headers, items, totals = run_in_memory(parallel)
+    write_outputs(lines, headers, items, totals)
+    # pages are not tracked in memory: the index records page 0
+    build_index(PDF_TO_TXT.output_file)
+
+    print(f"{len(lines)} lines, {len(headers[0])} bills, "
+          f"{len(items[0])} bill items, {len(totals)} totals")
+    print("DONE!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import json
+from contextlib import contextmanager
+
+from lookup_tables import file_digest
+
+# ----------------------------------------------------
+# Crash-safe output for long runs.
+#   PageCheckpoint  output is appended to <output>.partial one
+#                   chunk at a time; after each chunk is synced,
+#                   <output>.ckpt.json records the pages done,
+#                   the committed byte size, the last bill and
+#                   the line count of every page.
+#                   A rerun on the same source truncates any
+#                   uncommitted tail and continues from there;
+#                   the finished file replaces <output> at once.
+#   atomic_output   write to <path>.tmp, then os.replace, so a
+#                   killed script never leaves a half-written CSV.
+# ----------------------------------------------------
+
+CHECKPOINT_VERSION = 2
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+@contextmanager
+def atomic_output(path, mode="w", **kwargs):
+    tmp = f"{path}.tmp"
+    with open(tmp, mode, **kwargs) as f:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class PageCheckpoint:
+    def __init__(self, output_path, source_path):
+        self.output_path = output_path
+        self.partial_path = output_path + ".partial"
+        self.checkpoint_path = output_path + ".ckpt.json"
+        self.source = {"path": os.path.abspath(source_path), "sha256": file_digest(source_path)}
+        self.state = None
+
+    def resume(self):
+        """Return the checkpoint state to continue from (pages_done=0 for a fresh start)."""
+        state = None
+        if os.path.exists(self.checkpoint_path) and os.path.exists(self.partial_path):
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if (state.get("version") != CHECKPOINT_VERSION or state.get("source") != self.source
+                    or os.path.getsize(self.partial_path) < state.get("bytes", 0)):
+                state = None
+
+        if state is None:
+            state = {"version": CHECKPOINT_VERSION, "source": self.source,
+                     "pages_done": 0, "bytes": 0, "lines": 0, "last_bill_id": None,
+                     "page_lines": []}
+
+        # drop whatever was written after the last commit
+        with open(self.partial_path, "ab") as f:
+            f.truncate(state["bytes"])
+
+        self.state = state
+        return state
+
+    def commit(self, lines, pages_done, last_bill_id=None, page_lines=()):
+        """
+        Append lines (same text-mode newlines as a plain write) and record
+        the checkpoint. page_lines: number of lines each page of the chunk gave.
+        """
+        with open(self.partial_path, "a", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.state.update({
+            "pages_done": pages_done,
+            "bytes": os.path.getsize(self.partial_path),
+            "lines": self.state["lines"] + len(lines),
+            "last_bill_id": last_bill_id or self.state["last_bill_id"],
+            "page_lines": self.state["page_lines"] + list(page_lines),
+        })
+        _write_json(self.checkpoint_path, self.state)
+
+    def finish(self):
+        os.replace(self.partial_path, self.output_path)
+        os.remove(self.checkpoint_path)
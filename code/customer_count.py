@@ -0,0 +1,158 @@
+import os
+import csv
+
+from lookup_tables import load_table
+from checkpoint import atomic_output
+from delta_outputs import write_changes
+
+# ----------------------------------------------------
+# Estimated customers per bill (see APPENDIX.md, party size):
+#   main courses (category 2) present -> sum of their quantity
+#   otherwise                         -> ceil(appetizers (category 1) x 0.5)
+# bill_items.csv is read into flat arrays, item_id is mapped
+# to category_id through a dense array, and every bill's
+# per-category quantities come out of one bincount.
+# Written next to bill_id.csv as bill_customers.csv.
+# ----------------------------------------------------
+
+# ----------------------------------------------------
+# PATHS
+# ----------------------------------------------------
+PROCESS_DIR = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process"
+BILL_ITEMS_CSV = os.path.join(PROCESS_DIR, "bill_items.csv")
+ITEM_TABLE = r"D:\TABLE FINAL\item_id.csv"
+OUTPUT_CSV = os.path.join(PROCESS_DIR, "bill_customers.csv")
+
+# ----------------------------------------------------
+# RULE
+# ----------------------------------------------------
+MAIN_CATEGORY = 2
+APPETIZER_CATEGORY = 1
+APPETIZER_SHARE = 0.5
+
+# Also write <output>_changes.csv (insert/update/delete vs previous run)
+DELTA_MODE = False
+
+# ----------------------------------------------------
+# LOAD
+# ----------------------------------------------------
+def load_category_array(path=ITEM_TABLE):
+    """Dense item_id -> category_id array (0 = unknown item / no category)."""
+    import numpy as np
+
+    table = load_table(path, "name", "item_id", id_type=int)
+    pairs = []
+    for item_id, row in zip(table.ids, table.rows):
+        try:
+            pairs.append((int(item_id), int(row.get("category_id") or 0)))
+        except (TypeError, ValueError):
+            continue
+
+    size = max((i for i, _ in pairs), default=0) + 1
+    categories = np.zeros(size, dtype=np.int32)
+    for item_id, category_id in pairs:
+        if item_id >= 0:
+            categories[item_id] = category_id
+    return categories
+
+
+def load_bill_items(path=BILL_ITEMS_CSV):
+    """Columns of bill_items.csv as (bill_ids, item_ids, quantities) arrays."""
+    import numpy as np
+
+    bill_ids, item_ids, quantities = [], [], []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            bill_ids.append(row["bill_id"])
+            item_ids.append(row["item_id"])
+            quantities.append(row["quantity"] or 0)
+
+    return (np.array(bill_ids, dtype=str),
+            np.array(item_ids, dtype=np.int64),
+            np.array(quantities, dtype=np.float64))
+
+# ----------------------------------------------------
+# ESTIMATE
+# ----------------------------------------------------
+def bill_index(bill_ids):
+    """(bills in first-seen order, row -> bill position) for the bill_id column."""
+    import numpy as np
+
+    uniq, first, inverse = np.unique(bill_ids, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return uniq[order], rank[inverse.ravel()]
+
+
+def estimate_customers(bill_ids, item_ids, quantities, categories):
+    """
+    Return (bills, category_ids, qty_matrix, estimated):
+    bills in first-seen order, qty_matrix[b, c] = quantity of
+    category category_ids[c] on bill b.
+    """
+    import numpy as np
+
+    bills, bill_idx = bill_index(bill_ids)
+
+    in_table = (item_ids >= 0) & (item_ids < len(categories))
+    cats = np.where(in_table, categories[np.clip(item_ids, 0, len(categories) - 1)], 0)
+
+    category_ids = np.unique(np.concatenate([categories[categories > 0],
+                                             [MAIN_CATEGORY, APPETIZER_CATEGORY]]))
+    cat_col = np.searchsorted(category_ids, cats)
+    known = (cats > 0) & (cat_col < len(category_ids))
+    cat_col = np.where(known, cat_col, 0)
+
+    n_bills, n_cats = len(bills), len(category_ids)
+    flat = np.bincount(bill_idx[known] * n_cats + cat_col[known],
+                       weights=quantities[known], minlength=n_bills * n_cats)
+    qty = flat.reshape(n_bills, n_cats)
+
+    mains = qty[:, np.searchsorted(category_ids, MAIN_CATEGORY)]
+    apps = qty[:, np.searchsorted(category_ids, APPETIZER_CATEGORY)]
+    estimated = np.where(mains > 0, mains, np.ceil(apps * APPETIZER_SHARE)).astype(np.int64)
+
+    return bills, category_ids, qty, estimated
+
+# ----------------------------------------------------
+# WRITE CSV
+# ----------------------------------------------------
+def _qty(value):
+    return f"{value:g}"
+
+
+def build_records(bills, category_ids, qty, estimated):
+    fieldnames = ["bill_id", "estimated_customers"] + [f"cat_{c}_qty" for c in category_ids]
+    records = []
+    for b, bill_id in enumerate(bills):
+        record = {"bill_id": str(bill_id), "estimated_customers": str(int(estimated[b]))}
+        for c, category_id in enumerate(category_ids):
+            record[f"cat_{category_id}_qty"] = _qty(qty[b, c])
+        records.append(record)
+    return fieldnames, records
+
+
+def write_customers_csv(fieldnames, records, path=OUTPUT_CSV):
+    if DELTA_MODE:
+        write_changes(path, records, fieldnames, ["bill_id"])
+
+    with atomic_output(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def main():
+    categories = load_category_array(ITEM_TABLE)
+    bills, category_ids, qty, estimated = estimate_customers(*load_bill_items(BILL_ITEMS_CSV), categories)
+
+    fieldnames, records = build_records(bills, category_ids, qty, estimated)
+    write_customers_csv(fieldnames, records, OUTPUT_CSV)
+
+    print(f"{len(records)} bills, {int(estimated.sum())} estimated customers")
+    print(f"bill_customers.csv created → {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import csv
+import hashlib
+
+# ----------------------------------------------------
+# Change-data-capture for the full-rewrite CSV outputs.
+# Before a script overwrites its CSV, the new records are
+# compared with the previous file by key, using a hash of
+# every row sharing that key. The differences are written
+# to <name>_changes.csv with an "op" column:
+#   I  key is new            -> insert the rows
+#   U  key's rows changed    -> delete rows for key, insert the rows
+#   D  key disappeared       -> delete rows for key (old rows shown)
+# Keys may repeat (e.g. several bill_items lines per bill);
+# all rows of a key are handled as one group.
+# ----------------------------------------------------
+
+OP_FIELD = "op"
+
+
+def changes_path(path):
+    stem, ext = os.path.splitext(str(path))
+    return f"{stem}_changes{ext or '.csv'}"
+
+
+def _cell(value):
+    # same text csv.writer / DataFrame.to_csv produce
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return str(value)
+
+
+def group_fingerprints(rows, fieldnames, key_fields):
+    """key -> (sha1 of the key's rows in order, [rows])"""
+    groups = {}
+    for row in rows:
+        key = tuple(_cell(row.get(k)) for k in key_fields)
+        groups.setdefault(key, []).append(row)
+
+    result = {}
+    for key, group in groups.items():
+        h = hashlib.sha1()
+        for row in group:
+            h.update("\x1f".join(_cell(row.get(f)) for f in fieldnames).encode("utf-8"))
+            h.update(b"\x1e")
+        result[key] = (h.hexdigest(), group)
+    return result
+
+
+def read_rows(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+def diff_records(old_rows, new_rows, fieldnames, key_fields):
+    """Return (inserts, updates, deletes) as lists of rows."""
+    old = group_fingerprints(old_rows, fieldnames, key_fields)
+    new = group_fingerprints(new_rows, fieldnames, key_fields)
+
+    inserts, updates, deletes = [], [], []
+    for key, (fp, group) in new.items():
+        if key not in old:
+            inserts.extend(group)
+        elif old[key][0] != fp:
+            updates.extend(group)
+    for key, (_, group) in old.items():
+        if key not in new:
+            deletes.extend(group)
+
+    return inserts, updates, deletes
+
+
+def write_changes(path, records, fieldnames, key_fields):
+    """Compare records with the CSV currently at path and write <path>_changes.csv.
+    Call this BEFORE the full file is overwritten. Returns (n_insert, n_update, n_delete)."""
+    inserts, updates, deletes = diff_records(read_rows(path), records, fieldnames, key_fields)
+
+    out = changes_path(path)
+    with open(out, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=[OP_FIELD] + list(fieldnames), extrasaction="ignore")
+        writer.writeheader()
+        for op, rows in (("I", inserts), ("U", updates), ("D", deletes)):
+            for row in rows:
+                writer.writerow({OP_FIELD: op, **{k: _cell(row.get(k)) for k in fieldnames}})
+
+    print(f"Changes → {out} (I={len(inserts)} U={len(updates)} D={len(deletes)})")
+    return len(inserts), len(updates), len(deletes)
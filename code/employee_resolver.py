@@ -0,0 +1,183 @@
+import os
+import re
+import csv
+import unicodedata
+from collections import Counter
+
+# ----------------------------------------------------
+# Server name -> employee_id for EXTRACT_ID.
+# Raw POS names are resolved in this order:
+#   1. exact match on the accent-free, punctuation-free name
+#   2. confirmed rows of the alias table (employee_alias.csv)
+#   3. unique token-prefix match  ("JEAN PHIL" -> "JEAN PHILIPPE")
+#   4. trigram index: best Dice score of at least MIN_SCORE and
+#      MIN_MARGIN ahead of the runner-up (0 when there is none)
+# Only 1/2 assign an employee_id. A 3/4 match is a guess ("MARIO"
+# is not Marie): it is written to the alias table as a pending row
+# (confirmed empty), the bill keeps no employee and the name stays
+# in missing_name.txt until someone puts "yes" in `confirmed`.
+# Each distinct raw name is resolved once per run (memoized).
+# ----------------------------------------------------
+
+ALIAS_FIELDS = ["alias", "employee_id", "score", "source", "confirmed"]
+
+MIN_SCORE = 0.8
+MIN_MARGIN = 0.15
+MIN_PREFIX_LEN = 3
+
+
+def normalize_name(name):
+    """Uppercase, remove accents, keep letters/digits, collapse spaces."""
+    if not name:
+        return ""
+    s = unicodedata.normalize("NFD", name.upper())
+    s = "".join(c for c in s if unicodedata.category(c) != "Mn")
+    s = re.sub(r"[^A-Z0-9]+", " ", s)
+    return s.strip()
+
+
+def trigrams(name):
+    padded = f"  {name} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+# ----------------------------------------------------
+# ALIAS TABLE
+# ----------------------------------------------------
+def is_confirmed(row):
+    flag = row.get("confirmed")
+    if flag is None:
+        # tables written before the column existed: hand-added and
+        # prefix rows were trusted, trigram guesses go back to pending
+        return (row.get("source") or "manual") != "ngram"
+    return flag.strip().lower() in ("yes", "y", "oui", "1", "true")
+
+
+def load_aliases(path):
+    """normalized alias -> (employee_id, score, source, confirmed "yes" / "")"""
+    aliases = {}
+    if not path or not os.path.exists(path):
+        return aliases
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            alias = normalize_name(row.get("alias"))
+            if not alias or not row.get("employee_id"):
+                continue
+            aliases[alias] = (row["employee_id"], row.get("score") or "", row.get("source") or "manual",
+                              "yes" if is_confirmed(row) else "")
+    return aliases
+
+
+def save_aliases(path, aliases):
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(ALIAS_FIELDS)
+        for alias in sorted(aliases):
+            writer.writerow([alias, *aliases[alias]])
+    os.replace(tmp, path)
+
+# ----------------------------------------------------
+# RESOLVER
+# ----------------------------------------------------
+class EmployeeResolver:
+    def __init__(self, employee_map, aliases=None):
+        # normalized name -> employee_id (first one wins on collisions)
+        self.exact = {}
+        for name, employee_id in employee_map.items():
+            self.exact.setdefault(normalize_name(name), employee_id)
+
+        aliases = aliases or {}
+        self.aliases = {name: entry for name, entry in aliases.items() if entry[3]}
+        self.pending = {name: entry for name, entry in aliases.items() if not entry[3]}
+        self.learned = {}
+        self.stats = Counter()
+        self._memo = {}
+
+        # trigram -> [(candidate index, count)]
+        self._names = list(self.exact)
+        self._sizes = []
+        self._index = {}
+        for idx, name in enumerate(self._names):
+            grams = trigrams(name)
+            self._sizes.append(sum(grams.values()))
+            for g, n in grams.items():
+                self._index.setdefault(g, []).append((idx, n))
+
+    def resolve(self, raw_name):
+        """Return employee_id or None; each distinct raw name is matched once."""
+        if raw_name in self._memo:
+            self.stats["memo"] += 1
+            return self._memo[raw_name]
+
+        employee_id, source = self._match(normalize_name(raw_name))
+        self.stats[source] += 1
+        self._memo[raw_name] = employee_id
+        return employee_id
+
+    def _match(self, name):
+        if not name:
+            return None, "missing"
+        if name in self.exact:
+            return self.exact[name], "exact"
+        if name in self.aliases:
+            return self.aliases[name][0], "alias"
+
+        if name in self.pending:
+            return None, "pending"
+
+        employee_id = self._prefix_match(name)
+        if employee_id is not None:
+            self._suggest(name, employee_id, 1.0, "prefix")
+            return None, "pending"
+
+        employee_id, score = self._ngram_match(name)
+        if employee_id is not None:
+            self._suggest(name, employee_id, score, "ngram")
+            return None, "pending"
+
+        return None, "missing"
+
+    def _prefix_match(self, name):
+        # truncated POS names: every token is a prefix of the candidate's token
+        tokens = name.split()
+        if sum(len(t) for t in tokens) < MIN_PREFIX_LEN:
+            return None
+        found = set()
+        for cand in self._candidates(name):
+            cand_tokens = self._names[cand].split()
+            if len(cand_tokens) >= len(tokens) and all(
+                    c.startswith(t) for t, c in zip(tokens, cand_tokens)):
+                found.add(self.exact[self._names[cand]])
+        return found.pop() if len(found) == 1 else None
+
+    def _candidates(self, name):
+        shared = Counter()
+        for g, n in trigrams(name).items():
+            for idx, m in self._index.get(g, ()):
+                shared[idx] += min(n, m)
+        return shared
+
+    def _ngram_match(self, name):
+        grams = trigrams(name)
+        size = sum(grams.values())
+        scores = {}
+        for idx, common in self._candidates(name).items():
+            employee_id = self.exact[self._names[idx]]
+            score = 2 * common / (size + self._sizes[idx])
+            scores[employee_id] = max(score, scores.get(employee_id, 0.0))
+
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        if not ranked or ranked[0][1] < MIN_SCORE:
+            return None, 0.0
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if ranked[0][1] - runner_up < MIN_MARGIN:
+            return None, 0.0
+        return ranked[0][0], ranked[0][1]
+
+    def _suggest(self, name, employee_id, score, source):
+        entry = (str(employee_id), f"{score:.3f}", source, "")
+        self.pending[name] = entry
+        self.learned[name] = entry
+
+    def summary(self):
+        return ", ".join(f"{k}={v}" for k, v in sorted(self.stats.items()))
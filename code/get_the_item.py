@@ -2,6 +2,12 @@ import os
 import re
 import csv
 import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+from lookup_tables import load_table
+from delta_outputs import write_changes
+from checkpoint import atomic_output
 
 # ----------------------------------------------------
 # PATHS
@@ -11,6 +17,14 @@ ITEM_TABLE = r"D:\TABLE FINAL\item_id.csv"
 OUTPUT_CSV = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process\bill_items.csv"
 MISSING_TXT = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process\missing_items.txt"
 
+BILL_ITEM_FIELDS = ["bill_id", "item_id", "quantity"]
+
+# Also write <output>_changes.csv (insert/update/delete vs previous run)
+DELTA_MODE = False
+
+# Worker processes for fuzzy/prefix resolution (0 = resolve in this process)
+WORKERS = 0
+
 # ----------------------------------------------------
 # HELPERS
 # ----------------------------------------------------
@@ -61,15 +75,17 @@ PREFIX_THRESHOLD = 0.70
 # ----------------------------------------------------
 # LOAD ITEM TABLE
 # ----------------------------------------------------
-item_map = {}
-item_list = []
+@lru_cache(maxsize=None)
+def load_item_table(path=ITEM_TABLE):
+    table = load_table(path, "name", "item_id", normalize)
+
+    item_map = table.normalized
+    item_list = [
+        (norm, item_id) for norm, item_id in zip(table.norm_names, table.ids)
+        if norm is not None
+    ]
 
-with open(ITEM_TABLE, "r", encoding="utf-8-sig") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        norm = normalize(row["name"])
-        item_map[norm] = row["item_id"]
-        item_list.append((norm, row["item_id"]))
+    return item_map, item_list
 
 # ----------------------------------------------------
 # PATTERNS
@@ -78,35 +94,14 @@ bill_id_pattern = re.compile(r"(\d{5})\s*\(\d{5}\)")
 fp_pattern = re.compile(r"FP\s*$")
 
 # ----------------------------------------------------
-# READ TXT
-# ----------------------------------------------------
-with open(INPUT_TXT, "r", encoding="utf-8") as f:
-    lines = [line.rstrip("\n") for line in f]
-
-records = []
-missing_items = []
-current_bill_id = None
-
-# ----------------------------------------------------
-# MAIN LOOP
+# PHASE 1 — PARSE LINES, COLLECT DISTINCT ITEM STRINGS
 # ----------------------------------------------------
-for i, line in enumerate(lines):
-
-    match = bill_id_pattern.search(line)
-    if match:
-        current_bill_id = match.group(1)
-        continue
-
-    if current_bill_id is None:
-        continue
-
-    if not fp_pattern.search(line):
-        continue
-
+def parse_item_line(line):
+    """Return (quantity, item_name) for an FP line, or None."""
     raw = line.strip()
     parts = raw.split()
     if len(parts) < 2:
-        continue
+        return None
 
     # ------------------------------------------------
     # NEW FEATURE: extract quantity
@@ -137,68 +132,170 @@ for i, line in enumerate(lines):
         else:
             item_name = after_qty.strip()
 
-    norm_item = normalize(item_name)
+    return quantity, item_name
 
-    # ------------------------------------------------
-    # STEP 1 — Exact match
-    # ------------------------------------------------
-    item_id = item_map.get(norm_item)
 
-    # ------------------------------------------------
-    # STEP 2 — Fuzzy
-    # ------------------------------------------------
-    if item_id is None:
-        best_score = 0
-        best_id = None
-        for ref_name, ref_id in item_list:
-            score = similarity(norm_item, ref_name)
-            if score > best_score:
-                best_score = score
-                best_id = ref_id
+def collect_item_lines(lines):
+    """
+    Return (rows, counts): rows is [(bill_id, item_name, norm_item, quantity)]
+    in receipt order, counts is a Counter of distinct normalized strings.
+    """
+    rows = []
+    counts = Counter()
+    current_bill_id = None
+
+    for line in lines:
+
+        match = bill_id_pattern.search(line)
+        if match:
+            current_bill_id = match.group(1)
+            continue
+
+        if current_bill_id is None:
+            continue
+
+        if not fp_pattern.search(line):
+            continue
+
+        parsed = parse_item_line(line)
+        if parsed is None:
+            continue
+
+        quantity, item_name = parsed
+        norm_item = normalize(item_name)
+
+        rows.append((current_bill_id, item_name, norm_item, quantity))
+        counts[norm_item] += 1
+
+    return rows, counts
+
+# ----------------------------------------------------
+# PHASE 2 — RESOLVE EACH DISTINCT STRING ONCE
+# ----------------------------------------------------
+_worker_scorer = None
+
+
+def _init_worker(item_list):
+    from item_scorer import MenuScorer
+
+    global _worker_scorer
+    _worker_scorer = MenuScorer(item_list)
+
+
+def _resolve_chunk(names):
+    return resolve_fuzzy(names, _worker_scorer)
+
+
+def resolve_fuzzy(names, scorer):
+    """STEP 2 (fuzzy) then STEP 3 (prefix) for strings with no exact match."""
+    resolved = [None] * len(names)
+
+    for i, (best_score, best_id) in enumerate(scorer.best_similarity_batch(names)):
         if best_score >= FUZZY_THRESHOLD:
-            item_id = best_id
+            resolved[i] = best_id
 
-    # ------------------------------------------------
-    # STEP 3 — Prefix rule
-    # ------------------------------------------------
-    if item_id is None:
-        best_prefix = 0
-        best_id = None
-        for ref_name, ref_id in item_list:
-            pr = prefix_ratio(norm_item, ref_name)
-            if pr > best_prefix:
-                best_prefix = pr
-                best_id = ref_id
+    pending = [i for i, item_id in enumerate(resolved) if item_id is None]
+    prefixes = scorer.best_prefix_batch([names[i] for i in pending])
+    for i, (best_prefix, best_id) in zip(pending, prefixes):
         if best_prefix >= PREFIX_THRESHOLD:
-            item_id = best_id
+            resolved[i] = best_id
 
-    # ------------------------------------------------
-    # SAVE
-    # ------------------------------------------------
-    if item_id is not None:
-        records.append({
-            "bill_id": current_bill_id,
-            "item_id": item_id,
-            "quantity": quantity     # ← NEW COLUMN
-        })
+    return resolved
+
+
+def resolve_items(distinct, item_map, item_list, workers=0):
+    """Map every distinct normalized string to an item_id (or None)."""
+    # STEP 1 — Exact match
+    resolved = {name: item_map.get(name) for name in distinct}
+    unknown = [name for name, item_id in resolved.items() if item_id is None]
+
+    if not unknown:
+        return resolved
+
+    # numpy / process pool only needed when something is left to resolve
+    from concurrent.futures import ProcessPoolExecutor
+    from item_scorer import MenuScorer
+
+    if workers and workers > 1 and len(unknown) > workers:
+        size = -(-len(unknown) // workers)
+        chunks = [unknown[i:i + size] for i in range(0, len(unknown), size)]
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(item_list,)) as pool:
+            ids = [item_id for part in pool.map(_resolve_chunk, chunks) for item_id in part]
     else:
-        missing_items.append(item_name)
+        ids = resolve_fuzzy(unknown, MenuScorer(item_list))
+
+    resolved.update(zip(unknown, ids))
+    return resolved
 
 # ----------------------------------------------------
-# WRITE CSV
+# PHASE 3 — JOIN BACK IN RECEIPT ORDER
 # ----------------------------------------------------
-with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
-    writer = csv.DictWriter(f, fieldnames=["bill_id", "item_id", "quantity"])
-    writer.writeheader()
-    writer.writerows(records)
+def join_items(rows, resolved):
+    records = []
+    missing_counts = Counter()
+
+    for bill_id, item_name, norm_item, quantity in rows:
+        item_id = resolved[norm_item]
+        if item_id is not None:
+            records.append({
+                "bill_id": bill_id,
+                "item_id": item_id,
+                "quantity": quantity     # ← NEW COLUMN
+            })
+        else:
+            missing_counts[item_name] += 1
+
+    return records, missing_counts
+
+
+def extract_bill_items(lines, item_map, item_list, workers=0):
+    """All three phases: return (records, missing_counts)."""
+    rows, counts = collect_item_lines(lines)
+    resolved = resolve_items(list(counts), item_map, item_list, workers)
+
+    print(f"{len(rows)} item lines, {len(counts)} distinct strings")
+
+    return join_items(rows, resolved)
 
 # ----------------------------------------------------
-# WRITE missing_items.txt
+# WRITE OUTPUTS
 # ----------------------------------------------------
-with open(MISSING_TXT, "w", encoding="utf-8") as f:
-    for m in sorted(set(missing_items)):
-        f.write(m + "\n")
+def write_bill_items_csv(records, path=OUTPUT_CSV):
+    # all item rows of a bill form one change group
+    if DELTA_MODE:
+        write_changes(path, records, BILL_ITEM_FIELDS, ["bill_id"])
+
+    with atomic_output(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=BILL_ITEM_FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def write_missing_items(missing_counts, path=MISSING_TXT):
+    # most frequent first
+    with open(path, "w", encoding="utf-8") as f:
+        for name, count in sorted(missing_counts.items(), key=lambda kv: (-kv[1], kv[0])):
+            f.write(f"{count}\t{name}\n")
+
+
+def main():
+    item_map, item_list = load_item_table(ITEM_TABLE)
+
+    # ----------------------------------------------------
+    # READ TXT
+    # ----------------------------------------------------
+    with open(INPUT_TXT, "r", encoding="utf-8") as f:
+        lines = [line.rstrip("\n") for line in f]
+
+    records, missing_counts = extract_bill_items(lines, item_map, item_list, WORKERS)
+
+    write_bill_items_csv(records, OUTPUT_CSV)
+    write_missing_items(missing_counts, MISSING_TXT)
+
+    print("DONE!")
+    print(f"bill_items.csv → {OUTPUT_CSV}")
+    print(f"missing_items.txt → {MISSING_TXT}")
+
 
-print("DONE!")
-print(f"bill_items.csv → {OUTPUT_CSV}")
-print(f"missing_items.txt → {MISSING_TXT}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import numpy as np
+
+# ----------------------------------------------------
+# Batched version of similarity() / prefix_ratio() from get_the_item.py.
+# The menu is encoded once; each query is then scored against every
+# menu name with a handful of array operations. Scores are bit-for-bit
+# the same as the per-candidate Python loops.
+# ----------------------------------------------------
+
+# Query padding never equals a menu code point nor the menu padding (0)
+QUERY_PAD = np.uint32(0xFFFFFFFF)
+
+# Queries scored together in one broadcast (bounds the Q x N x L buffer)
+BATCH_SIZE = 256
+
+
+def encode_names(names, width, pad):
+    """Encode strings as a (len(names), width) uint32 code point matrix."""
+    out = np.full((len(names), width), pad, dtype=np.uint32)
+    for row, name in enumerate(names):
+        codes = [ord(c) for c in name[:width]]
+        out[row, :len(codes)] = codes
+    return out
+
+
+class MenuScorer:
+    """Score normalized receipt strings against the whole item table at once."""
+
+    def __init__(self, item_list):
+        # item_list: [(normalized_name, item_id), ...] as built in get_the_item.py
+        self.names = [name for name, _ in item_list]
+        self.ids = [item_id for _, item_id in item_list]
+
+        self.lengths = np.array([len(n) for n in self.names], dtype=np.int64)
+        self.width = int(self.lengths.max()) if len(self.names) else 0
+        self.chars = encode_names(self.names, self.width, 0)
+
+        # Token-set bitmaps: one column per distinct menu token
+        self.vocab = {}
+        token_sets = [set(n.split()) for n in self.names]
+        for tokens in token_sets:
+            for tok in tokens:
+                self.vocab.setdefault(tok, len(self.vocab))
+
+        self.tokens = np.zeros((len(self.names), len(self.vocab)), dtype=np.int32)
+        for row, tokens in enumerate(token_sets):
+            self.tokens[row, [self.vocab[t] for t in tokens]] = 1
+        self.token_counts = self.tokens.sum(axis=1)
+
+    # ------------------------------------------------
+    # RAW SCORES (Q x N)
+    # ------------------------------------------------
+    def _char_equal(self, queries):
+        q = encode_names(queries, self.width, QUERY_PAD)
+        return q[:, None, :] == self.chars[None, :, :]
+
+    def similarity_matrix(self, queries):
+        """Same value as similarity(query, name) for every (query, name) pair."""
+        n = len(self.names)
+        if not queries or n == 0:
+            return np.zeros((len(queries), n))
+
+        # Token score: |A & B| / |A | B|
+        q_tokens = np.zeros((len(queries), len(self.vocab)), dtype=np.int32)
+        q_counts = np.zeros(len(queries), dtype=np.int64)
+        for row, query in enumerate(queries):
+            ta = set(query.split())
+            q_counts[row] = len(ta)
+            known = [self.vocab[t] for t in ta if t in self.vocab]
+            q_tokens[row, known] = 1
+
+        inter = q_tokens @ self.tokens.T
+        union = q_counts[:, None] + self.token_counts[None, :] - inter
+        empty = (q_counts[:, None] == 0) | (self.token_counts[None, :] == 0)
+        token_score = np.divide(inter, union, out=np.zeros(inter.shape), where=~empty)
+
+        # Char score: same characters at the same position / shorter length
+        q_lengths = np.array([len(q) for q in queries], dtype=np.int64)
+        shorter = np.minimum(q_lengths[:, None], self.lengths[None, :])
+        same = self._char_equal(queries).sum(axis=2)
+        char_score = np.divide(same, shorter, out=np.zeros(same.shape), where=shorter > 0)
+
+        scores = (token_score * 0.65) + (char_score * 0.35)
+        scores[empty] = 0
+        return scores
+
+    def prefix_matrix(self, queries):
+        """Same value as prefix_ratio(query, name) for every (query, name) pair."""
+        n = len(self.names)
+        if not queries or n == 0:
+            return np.zeros((len(queries), n))
+
+        q_lengths = np.array([len(q) for q in queries], dtype=np.int64)
+        max_len = np.minimum(q_lengths[:, None], self.lengths[None, :])
+        prefix = np.logical_and.accumulate(self._char_equal(queries), axis=2).sum(axis=2)
+        return np.divide(prefix, max_len, out=np.zeros(prefix.shape), where=max_len > 0)
+
+    # ------------------------------------------------
+    # BEST MATCH (first best candidate wins, like the loops)
+    # ------------------------------------------------
+    def _best(self, matrix_fn, queries):
+        results = []
+        for start in range(0, len(queries), BATCH_SIZE):
+            chunk = queries[start:start + BATCH_SIZE]
+            scores = matrix_fn(chunk)
+            if scores.shape[1] == 0:
+                results.extend((0, None) for _ in chunk)
+                continue
+            best = scores.argmax(axis=1)
+            for row, col in enumerate(best):
+                score = float(scores[row, col])
+                results.append((score, self.ids[col]) if score > 0 else (0, None))
+        return results
+
+    def best_similarity_batch(self, queries):
+        """[(best_score, best_id), ...] for each query."""
+        return self._best(self.similarity_matrix, list(queries))
+
+    def best_prefix_batch(self, queries):
+        """[(best_prefix, best_id), ...] for each query."""
+        return self._best(self.prefix_matrix, list(queries))
+
+    def best_similarity(self, query):
+        return self.best_similarity_batch([query])[0]
+
+    def best_prefix(self, query):
+        return self.best_prefix_batch([query])[0]
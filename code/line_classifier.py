@@ -0,0 +1,169 @@
+import re
+import sys
+import time
+
+# ----------------------------------------------------
+# PATHS
+# ----------------------------------------------------
+INPUT_TXT = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process\pdf_to_text.txt"
+
+# ----------------------------------------------------
+# TOKEN TYPES
+# ----------------------------------------------------
+HEADER_DATE = "HEADER_DATE"
+SERVER = "SERVER"
+BILL_ID = "BILL_ID"
+ITEM = "ITEM"
+TOTAL = "TOTAL"
+PAYMENT = "PAYMENT"
+OTHER = "OTHER"
+
+# ----------------------------------------------------
+# LEGACY PATTERNS (copied from EXTRACT_ID / get_the_item / bill_total)
+# ----------------------------------------------------
+server_pattern = re.compile(r"^\d{1,3}\.[A-Za-zÀ-ÖØ-öø-ÿ \-']+$")
+date_pattern = re.compile(r"^\d{1,2}/\d{1,2}/\d{2}\s+\d{1,2}:\d{2}$")
+bill_id_pattern = re.compile(r"(\d{5})\s*\(\d{5}\)")
+table_pattern = re.compile(r"Table#(\d+)", re.IGNORECASE)
+fp_pattern = re.compile(r"FP\s*$")
+total_pattern = re.compile(r"^TOTAL\s+.*?([\d]+\.\d{2})", re.IGNORECASE)
+payment_pattern = re.compile(r"([\d]+\.\d{2})\s*$")
+
+# ----------------------------------------------------
+# COMBINED PATTERN
+# Priority is the one the scripts use:
+# bill id > item > total > date > server > payment.
+# Bill id / item / total are settled by cheap checks in
+# classify_line(); everything else goes through one
+# anchored alternation.
+# ----------------------------------------------------
+LINE_PATTERN = re.compile(
+    r"""^(?:
+        (?P<date>\d{1,2}/\d{1,2}/\d{2}\s+\d{1,2}:\d{2})$
+      | \d{1,3}\.(?P<server>[A-Za-zÀ-ÖØ-öø-ÿ \-']+)$
+      | .*?(?P<payment>\d+\.\d{2})\s*$
+    )""",
+    re.X,
+)
+
+
+def classify_line(line):
+    """
+    Return (token, value) for one line of pdf_to_text.txt.
+
+    BILL_ID     -> (bill_id, table_id)
+    HEADER_DATE -> "d/m/yy h:mm"
+    SERVER      -> server name (after "N.")
+    ITEM        -> stripped line
+    TOTAL       -> amount string
+    PAYMENT     -> amount string
+    OTHER       -> None
+    """
+    s = line.strip()
+    if not s:
+        return OTHER, None
+
+    # ----------- CHEAP CHECKS FIRST -----------
+    # Bill id lines always carry "(NNNNN)"
+    if "(" in s:
+        match = bill_id_pattern.search(s)
+        if match:
+            tmatch = table_pattern.search(s)
+            table_id = int(tmatch.group(1)) if tmatch else 0
+            return BILL_ID, (match.group(1), table_id)
+
+    if s.endswith("FP"):
+        return ITEM, s
+
+    if s[:5].upper() == "TOTAL":
+        t = total_pattern.match(s)
+        if t:
+            return TOTAL, t.group(1)
+
+    # Date/server lines start with a digit, date/payment lines end with one
+    if not s[0].isdigit() and not s[-1].isdigit():
+        return OTHER, None
+
+    # ----------- SINGLE ALTERNATION -----------
+    m = LINE_PATTERN.match(s)
+    if m is None:
+        return OTHER, None
+
+    kind = m.lastgroup
+    if kind == "date":
+        return HEADER_DATE, m.group("date")
+    if kind == "server":
+        return SERVER, m.group("server").strip()
+    if kind == "payment":
+        return PAYMENT, m.group("payment")
+
+    return OTHER, None
+
+
+def classify_lines(lines):
+    """Yield (token, value) for every line, in order."""
+    for line in lines:
+        yield classify_line(line)
+
+
+# ----------------------------------------------------
+# LEGACY (per-script) CLASSIFICATION — used for the benchmark
+# ----------------------------------------------------
+def classify_line_legacy(line):
+    s = line.strip()
+
+    match = bill_id_pattern.search(s)
+    if match:
+        tmatch = table_pattern.search(s)
+        table_id = int(tmatch.group(1)) if tmatch else 0
+        return BILL_ID, (match.group(1), table_id)
+    if fp_pattern.search(s):
+        return ITEM, s
+    t = total_pattern.search(s)
+    if t:
+        return TOTAL, t.group(1)
+    if date_pattern.match(s):
+        return HEADER_DATE, s
+    if server_pattern.match(s):
+        return SERVER, s.split(".", 1)[1].strip()
+    p = payment_pattern.search(s)
+    if p:
+        return PAYMENT, p.group(1)
+    return OTHER, None
+
+
+def benchmark(lines, repeat=5):
+    """Time both classifiers over the same lines and check they agree."""
+    for line in lines:
+        new = classify_line(line)
+        old = classify_line_legacy(line)
+        if new != old:
+            raise AssertionError(f"Classifier mismatch on {line!r}: {new} != {old}")
+
+    results = {}
+    for name, fn in (("legacy", classify_line_legacy), ("combined", classify_line)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for line in lines:
+                fn(line)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+
+    return results
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else INPUT_TXT
+
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.rstrip("\n") for line in f]
+
+    results = benchmark(lines)
+    for name, elapsed in results.items():
+        rate = len(lines) / elapsed if elapsed > 0 else float("inf")
+        print(f"{name:<9} {elapsed * 1000:8.1f} ms  ({rate:,.0f} lines/s)")
+
+    if results["combined"] > 0:
+        print(f"Speedup: {results['legacy'] / results['combined']:.2f}x over {len(lines)} lines")
@@ -0,0 +1,342 @@
+import os
+import re
+import csv
+import math
+import time
+import sqlite3
+import argparse
+
+# ----------------------------------------------------
+# Embedded warehouse: sql/schema_setup.sql + sql/analysis_query.sql
+# on SQLite, no database server needed.
+#   1. schema_setup.sql is run through a small dialect shim
+#      (GENERATED ALWAYS AS IDENTITY, SERIAL, ::numeric; CEIL is
+#      registered as a function; LIKE made case-sensitive as in
+#      Postgres)
+#   2. the pipeline CSVs are bulk-loaded in one transaction, then
+#      the join/filter indexes are created
+#   3. transaction_25 (the qualified bills, see APPENDIX "Data
+#      Filtering") is built from the loaded tables
+#   4. analysis_query.sql runs as written; each result set is
+#      saved as warehouse_results/query_<n>.csv
+#
+#   python local_warehouse.py                       build + run
+#   python local_warehouse.py --postgres "dbname=…" also time the
+#       same statements on Postgres (psycopg2) and compare results
+#       and latency. Nothing is loaded there: the database must
+#       already hold schema_setup.sql, the same CSVs and a built
+#       transaction_25, or the results will not match
+# ----------------------------------------------------
+
+# ----------------------------------------------------
+# PATHS
+# ----------------------------------------------------
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SQL_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), "sql")
+SCHEMA_SQL = os.path.join(SQL_DIR, "schema_setup.sql")
+ANALYSIS_SQL = os.path.join(SQL_DIR, "analysis_query.sql")
+
+PROCESS_DIR = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process"
+TABLE_DIR = r"D:\TABLE FINAL"
+DB_PATH = os.path.join(PROCESS_DIR, "warehouse.sqlite3")
+RESULTS_DIR = os.path.join(PROCESS_DIR, "warehouse_results")
+
+
+def sources(process_dir, table_dir):
+    """table -> CSV it is loaded from (missing files are skipped)."""
+    return {
+        "category": os.path.join(table_dir, "category.csv"),
+        "employee": os.path.join(table_dir, "Employee.csv"),
+        "item": os.path.join(table_dir, "item_id.csv"),
+        "bill_id": os.path.join(process_dir, "bill_id.csv"),
+        "bill_items": os.path.join(process_dir, "bill_items.csv"),
+        "bill_total": os.path.join(process_dir, "bill_total.csv"),
+        "bill_load": os.path.join(process_dir, "bill_load.csv"),
+    }
+
+
+SOURCES = sources(PROCESS_DIR, TABLE_DIR)
+
+# ----------------------------------------------------
+# CONFIG
+# ----------------------------------------------------
+# transaction_25: summer 2025, at least one food item, positive check
+PERIOD = ("2025-06-01", "2025-10-31")
+FOOD_CATEGORIES = (1, 2)     # appetizers, mains (the party-size categories)
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_bill_id_date ON bill_id (date)",
+    "CREATE INDEX IF NOT EXISTS ix_bill_id_employee ON bill_id (employee_id)",
+    "CREATE INDEX IF NOT EXISTS ix_bill_items_bill_item ON bill_items (bill_id, item_id)",
+    "CREATE INDEX IF NOT EXISTS ix_bill_items_item ON bill_items (item_id)",
+    "CREATE INDEX IF NOT EXISTS ix_bill_total_bill ON bill_total (bill_id)",
+    "CREATE INDEX IF NOT EXISTS ix_item_category ON item (category_id)",
+]
+
+TRANSACTION_SQL = f"""
+CREATE TABLE transaction_25 AS
+SELECT b.bill_id, bt.total
+FROM bill_id b
+JOIN bill_total bt ON bt.bill_id = b.bill_id
+WHERE b.date BETWEEN '{PERIOD[0]}' AND '{PERIOD[1]}'
+  AND bt.total > 0
+  AND EXISTS (
+      SELECT 1 FROM bill_items bi JOIN item i ON i.item_id = bi.item_id
+      WHERE bi.bill_id = b.bill_id AND i.category_id IN ({", ".join(map(str, FOOD_CATEGORIES))})
+  )
+"""
+
+REPEAT = 5          # timed runs per statement in the benchmark
+FLOAT_TOLERANCE = 1e-6
+
+# ----------------------------------------------------
+# DIALECT SHIM (Postgres -> SQLite)
+# ----------------------------------------------------
+SHIM = [
+    (re.compile(r"--[^\n]*"), ""),                                           # comments
+    (re.compile(r"\s+GENERATED\s+ALWAYS\s+AS\s+IDENTITY", re.I), ""),       # INTEGER PRIMARY KEY is the rowid
+    (re.compile(r"\bSERIAL\s+PRIMARY\s+KEY", re.I), "INTEGER PRIMARY KEY"),
+    (re.compile(r"::\s*(numeric|decimal|integer|int|bigint|real|float8?|double precision|text|date)\b", re.I), ""),
+]
+
+
+def translate(sql):
+    for pattern, repl in SHIM:
+        sql = pattern.sub(repl, sql)
+    return sql
+
+
+def split_statements(sql):
+    """Statements of a script, in order (comments already removed)."""
+    statements, buf = [], ""
+    for line in sql.splitlines(keepends=True):
+        buf += line
+        if sqlite3.complete_statement(buf):
+            if buf.strip().strip(";").strip():
+                statements.append(buf.strip())
+            buf = ""
+    if buf.strip():
+        statements.append(buf.strip())
+    return statements
+
+
+def read_statements(path, dialect="sqlite"):
+    with open(path, "r", encoding="utf-8") as f:
+        sql = f.read()
+    if dialect == "sqlite":
+        return split_statements(translate(sql))
+    # Postgres: the text as written, minus comments, split the same way
+    return split_statements(SHIM[0][0].sub("", sql))
+
+
+def _ceil(value):
+    return None if value is None else math.ceil(value)
+
+
+def connect(path=None):
+    conn = sqlite3.connect(path or DB_PATH)
+    conn.create_function("CEIL", 1, _ceil, deterministic=True)
+    conn.create_function("CEILING", 1, _ceil, deterministic=True)
+    conn.execute("PRAGMA case_sensitive_like = ON")     # Postgres LIKE is case-sensitive
+    return conn
+
+# ----------------------------------------------------
+# BULK LOAD
+# ----------------------------------------------------
+def _value(v):
+    if v is None:
+        return None
+    v = v.strip()
+    if v == "":
+        return None
+    if v in ("True", "False"):
+        return int(v == "True")
+    return v
+
+
+def load_csv(conn, table, path):
+    """Insert the CSV columns the table also has; return the row count."""
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        keep = [i for i, name in enumerate(header) if name in columns]
+        if not keep:
+            return 0
+        names = ", ".join(f'"{header[i]}"' for i in keep)
+        marks = ", ".join("?" for _ in keep)
+        cur = conn.executemany(
+            f'INSERT OR IGNORE INTO "{table}" ({names}) VALUES ({marks})',
+            ([_value(row[i]) if i < len(row) else None for i in keep] for row in reader))
+        return cur.rowcount
+
+
+def build(db_path=None):
+    """Create a fresh warehouse; return (connection, {table: rows loaded})."""
+    # resolved per call: run_pipeline / venue_shards set DB_PATH after import
+    db_path = db_path or DB_PATH
+    if db_path != ":memory:" and os.path.exists(db_path):
+        os.remove(db_path)
+    conn = connect(db_path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+
+    for statement in read_statements(SCHEMA_SQL):
+        conn.execute(statement)
+
+    loaded = {}
+    with conn:
+        for table, path in SOURCES.items():
+            if os.path.exists(path):
+                loaded[table] = load_csv(conn, table, path)
+        # categories referenced by items but missing from category.csv
+        conn.execute("INSERT OR IGNORE INTO category (category_id, category_name) "
+                     "SELECT DISTINCT category_id, 'category ' || category_id FROM item")
+        for statement in INDEXES:
+            conn.execute(statement)
+        conn.execute("DROP TABLE IF EXISTS transaction_25")
+        conn.execute(TRANSACTION_SQL)
+        conn.execute("CREATE INDEX ix_transaction_25_bill ON transaction_25 (bill_id)")
+    conn.execute("ANALYZE")
+    return conn, loaded
+
+# ----------------------------------------------------
+# RUN ANALYSIS
+# ----------------------------------------------------
+def run_script(cursor, statements, commit=None):
+    """Execute statements in order; return [(n, statement, columns, rows, seconds)]."""
+    results = []
+    for n, statement in enumerate(statements, 1):
+        start = time.perf_counter()
+        cursor.execute(statement)
+        rows = cursor.fetchall() if cursor.description else None
+        elapsed = time.perf_counter() - start
+        columns = [d[0] for d in cursor.description] if cursor.description else None
+        results.append((n, statement, columns, rows, elapsed))
+    if commit:
+        commit()
+    return results
+
+
+def write_results(results, out_dir=None):
+    out_dir = out_dir or RESULTS_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    written = 0
+    for n, _, columns, rows, _ in results:
+        if columns is None:
+            continue
+        with open(os.path.join(out_dir, f"query_{n}.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        written += 1
+    return written
+
+
+def _first_line(statement):
+    line = " ".join(statement.split())
+    return line if len(line) <= 60 else line[:57] + "..."
+
+# ----------------------------------------------------
+# BENCHMARK AGAINST POSTGRES
+# ----------------------------------------------------
+def same_rows(a, b):
+    if a is None or b is None:
+        return a is b
+    if len(a) != len(b):
+        return False
+    for ra, rb in zip(a, b):
+        if len(ra) != len(rb):
+            return False
+        for x, y in zip(ra, rb):
+            if x is None or y is None:
+                if x is not y:
+                    return False
+                continue
+            try:
+                if abs(float(x) - float(y)) > FLOAT_TOLERANCE * max(1.0, abs(float(y))):
+                    return False
+            except (TypeError, ValueError):
+                if str(x) != str(y):
+                    return False
+    return True
+
+
+def timed_runs(run_once, repeat):
+    """Median seconds per statement over repeat runs, plus the last run's results."""
+    runs = [run_once() for _ in range(repeat)]
+    medians = []
+    for k in range(len(runs[0])):
+        times = sorted(run[k][4] for run in runs)
+        medians.append(times[len(times) // 2])
+    return medians, runs[-1]
+
+
+def benchmark(conn, dsn, repeat=REPEAT):
+    import psycopg2     # only needed for the comparison
+
+    lite_statements = read_statements(ANALYSIS_SQL, "sqlite")
+    pg_statements = read_statements(ANALYSIS_SQL, "postgres")
+
+    lite_cur = conn.cursor()
+    lite_times, lite_results = timed_runs(
+        lambda: run_script(lite_cur, lite_statements, conn.commit), repeat)
+
+    pg = psycopg2.connect(dsn)
+    try:
+        pg_cur = pg.cursor()
+        pg_times, pg_results = timed_runs(
+            lambda: run_script(pg_cur, pg_statements, pg.commit), repeat)
+    finally:
+        pg.close()
+
+    print(f"{'#':>3}  {'sqlite ms':>10}  {'postgres ms':>11}  {'same':>5}  statement")
+    all_same = True
+    for k, (lite, pgr) in enumerate(zip(lite_results, pg_results)):
+        same = same_rows(lite[3], pgr[3])
+        all_same &= same
+        print(f"{lite[0]:>3}  {lite_times[k] * 1000:>10.2f}  {pg_times[k] * 1000:>11.2f}  "
+              f"{'yes' if same else 'NO':>5}  {_first_line(lite[1])}")
+    print(f"total: sqlite {sum(lite_times) * 1000:.1f} ms, postgres {sum(pg_times) * 1000:.1f} ms "
+          f"(median of {repeat})")
+    return all_same
+
+# ----------------------------------------------------
+# MAIN
+# ----------------------------------------------------
+def run(db_path=None):
+    """Build the warehouse and run analysis_query.sql (pipeline entry point)."""
+    db_path = db_path or DB_PATH
+    start = time.perf_counter()
+    conn, loaded = build(db_path)
+    load_seconds = time.perf_counter() - start
+
+    results = run_script(conn.cursor(), read_statements(ANALYSIS_SQL), conn.commit)
+    written = write_results(results, RESULTS_DIR)
+
+    print("loaded: " + ", ".join(f"{t}={n}" for t, n in loaded.items()) + f" in {load_seconds:.2f}s")
+    for n, statement, columns, rows, elapsed in results:
+        shape = f"{len(rows)} row(s)" if columns is not None else "ok"
+        print(f"  [{n}] {elapsed * 1000:8.2f} ms  {shape:>10}  {_first_line(statement)}")
+    print(f"{written} result set(s) → {RESULTS_DIR}")
+    return conn
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the SQL analysis on an embedded SQLite warehouse.")
+    parser.add_argument("--db", default=None, help="SQLite file to (re)build, or :memory: (default: DB_PATH)")
+    parser.add_argument("--postgres", metavar="DSN", help="also time the statements on this preloaded Postgres database")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per statement in the benchmark")
+    args = parser.parse_args(argv)
+
+    conn = run(args.db)
+    try:
+        if args.postgres:
+            return 0 if benchmark(conn, args.postgres, args.repeat) else 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,181 @@
+import os
+import csv
+import pickle
+import hashlib
+from datetime import datetime
+from types import MappingProxyType
+
+# ----------------------------------------------------
+# Shared loader for the small reference CSVs (item_id.csv,
+# Employee.csv, ...). Built with the csv module (no pandas),
+# frozen, and snapshotted to a pickle keyed by the file's
+# content hash + the normalizer's code, so every script and
+# worker process reloads it without re-parsing.
+# ----------------------------------------------------
+
+SNAPSHOT_DIR_NAME = "__lookup_cache__"
+SNAPSHOT_VERSION = 1
+
+# week_id_table.csv timestamps that are not ISO (e.g. re-saved from
+# Excel); slashes are month first, as pandas.to_datetime reads them
+WEEK_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M",
+                     "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M", "%Y-%m-%d")
+
+
+class LookupTable:
+    """
+    fieldnames  tuple of CSV columns
+    rows        tuple of read-only row mappings, in file order
+    ids / names / norm_names   per-row columns (None for an empty name)
+    by_id       id -> row
+    by_name     raw name -> id
+    normalized  normalized name -> id (last row wins, like dict(zip(...)))
+    positions   normalized name -> row index
+    """
+
+    __slots__ = ("fieldnames", "rows", "ids", "names", "norm_names",
+                 "by_id", "by_name", "normalized", "positions")
+
+    def __init__(self, fieldnames, rows, ids, names, norm_names):
+        self.fieldnames = fieldnames
+        self.rows = tuple(MappingProxyType(dict(zip(fieldnames, r))) for r in rows)
+        self.ids = ids
+        self.names = names
+        self.norm_names = norm_names
+
+        by_name = {}
+        normalized = {}
+        positions = {}
+        for pos, (row_id, name, norm) in enumerate(zip(ids, names, norm_names)):
+            if name is None:
+                continue
+            by_name[name] = row_id
+            normalized[norm] = row_id
+            positions[norm] = pos
+
+        self.by_id = MappingProxyType({row_id: row for row_id, row in zip(ids, self.rows)})
+        self.by_name = MappingProxyType(by_name)
+        self.normalized = MappingProxyType(normalized)
+        self.positions = MappingProxyType(positions)
+
+    def __len__(self):
+        return len(self.rows)
+
+# ----------------------------------------------------
+# KEYS
+# ----------------------------------------------------
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def normalizer_digest(normalizer):
+    """Changes whenever the normalizer's code changes (stale snapshots are ignored)."""
+    if normalizer is None:
+        return "none"
+    code = normalizer.__code__
+    h = hashlib.sha256(code.co_code)
+    h.update(repr(code.co_consts).encode("utf-8"))
+    h.update(repr(code.co_names).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def snapshot_path(path, key):
+    folder = os.path.join(os.path.dirname(os.path.abspath(path)), SNAPSHOT_DIR_NAME)
+    return os.path.join(folder, f"{os.path.basename(path)}.{key}.pkl")
+
+# ----------------------------------------------------
+# BUILD / SNAPSHOT
+# ----------------------------------------------------
+def _convert(value, id_type):
+    try:
+        return id_type(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _read_csv(path, name_col, id_col, normalizer, id_type):
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        fieldnames = tuple(reader.fieldnames or ())
+        rows, ids, names, norm_names = [], [], [], []
+        for r in reader:
+            rows.append(tuple(r.get(c) for c in fieldnames))
+            ids.append(_convert(r.get(id_col), id_type))
+            name = r.get(name_col)
+            name = name if name else None
+            names.append(name)
+            norm_names.append(normalizer(name) if (normalizer and name) else name)
+
+    return {
+        "fieldnames": fieldnames,
+        "rows": tuple(rows),
+        "ids": tuple(ids),
+        "names": tuple(names),
+        "norm_names": tuple(norm_names),
+    }
+
+
+def _write_snapshot(path, data):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # read-only folder: just rebuild next time
+
+
+def _read_snapshot(path):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+# ----------------------------------------------------
+# PUBLIC
+# ----------------------------------------------------
+_memo = {}
+
+
+def load_table(path, name_col="name", id_col="item_id", normalizer=None, id_type=str):
+    """Return a LookupTable for the CSV at path (memoized, snapshot-backed)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size,
+                name_col, id_col, normalizer_digest(normalizer), id_type.__name__)
+    if memo_key in _memo:
+        return _memo[memo_key]
+
+    key = hashlib.sha256(
+        "|".join([file_digest(path), *map(str, memo_key[3:]), str(SNAPSHOT_VERSION)]).encode("utf-8")
+    ).hexdigest()[:24]
+    snap = snapshot_path(path, key)
+
+    data = _read_snapshot(snap)
+    if data is None:
+        data = _read_csv(path, name_col, id_col, normalizer, id_type)
+        _write_snapshot(snap, data)
+
+    table = LookupTable(data["fieldnames"], data["rows"], data["ids"], data["names"], data["norm_names"])
+    _memo[memo_key] = table
+    return table
+
+
+def parse_week_time(value):
+    """week_start / week_end cell -> datetime, None when unreadable."""
+    value = (value or "").strip()
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    for fmt in WEEK_TIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
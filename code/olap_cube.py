@@ -0,0 +1,325 @@
+import os
+import sys
+import json
+import hashlib
+
+from lookup_tables import load_table
+from reconcile import load_weeks, assign_weeks
+from delta_outputs import OP_FIELD, changes_path, read_rows
+
+# ----------------------------------------------------
+# Weekly summary cube for the dashboards.
+# Facts (bill_items x bill_id x item) are aggregated once at
+#   (week_id, date, volume_category, employee_id, category_id)
+# and stored in cube_items.csv, with the bill measures
+# (bill_id x bill_total, bills without lines included) at
+#   (week_id, date, volume_category, employee_id)
+# in cube_bills.csv. Every coarser view is a roll-up (sum)
+# of these two tables, so the fact CSVs are not read again.
+# Refresh is incremental:
+#   - nothing is read when no fact file changed since the
+#     last run (size + mtime kept in cube_state.json);
+#   - after a --delta run, only the weeks of the bills listed
+#     in the <name>_changes.csv files are loaded and hashed;
+#   - otherwise every week is hashed, and a week is still
+#     re-aggregated only when the digest of its facts changed.
+# ----------------------------------------------------
+
+# ----------------------------------------------------
+# PATHS
+# ----------------------------------------------------
+PROCESS_DIR = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process"
+BILL_ID_CSV = os.path.join(PROCESS_DIR, "bill_id.csv")
+BILL_ITEMS_CSV = os.path.join(PROCESS_DIR, "bill_items.csv")
+BILL_TOTAL_CSV = os.path.join(PROCESS_DIR, "bill_total.csv")
+ITEM_TABLE = r"D:\TABLE FINAL\item_id.csv"
+WEEK_TABLE = r"D:\Vente_extract\Feed\week_id_table.csv"
+
+CUBE_ITEMS_CSV = os.path.join(PROCESS_DIR, "cube_items.csv")
+CUBE_BILLS_CSV = os.path.join(PROCESS_DIR, "cube_bills.csv")
+CUBE_STATE = os.path.join(PROCESS_DIR, "cube_state.json")
+
+# a _changes.csv is written just before its CSV is replaced;
+# one older than this (seconds) belongs to an earlier write
+CHANGES_SLACK_S = 60
+CHUNK_ROWS = 200_000
+
+# ----------------------------------------------------
+# SHIFT INTENSITY (bills per night, see APPENDIX.md)
+# ----------------------------------------------------
+VOLUME_SLOW_MAX = 39     # <= 39 -> 1 (slow)
+VOLUME_HIGH_MIN = 76     # >= 76 -> 3 (high), else 2
+
+BILL_DIMS = ["week_id", "date", "volume_category", "employee_id"]
+ITEM_DIMS = BILL_DIMS + ["category_id"]
+
+# additive measures; "bills" in the item cube counts the bills
+# holding that category, so it only sums while category_id is kept
+ITEM_MEASURES = ["quantity", "lines", "revenue", "bills"]
+BILL_MEASURES = ["bills", "quantity", "revenue"]
+
+# ----------------------------------------------------
+# LOAD FACTS
+# ----------------------------------------------------
+def volume_category(bills_per_day):
+    import pandas as pd
+
+    cat = pd.Series(2, index=bills_per_day.index)
+    cat[bills_per_day <= VOLUME_SLOW_MAX] = 1
+    cat[bills_per_day >= VOLUME_HIGH_MIN] = 3
+    return cat
+
+
+def load_items(path=ITEM_TABLE):
+    import pandas as pd
+
+    table = load_table(path, "name", "item_id", id_type=int)
+    return pd.DataFrame({
+        "item_id": list(table.ids),
+        "category_id": pd.to_numeric([r.get("category_id") for r in table.rows], errors="coerce"),
+        "price": pd.to_numeric([r.get("price") for r in table.rows], errors="coerce"),
+    })
+
+
+def load_bills():
+    """Bill headers with their week and day volume."""
+    import pandas as pd
+
+    bills = pd.read_csv(BILL_ID_CSV, dtype={"bill_id": str, "date": str, "time": str})
+    bills = assign_weeks(bills, load_weeks(WEEK_TABLE))
+
+    # volume is a property of the day, counted over every bill of that date
+    per_day = bills.groupby("date")["bill_id"].count()
+    bills["volume_category"] = bills["date"].map(volume_category(per_day))
+    return bills[["bill_id", "week_id", "date", "volume_category", "employee_id"]]
+
+
+def read_for_bills(path, bill_ids, dtype):
+    """Rows of a bill_id-keyed CSV; only the given bills unless bill_ids is None."""
+    import pandas as pd
+
+    if bill_ids is None:
+        return pd.read_csv(path, dtype=dtype)
+    chunks = [c[c["bill_id"].isin(bill_ids)] for c in pd.read_csv(path, dtype=dtype, chunksize=CHUNK_ROWS)]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def load_facts(bills, bill_ids=None):
+    """Bill lines with category/price, and bill totals, for the given bills."""
+    import pandas as pd
+
+    lines = read_for_bills(BILL_ITEMS_CSV, bill_ids, {"bill_id": str})
+    lines = lines.merge(load_items(ITEM_TABLE), on="item_id", how="left")
+    lines["revenue"] = lines["quantity"] * lines["price"].fillna(0.0)
+    lines = lines.merge(bills, on="bill_id")
+
+    totals = read_for_bills(BILL_TOTAL_CSV, bill_ids, {"bill_id": str})[["bill_id", "total"]]
+    totals["total"] = pd.to_numeric(totals["total"], errors="coerce")
+    return lines, totals
+
+# ----------------------------------------------------
+# INCREMENTAL STATE
+# ----------------------------------------------------
+def week_digests(bills, lines, totals):
+    """week_id -> digest of every fact row that lands in that week."""
+    import pandas as pd
+
+    def digest(frame):
+        return pd.util.hash_pandas_object(frame, index=False).values.tobytes()
+
+    cols = ["bill_id", "item_id", "quantity", "category_id", "price"]
+    lines = dict(tuple(lines[cols + ["week_id"]].groupby("week_id")))
+    totals = totals.merge(bills[["bill_id", "week_id"]], on="bill_id")
+    totals = dict(tuple(totals.groupby("week_id")))
+
+    digests = {}
+    for week_id, b in bills.groupby("week_id"):
+        h = hashlib.sha1(digest(b.sort_values("bill_id")))
+        if week_id in lines:
+            h.update(digest(lines[week_id][cols].sort_values(["bill_id", "item_id"])))
+        if week_id in totals:
+            h.update(digest(totals[week_id][["bill_id", "total"]].sort_values("bill_id")))
+        digests[str(int(week_id))] = h.hexdigest()
+    return digests
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def fact_files():
+    return {"bill_id": BILL_ID_CSV, "bill_items": BILL_ITEMS_CSV, "bill_total": BILL_TOTAL_CSV,
+            "item": ITEM_TABLE, "week": WEEK_TABLE}
+
+
+def file_stamp(path):
+    """[size, mtime_ns] of a file, or None when it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def changed_bills(state, stamps):
+    """
+    bill_ids named in the _changes.csv files written since the last
+    refresh, or None when the changed facts cannot be narrowed down
+    (a table changed, a file was rewritten without --delta, ...).
+    """
+    previous = state.get("sources", {})
+    consumed = state.get("changes", {})
+    if any(stamps[k] != previous.get(k) for k in ("item", "week")):
+        return None
+
+    bill_ids = set()
+    for name in ("bill_id", "bill_items", "bill_total"):
+        if stamps[name] == previous.get(name):
+            continue
+        if stamps[name] is None or previous.get(name) is None:
+            return None
+        delta = changes_path(fact_files()[name])
+        stamp = file_stamp(delta)
+        if stamp is None or stamp == consumed.get(name):
+            return None
+        # the changes must describe this very write of the CSV
+        age_ns = stamps[name][1] - stamp[1]
+        if not 0 <= age_ns <= CHANGES_SLACK_S * 1_000_000_000:
+            return None
+        rows = read_rows(delta)
+        # a moved or removed bill header leaves its old week unknown
+        if name == "bill_id" and any(r[OP_FIELD] != "I" for r in rows):
+            return None
+        bill_ids.update(r["bill_id"] for r in rows)
+    return bill_ids
+
+
+def read_cube(path, dims, measures):
+    import pandas as pd
+
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=dims + measures)
+    return pd.read_csv(path, dtype={"date": str})
+
+# ----------------------------------------------------
+# BUILD
+# ----------------------------------------------------
+def aggregate(bills, lines, totals):
+    """Facts -> (item cube, bill cube) for the given bills."""
+    items = (lines.groupby(ITEM_DIMS, dropna=False)
+             .agg(quantity=("quantity", "sum"), lines=("item_id", "size"),
+                  revenue=("revenue", "sum"), bills=("bill_id", "nunique"))
+             .reset_index())
+
+    # one row per bill: its lines (if any) and its bill_total amount,
+    # falling back to the priced lines when bill_total has no row
+    per_bill = lines.groupby("bill_id").agg(quantity=("quantity", "sum"), line_revenue=("revenue", "sum"))
+    per_bill = (bills.merge(per_bill, on="bill_id", how="left")
+                .merge(totals.drop_duplicates("bill_id"), on="bill_id", how="left"))
+    per_bill["quantity"] = per_bill["quantity"].fillna(0)
+    per_bill["revenue"] = per_bill["total"].fillna(per_bill["line_revenue"]).fillna(0.0)
+
+    bills = (per_bill.groupby(BILL_DIMS, dropna=False)
+             .agg(bills=("bill_id", "nunique"), quantity=("quantity", "sum"),
+                  revenue=("revenue", "sum"))
+             .reset_index())
+    return items, bills
+
+
+def refresh(force=False):
+    """Re-aggregate only the weeks whose facts changed. Returns (item cube, bill cube)."""
+    import pandas as pd
+
+    state = {} if force else load_state(CUBE_STATE)
+    stamps = {name: file_stamp(path) for name, path in fact_files().items()}
+    have_cube = os.path.exists(CUBE_ITEMS_CSV) and os.path.exists(CUBE_BILLS_CSV)
+    if have_cube and state.get("sources") == stamps:
+        print("Cube up to date: no fact file changed since the last refresh")
+        return (read_cube(CUBE_ITEMS_CSV, ITEM_DIMS, ITEM_MEASURES),
+                read_cube(CUBE_BILLS_CSV, BILL_DIMS, BILL_MEASURES))
+
+    bills = load_bills()
+    touched = changed_bills(state, stamps) if have_cube else None
+    if touched is not None:
+        weeks = set(bills.loc[bills["bill_id"].isin(touched), "week_id"])
+        bills = bills[bills["week_id"].isin(weeks)]
+    lines, totals = load_facts(bills, None if touched is None else set(bills["bill_id"]))
+
+    digests = week_digests(bills, lines, totals)
+    previous = state.get("weeks", {})
+    if touched is not None:
+        # weeks outside the changes were not loaded; they keep their digest
+        digests = {**previous, **digests}
+
+    changed = {w for w, d in digests.items() if previous.get(w) != d}
+    dropped = set(previous) - set(digests)
+    keep = set(digests) - changed
+
+    items_cube = read_cube(CUBE_ITEMS_CSV, ITEM_DIMS, ITEM_MEASURES)
+    bills_cube = read_cube(CUBE_BILLS_CSV, BILL_DIMS, BILL_MEASURES)
+    if not have_cube:
+        changed, keep = set(digests), set()
+
+    keep_ids = {int(w) for w in keep}
+    changed_ids = {int(w) for w in changed}
+    new_items, new_bills = aggregate(bills[bills["week_id"].isin(changed_ids)],
+                                     lines[lines["week_id"].isin(changed_ids)], totals)
+    items_cube = pd.concat([items_cube[items_cube["week_id"].isin(keep_ids)], new_items], ignore_index=True)
+    bills_cube = pd.concat([bills_cube[bills_cube["week_id"].isin(keep_ids)], new_bills], ignore_index=True)
+
+    items_cube = items_cube.sort_values(ITEM_DIMS, ignore_index=True)
+    bills_cube = bills_cube.sort_values(BILL_DIMS, ignore_index=True)
+    items_cube.to_csv(CUBE_ITEMS_CSV, index=False, encoding="utf-8")
+    bills_cube.to_csv(CUBE_BILLS_CSV, index=False, encoding="utf-8")
+    consumed = {name: file_stamp(changes_path(fact_files()[name])) for name in ("bill_id", "bill_items", "bill_total")}
+    save_state(CUBE_STATE, {"weeks": digests, "sources": stamps, "changes": consumed})
+
+    print(f"Cube refreshed: {len(changed)} week(s) rebuilt, {len(keep)} kept, {len(dropped)} dropped")
+    print(f"  {CUBE_ITEMS_CSV} ({len(items_cube)} cells)")
+    print(f"  {CUBE_BILLS_CSV} ({len(bills_cube)} cells)")
+    return items_cube, bills_cube
+
+# ----------------------------------------------------
+# ROLL-UP
+# ----------------------------------------------------
+def rollup(items_cube, bills_cube, dims):
+    """
+    Aggregate the cube to any subset of ITEM_DIMS, e.g.
+        rollup(items, bills, ["employee_id", "volume_category"])
+    Bill counts come from the bill cube whenever category_id is
+    rolled away, since a bill can hold several categories.
+    """
+    dims = list(dims)
+    unknown = set(dims) - set(ITEM_DIMS)
+    if unknown:
+        raise ValueError(f"Unknown cube dimension(s): {sorted(unknown)}")
+
+    if "category_id" in dims:
+        return items_cube.groupby(dims, as_index=False, dropna=False)[ITEM_MEASURES].sum()
+
+    if not dims:
+        totals = bills_cube[BILL_MEASURES].sum()
+        totals["lines"] = items_cube["lines"].sum()
+        return totals.to_frame().T.infer_objects()
+
+    # dropna=False keeps bills without an employee; merge matches NaN keys to NaN
+    bills = bills_cube.groupby(dims, as_index=False, dropna=False)[BILL_MEASURES].sum()
+    lines = items_cube.groupby(dims, as_index=False, dropna=False)[["lines"]].sum()
+    return bills.merge(lines, on=dims, how="left")
+
+def main():
+    refresh(force="--force" in sys.argv)
+
+
+if __name__ == "__main__":
+    main()
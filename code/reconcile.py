@@ -0,0 +1,204 @@
+import os
+import sys
+import glob
+
+# ----------------------------------------------------
+# Reconcile the per-bill outputs against the weekly
+# control totals of the POS reports:
+#   bill_total.csv  (summed by week)  vs total_sale.csv (total only)
+#   bill_items.csv  (summed by week)  vs Sales_extractor weekly item CSVs
+# Writes a discrepancy report and fails when anything is
+# outside tolerance, so it can gate the database load.
+# ----------------------------------------------------
+
+# ----------------------------------------------------
+# PATHS
+# ----------------------------------------------------
+PROCESS_DIR = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process"
+BILL_ID_CSV = os.path.join(PROCESS_DIR, "bill_id.csv")
+BILL_ITEMS_CSV = os.path.join(PROCESS_DIR, "bill_items.csv")
+BILL_TOTAL_CSV = os.path.join(PROCESS_DIR, "bill_total.csv")
+REPORT_CSV = os.path.join(PROCESS_DIR, "reconciliation_report.csv")
+
+WEEK_TABLE = r"D:\Vente_extract\Feed\week_id_table.csv"
+TOTAL_SALE_CSV = r"D:\Vente_extract\Output\total_sale.csv"
+SALES_ITEMS_GLOB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Output", "*.csv")
+
+# ----------------------------------------------------
+# TOLERANCES
+# A metric passes when |diff| <= max(ABS, REL * |control|)
+# ----------------------------------------------------
+AMOUNT_ABS_TOLERANCE = 1.00
+AMOUNT_REL_TOLERANCE = 0.005
+QUANTITY_ABS_TOLERANCE = 0.0
+
+# statuses that fail the run; a week with bills but no control total
+# (or the reverse) is not reconciled either
+FAILING_STATUSES = ("FAIL", "MISSING_BILLS", "MISSING_CONTROL")
+
+REPORT_FIELDS = ["week_id", "metric", "control", "bills", "diff", "diff_pct", "status"]
+
+
+class ReconciliationError(Exception):
+    pass
+
+# ----------------------------------------------------
+# LOAD
+# ----------------------------------------------------
+def load_weeks(path=WEEK_TABLE):
+    import pandas as pd
+
+    weeks = pd.read_csv(path, encoding="utf-8-sig")
+    weeks["week_start"] = pd.to_datetime(weeks["week_start"])
+    weeks["week_end"] = pd.to_datetime(weeks["week_end"])
+    return weeks[["week_id", "week_start", "week_end"]].sort_values("week_start")
+
+
+def assign_weeks(bills, weeks):
+    """Add week_id to bill headers from their date + time (one merge_asof)."""
+    import pandas as pd
+
+    bills = bills.copy()
+    bills["ts"] = pd.to_datetime(bills["date"] + " " + bills["time"])
+    bills = bills.sort_values("ts")
+    merged = pd.merge_asof(bills, weeks, left_on="ts", right_on="week_start", direction="backward")
+    merged.loc[merged["ts"] > merged["week_end"], "week_id"] = pd.NA
+    return merged.dropna(subset=["week_id"]).astype({"week_id": "int64"})
+
+
+def load_sales_items(pattern=SALES_ITEMS_GLOB):
+    """Weekly item quantities written by Sales_extractor (not the per-employee files)."""
+    import pandas as pd
+
+    frames = []
+    for path in sorted(glob.glob(pattern)):
+        if path.endswith(("_employee_items.csv", "_changes.csv")):
+            continue
+        df = pd.read_csv(path, encoding="utf-8-sig")
+        if {"week_id", "item_id", "quantity"} <= set(df.columns):
+            frames.append(df[["week_id", "item_id", "quantity"]])
+    if not frames:
+        return pd.DataFrame(columns=["week_id", "item_id", "quantity"])
+    sales = pd.concat(frames, ignore_index=True).dropna(subset=["week_id"])
+    return sales.astype({"week_id": "int64", "item_id": "int64"})
+
+# ----------------------------------------------------
+# COMPARE
+# ----------------------------------------------------
+def compare(control, bills, abs_tol, rel_tol):
+    """Vectorized diff/status for two aligned Series."""
+    import pandas as pd
+
+    diff = bills - control
+    limit = (control.abs() * rel_tol).clip(lower=abs_tol)
+    status = pd.Series("OK", index=control.index)
+    status[diff.abs() > limit] = "FAIL"
+    status[control.isna()] = "MISSING_CONTROL"
+    status[bills.isna()] = "MISSING_BILLS"
+    diff_pct = (diff / control.where(control != 0)).round(4)
+    return diff.round(2), diff_pct, status
+
+
+def reconcile_totals(bill_weeks, bill_totals, total_sale):
+    import pandas as pd
+
+    per_bill = bill_totals.merge(bill_weeks[["bill_id", "week_id"]], on="bill_id")
+    weekly = per_bill.groupby("week_id")["total"].sum()
+
+    # bills carry only their tax-inclusive total; t_p_s / t_v_q derived
+    # from it would be a fixed share of the same number, so only the
+    # total is checked
+    control = total_sale.set_index("week_id")["total_sale"]
+    both = pd.concat([control.rename("control"), weekly.rename("bills")], axis=1)
+
+    c, b = both["control"], both["bills"]
+    diff, diff_pct, status = compare(c, b, AMOUNT_ABS_TOLERANCE, AMOUNT_REL_TOLERANCE)
+    return pd.DataFrame({
+        "week_id": both.index, "metric": "total_sale",
+        "control": c.round(2).values, "bills": b.round(2).values,
+        "diff": diff.values, "diff_pct": diff_pct.values, "status": status.values,
+    })
+
+
+def reconcile_items(bill_weeks, bill_items, sales_items):
+    import pandas as pd
+
+    per_bill = bill_items.merge(bill_weeks[["bill_id", "week_id"]], on="bill_id")
+    bills = per_bill.groupby(["week_id", "item_id"])["quantity"].sum()
+    control = sales_items.groupby(["week_id", "item_id"])["quantity"].sum()
+
+    # only weeks both sides know about
+    weeks = set(bills.index.get_level_values(0)) & set(control.index.get_level_values(0))
+    both = pd.concat([control.rename("control"), bills.rename("bills")], axis=1)
+    both = both[both.index.get_level_values(0).isin(weeks)]
+    both = both.fillna(0.0)
+
+    diff, diff_pct, status = compare(both["control"], both["bills"], QUANTITY_ABS_TOLERANCE, 0.0)
+
+    rows = pd.DataFrame({
+        "week_id": both.index.get_level_values(0),
+        "metric": "item_qty:" + both.index.get_level_values(1).astype(str),
+        "control": both["control"].values, "bills": both["bills"].values,
+        "diff": diff.values, "diff_pct": diff_pct.values, "status": status.values,
+    })
+
+    # one summary row per week, item rows only when out of tolerance
+    summary = both.groupby(level=0).sum()
+    s_diff, s_pct, s_status = compare(summary["control"], summary["bills"], QUANTITY_ABS_TOLERANCE, 0.0)
+    weekly = pd.DataFrame({
+        "week_id": summary.index, "metric": "items_total",
+        "control": summary["control"].values, "bills": summary["bills"].values,
+        "diff": s_diff.values, "diff_pct": s_pct.values, "status": s_status.values,
+    })
+    return pd.concat([weekly, rows[rows["status"] != "OK"]], ignore_index=True)
+
+# ----------------------------------------------------
+# RUN
+# ----------------------------------------------------
+def build_report():
+    import pandas as pd
+
+    weeks = load_weeks(WEEK_TABLE)
+    bill_ids = pd.read_csv(BILL_ID_CSV, dtype={"bill_id": str, "date": str, "time": str})
+    bill_weeks = assign_weeks(bill_ids, weeks)
+
+    bill_totals = pd.read_csv(BILL_TOTAL_CSV, dtype={"bill_id": str})
+    total_sale = pd.read_csv(TOTAL_SALE_CSV, encoding="utf-8-sig")
+    report = reconcile_totals(bill_weeks, bill_totals, total_sale)
+
+    bill_items = pd.read_csv(BILL_ITEMS_CSV, dtype={"bill_id": str})
+    sales_items = load_sales_items(SALES_ITEMS_GLOB)
+    if not sales_items.empty:
+        report = pd.concat([report, reconcile_items(bill_weeks, bill_items, sales_items)],
+                           ignore_index=True)
+
+    return report.sort_values(["week_id", "metric"])[REPORT_FIELDS]
+
+
+def run():
+    """Write the report; raise ReconciliationError if any metric is out of tolerance or missing a side."""
+    report = build_report()
+    report.to_csv(REPORT_CSV, index=False, encoding="utf-8")
+
+    counts = report["status"].value_counts()
+    print(f"Reconciliation report → {REPORT_CSV}")
+    for status, n in counts.items():
+        print(f"  {status:<16} {n}")
+
+    failures = int(sum(counts.get(s, 0) for s in FAILING_STATUSES))
+    if failures:
+        raise ReconciliationError(f"{failures} metric(s) outside tolerance or missing, see {REPORT_CSV}")
+    return report
+
+
+def main():
+    try:
+        run()
+    except ReconciliationError as e:
+        print(f"FAILED: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
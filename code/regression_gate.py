@@ -0,0 +1,813 @@
+import io
+import os
+import re
+import csv
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+from datetime import date, timedelta
+from contextlib import redirect_stdout
+
+# ----------------------------------------------------
+# Differential regression gate for the optimized parsers.
+# The legacy scripts (as committed at the legacy revision, read
+# with `git show`, or taken from --legacy-dir when there is no
+# git checkout) and the current ones run on the same corpora:
+#   regression_corpora/<name>/Process/pdf_to_text.txt
+#                             tables/item_id.csv, Employee.csv
+#                             vente/Input/*.pdf, vente/Feed/*.csv
+#                             corpus.json (how it was made)
+# Every run is a fresh subprocess on a fresh copy of the corpus.
+#
+# Corpora are git-ignored and rebuilt locally: `generate` with
+# the default seed gives the synthetic corpus the committed
+# baseline was measured on; `anonymize` builds one from a real
+# run. The baseline stores each corpus.json and the legacy
+# revision under "_meta", and the gate fails when they differ.
+#
+#   1. outputs   the fact CSVs must be row-identical (same
+#                header, same rows, same order), apart from the
+#                intended changes listed in ACCEPTED_CHANGES
+#   2. speed     best time of REPEAT runs; the gate checks
+#                the speedup over legacy (same machine, same run)
+#                against the one stored in BASELINE_JSON
+#   3. memory    tracemalloc peak of one extra run, against the
+#                stored peak
+#
+#   python regression_gate.py generate            (synthetic corpus)
+#   python regression_gate.py anonymize --process D:\...\Process --tables "D:\TABLE FINAL" --vente D:\Vente_extract
+#   python regression_gate.py check [--update-baseline]
+#   common flags: --corpus-dir DIR, --legacy-rev REV (check)
+# ----------------------------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(SCRIPT_DIR, "regression_corpora")
+BASELINE_JSON = os.path.join(SCRIPT_DIR, "regression_baseline.json")
+
+# Legacy revision = last commit before the parsers were optimized:
+# --legacy-rev if given, else the full hash stored in the baseline's
+# _meta.legacy_rev, else this tag
+LEGACY_TAG = "legacy-parsers"
+CORPUS_MANIFEST = "corpus.json"
+
+REPEAT = 5
+MAX_SPEEDUP_LOSS = 0.20     # fail if speedup over legacy drops more than 20 %
+MAX_MEMORY_GROWTH = 0.25    # fail if peak memory grows more than 25 %
+
+SYNTHETIC_BILLS = 20000
+SYNTHETIC_WEEKS = 26
+SEED = 2025
+
+# run_pipeline stage -> legacy file, compared outputs, unit counted for throughput
+PARSERS = {
+    "extract_id": {
+        "legacy": "EXTRACT_ID.py",
+        "outputs": [os.path.join("Process", "bill_id.csv")],
+        "units": "lines",
+    },
+    "get_the_item": {
+        "legacy": "get_the_item.py",
+        "outputs": [os.path.join("Process", "bill_items.csv")],
+        "units": "lines",
+    },
+    "bill_total": {
+        "legacy": "bill_total.py",
+        "outputs": [os.path.join("Process", "bill_total.csv")],
+        "units": "lines",
+    },
+    "vente_extract": {
+        "legacy": "vente_extract.py",
+        "outputs": [os.path.join("vente", "Output", f) for f in
+                    ("total_sale.csv", "escompte_sale.csv", "methode_paiement_sale.csv")],
+        "units": "pdfs",
+    },
+}
+
+# Intended behaviour changes since the legacy revision, per parser:
+#   "columns":  column -> (old, new, row number, context) -> True when that
+#               difference is intended; context = "context"(corpus) or None
+#   "new_keys": files where the current parser may add rows whose key (first
+#               column) the legacy output does not have at all
+ACCEPTED_CHANGES = {
+    # an id legacy missed is accepted only where an exact (accent- and
+    # punctuation-free) or confirmed-alias match gives that same id
+    "extract_id": {"columns": {"employee_id": lambda old, new, n, ids: old == "" and new == ids[n - 1]},
+                   "context": lambda corpus: exact_or_alias_ids(corpus)},
+    # amounts like "1 158,57 $" are read now; legacy wrote no totals for that week
+    "vente_extract": {"new_keys": {"total_sale.csv"}},
+}
+
+# ----------------------------------------------------
+# WORK TREE (same layout as a corpus)
+# ----------------------------------------------------
+def pipeline_config(work):
+    return {
+        "bill_process_dir": os.path.join(work, "Process"),
+        "table_dir": os.path.join(work, "tables"),
+        "vente_dir": os.path.join(work, "vente"),
+    }
+
+
+def legacy_constants(name, work):
+    """Path constants of the legacy script -> Python expression pointing into work."""
+    process = os.path.join(work, "Process")
+    tables = os.path.join(work, "tables")
+    text = os.path.join(process, "pdf_to_text.txt")
+
+    if name == "extract_id":
+        paths = {"INPUT_TXT": text,
+                 "OUTPUT_CSV": os.path.join(process, "bill_id.csv"),
+                 "MISSING_NAMES": os.path.join(process, "missing_name.txt"),
+                 "EMPLOYEE_TABLE": os.path.join(tables, "Employee.csv")}
+    elif name == "get_the_item":
+        paths = {"INPUT_TXT": text,
+                 "ITEM_TABLE": os.path.join(tables, "item_id.csv"),
+                 "OUTPUT_CSV": os.path.join(process, "bill_items.csv"),
+                 "MISSING_TXT": os.path.join(process, "missing_items.txt")}
+    elif name == "bill_total":
+        paths = {"INPUT_TXT": text,
+                 "OUTPUT_CSV": os.path.join(process, "bill_total.csv")}
+    else:
+        return {"BASE_DIR": f"Path({os.path.join(work, 'vente')!r})"}
+    return {k: repr(v) for k, v in paths.items()}
+
+
+def patch_constants(source, constants):
+    for name, expr in constants.items():
+        source, n = re.subn(rf"(?m)^{name}\s*=.*$", lambda m: f"{name} = {expr}", source, count=1)
+        if not n:
+            raise ValueError(f"constant {name} not found in legacy source")
+    return source
+
+
+def resolve_rev(rev):
+    """Full commit hash of rev (hash, tag, branch); rev itself when git cannot resolve it."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return rev
+
+
+def fetch_legacy(dest, rev):
+    """Write the legacy scripts, as committed at rev, into dest."""
+    os.makedirs(dest, exist_ok=True)
+    for spec in PARSERS.values():
+        target = os.path.join(dest, spec["legacy"])
+        try:
+            source = subprocess.run(["git", "show", f"{rev}:code/{spec['legacy']}"], cwd=SCRIPT_DIR,
+                                    capture_output=True, check=True).stdout
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise RuntimeError(f"cannot read {spec['legacy']} at {rev} with git ({e}); "
+                               f"pass --legacy-rev, or --legacy-dir with the legacy scripts") from e
+        with open(target, "wb") as f:
+            f.write(source)
+
+# ----------------------------------------------------
+# ONE MEASURED RUN (child process)
+# ----------------------------------------------------
+def measure(name, impl, work, legacy_dir, trace):
+    """Run one parser once in this process; return seconds and tracemalloc peak."""
+    # imports outside the measured region: only the parsing is compared
+    sys.path.insert(0, SCRIPT_DIR)
+    import runpy
+    import run_pipeline
+    if PARSERS[name]["units"] == "pdfs":
+        import pdfplumber  # noqa: F401
+
+    if trace:
+        import tracemalloc
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        if impl == "legacy":
+            path = os.path.join(legacy_dir, PARSERS[name]["legacy"])
+            with open(path, encoding="utf-8") as f:
+                source = patch_constants(f.read(), legacy_constants(name, work))
+            patched = os.path.join(work, f"legacy_{PARSERS[name]['legacy']}")
+            with open(patched, "w", encoding="utf-8") as f:
+                f.write(source)
+            runpy.run_path(patched, run_name="__main__")
+        else:
+            run_pipeline.configure_stage(name, pipeline_config(work))()
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_kb": peak // 1024 if peak is not None else None}
+
+
+def run_once(name, impl, corpus, legacy_dir, trace=False, keep=None):
+    """Fresh copy of the corpus + fresh interpreter; returns the measurement."""
+    with tempfile.TemporaryDirectory(prefix="gate_") as tmp:
+        work = os.path.join(tmp, "work")
+        shutil.copytree(corpus, work)
+        cmd = [sys.executable, os.path.abspath(__file__), "measure", name, impl, work,
+               "--legacy-dir", legacy_dir] + (["--trace"] if trace else [])
+        proc = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8")
+        if proc.returncode != 0:
+            raise RuntimeError(f"{impl} {name} failed:\n{proc.stderr.strip()}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if keep:
+            for rel in PARSERS[name]["outputs"]:
+                src = os.path.join(work, rel)
+                if os.path.exists(src):
+                    dst = os.path.join(keep, rel)
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    shutil.copyfile(src, dst)
+        return result
+
+# ----------------------------------------------------
+# OUTPUT COMPARISON
+# ----------------------------------------------------
+def read_rows(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.reader(f))
+
+
+def exact_or_alias_ids(corpus):
+    """employee_id per bill_id.csv row, from exact and confirmed-alias matches only."""
+    sys.path.insert(0, SCRIPT_DIR)
+    import EXTRACT_ID
+    from employee_resolver import EmployeeResolver, load_aliases
+
+    class ExactOrAlias(EmployeeResolver):
+        def _match(self, name):
+            if name in self.exact:
+                return self.exact[name], "exact"
+            if name in self.aliases:
+                return self.aliases[name][0], "alias"
+            return None, "missing"
+
+    tables = os.path.join(corpus, "tables")
+    employee_map = EXTRACT_ID.load_employee_map(os.path.join(tables, "Employee.csv"))
+    resolver = ExactOrAlias(employee_map, load_aliases(os.path.join(tables, "employee_alias.csv")))
+    with open(os.path.join(corpus, "Process", "pdf_to_text.txt"), encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    records, _ = EXTRACT_ID.extract_bill_headers(lines, employee_map, resolver)
+    return ["" if r["employee_id"] is None else str(r["employee_id"]) for r in records]
+
+
+def compare_outputs(name, legacy_root, current_root, corpus, limit=5):
+    """Return (problems, accepted) for the parser's output files."""
+    accepted_rules = ACCEPTED_CHANGES.get(name, {}).get("columns", {})
+    new_keys = ACCEPTED_CHANGES.get(name, {}).get("new_keys", set())
+    context = ACCEPTED_CHANGES.get(name, {}).get("context")
+    context = context(corpus) if context and accepted_rules else None
+    problems = []
+    accepted = 0
+
+    for rel in PARSERS[name]["outputs"]:
+        old = read_rows(os.path.join(legacy_root, rel))
+        new = read_rows(os.path.join(current_root, rel))
+        label = os.path.basename(rel)
+        if old is None or new is None:
+            if old != new:
+                problems.append(f"{label}: written by only one implementation")
+            continue
+        if old[:1] != new[:1]:
+            problems.append(f"{label}: header {old[:1]} != {new[:1]}")
+            continue
+        if label in new_keys:
+            known = {row[0] for row in old[1:] if row}
+            added = [row for row in new[1:] if row and row[0] not in known]
+            new = [new[0]] + [row for row in new[1:] if not row or row[0] in known]
+            accepted += len(added)
+        if len(old) != len(new):
+            problems.append(f"{label}: {len(old) - 1} legacy rows, {len(new) - 1} current rows")
+
+        header = old[0]
+        shown = 0
+        for n, (a, b) in enumerate(zip(old[1:], new[1:]), start=1):
+            if a == b:
+                continue
+            diff = [c for c, x, y in zip(header, a, b) if x != y]
+            if len(a) == len(b) and all(c in accepted_rules and accepted_rules[c](x, y, n, context)
+                                        for c, x, y in zip(header, a, b) if x != y):
+                accepted += 1
+                continue
+            if shown < limit:
+                problems.append(f"{label} row {n}: {a} != {b} (columns {', '.join(diff) or 'count'})")
+            shown += 1
+        if shown > limit:
+            problems.append(f"{label}: {shown - limit} more differing rows")
+    return problems, accepted
+
+# ----------------------------------------------------
+# GATE
+# ----------------------------------------------------
+def corpus_units(corpus, name):
+    if PARSERS[name]["units"] == "pdfs":
+        folder = os.path.join(corpus, "vente", "Input")
+        return len([f for f in os.listdir(folder) if f.lower().endswith(".pdf")])
+    with open(os.path.join(corpus, "Process", "pdf_to_text.txt"), encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def has_input(corpus, name):
+    if PARSERS[name]["units"] == "pdfs":
+        return os.path.isdir(os.path.join(corpus, "vente", "Input"))
+    return os.path.exists(os.path.join(corpus, "Process", "pdf_to_text.txt"))
+
+
+def evaluate(corpus, name, legacy_dir, repeat=REPEAT):
+    """Run legacy and current on one corpus; return the entry stored in the baseline."""
+    with tempfile.TemporaryDirectory(prefix="gate_out_") as out:
+        legacy_out = os.path.join(out, "legacy")
+        current_out = os.path.join(out, "current")
+        timings = {"legacy": [], "current": []}
+        for i in range(repeat):
+            # alternate so drift (thermal, cache) hits both sides alike
+            for impl, keep in (("legacy", legacy_out), ("current", current_out)):
+                result = run_once(name, impl, corpus, legacy_dir, keep=keep if i == 0 else None)
+                timings[impl].append(result["seconds"])
+        problems, accepted = compare_outputs(name, legacy_out, current_out, corpus)
+
+    peak = run_once(name, "current", corpus, legacy_dir, trace=True)["peak_kb"]
+    # best of: noise only ever adds time
+    legacy_s = min(timings["legacy"])
+    current_s = min(timings["current"])
+    units = corpus_units(corpus, name)
+    return {
+        "units": units,
+        "legacy_s": round(legacy_s, 4),
+        "current_s": round(current_s, 4),
+        "units_per_s": round(units / current_s, 1) if current_s else None,
+        "speedup": round(legacy_s / current_s, 3) if current_s else None,
+        "peak_kb": peak,
+    }, problems, accepted
+
+
+def regressions(entry, stored):
+    """Threshold checks against the stored baseline entry."""
+    failed = []
+    if stored.get("speedup") and entry["speedup"] is not None:
+        floor = stored["speedup"] * (1 - MAX_SPEEDUP_LOSS)
+        if entry["speedup"] < floor:
+            failed.append(f"speedup {entry['speedup']:.2f}x < {floor:.2f}x (baseline {stored['speedup']:.2f}x)")
+    if stored.get("peak_kb"):
+        ceiling = stored["peak_kb"] * (1 + MAX_MEMORY_GROWTH)
+        if entry["peak_kb"] > ceiling:
+            failed.append(f"peak {entry['peak_kb']} KB > {ceiling:.0f} KB (baseline {stored['peak_kb']} KB)")
+    return failed
+
+
+def load_baseline(path=BASELINE_JSON):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(root, **how):
+    with open(os.path.join(root, CORPUS_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(how, f, indent=2, sort_keys=True)
+
+
+def read_manifest(corpus):
+    path = os.path.join(corpus, CORPUS_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def provenance_problems(meta, corpus_name, manifest, legacy_rev):
+    """Why the stored baseline does not apply to this corpus / legacy revision."""
+    problems = []
+    if meta.get("legacy_rev") and resolve_rev(meta["legacy_rev"]) != legacy_rev:
+        problems.append(f"baseline measured against legacy {meta['legacy_rev']}, not {legacy_rev}")
+    stored = meta.get("corpora", {}).get(corpus_name)
+    if stored and stored != manifest:
+        problems.append(f"corpus differs from the baseline's {stored} "
+                        f"(rebuild it the same way, or --update-baseline)")
+    return problems
+
+
+def check(corpora=None, parsers=None, legacy_dir=None, repeat=REPEAT, update=False,
+          baseline_path=BASELINE_JSON, corpus_dir=CORPUS_DIR, legacy_rev=None):
+    """Run the gate; return 0 when every corpus/parser pair passes."""
+    corpora = corpora or sorted(d for d in os.listdir(corpus_dir)
+                                if os.path.isdir(os.path.join(corpus_dir, d)))
+    baseline = load_baseline(baseline_path)
+    meta = baseline.setdefault("_meta", {})
+    failures = 0
+    legacy_rev = resolve_rev(legacy_rev or meta.get("legacy_rev") or LEGACY_TAG)
+    print(f"Legacy revision: {legacy_rev}")
+
+    with tempfile.TemporaryDirectory(prefix="gate_legacy_") as tmp:
+        if not legacy_dir:
+            fetch_legacy(tmp, legacy_rev)
+            legacy_dir = tmp
+
+        for corpus_name in corpora:
+            corpus = os.path.join(corpus_dir, corpus_name)
+            manifest = read_manifest(corpus)
+            drift = [] if update else provenance_problems(meta, corpus_name, manifest, legacy_rev)
+            for name in parsers or PARSERS:
+                if not has_input(corpus, name):
+                    continue
+                key = f"{corpus_name}/{name}"
+                entry, problems, accepted = evaluate(corpus, name, legacy_dir, repeat)
+                stored = baseline.get(key, {})
+                failed = problems + ([] if update else drift + regressions(entry, stored))
+
+                state = "FAIL" if failed else "ok"
+                print(f"[{state:<4}] {key:<32} {entry['units']:>7} {PARSERS[name]['units']:<5} "
+                      f"legacy {entry['legacy_s']:.3f}s  current {entry['current_s']:.3f}s  "
+                      f"x{entry['speedup']:.2f}  peak {entry['peak_kb']} KB"
+                      + (f"  ({accepted} accepted changes)" if accepted else "")
+                      + ("" if stored or update else "  (no baseline)"))
+                for problem in failed:
+                    print(f"         {problem}")
+
+                if failed:
+                    failures += 1
+                elif update:
+                    baseline[key] = entry
+                    meta["legacy_rev"] = legacy_rev
+                    meta.setdefault("corpora", {})[corpus_name] = manifest
+
+    if update:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline → {baseline_path}")
+
+    print("Gate passed." if not failures else f"Gate failed: {failures} corpus/parser pair(s).")
+    return 1 if failures else 0
+
+# ----------------------------------------------------
+# SYNTHETIC CORPUS
+# ----------------------------------------------------
+MENU = [
+    ("Burger Classique", 2), ("Poutine", 1), ("IPA", 6), ("Pinte IPA", 6), ("Vin Rouge", 5),
+    ("Vin Blanc", 5), ("Café", 4), ("Thé", 4), ("Espresso", 4), ("Crème Brûlée", 3),
+    ("Salade César", 1), ("Frites", 1), ("Nachos", 1), ("Soupe du Jour", 1),
+    ("Pizza Margherita", 2), ("Fish & Chips", 2), ("Club Sandwich", 2), ("Coca-Cola", 4),
+    ("Limonade", 4), ("Bière Blonde", 6), ("Cidre", 6), ("Gâteau Chocolat", 3),
+    ("Tarte au Sucre", 3), ("Mimosa", 5), ("Sangria", 5),
+]
+STAFF = ["Marie", "Jean Philippe", "Élodie", "Marc-André", "Sophie", "Olivier", "Camille", "Luc"]
+PAYMENTS = ["VISA", "MASTERCARD", "DEBIT", "COMPTANT"]
+ESCOMPTES = ["EMPLOYE", "GERANT", "FIDELITE", "PROMO ETE", "REPAS SOPHIE"]
+
+
+def _typo(rng, s):
+    i = rng.randrange(1, len(s)) if len(s) > 2 else 0
+    return s[:i] + s[i + 1:]
+
+
+def receipt_lines(rng, bills):
+    """pdf_to_text.txt for `bills` receipts, with the variants the parsers branch on."""
+    lines = []
+    day = date(2025, 6, 1)
+    for n in range(bills):
+        if n and n % 60 == 0:
+            day += timedelta(days=1)
+
+        server = rng.randrange(len(STAFF))
+        name = STAFF[server].upper()
+        roll = rng.random()
+        if roll < 0.06:
+            name = _typo(rng, name)
+        elif roll < 0.09:
+            name = "REMPLACANT"
+        if rng.random() < 0.03:
+            lines.append("Copie client")
+        else:
+            lines.append(f"{server + 1}.{name}")
+
+        hour, minute = rng.randrange(11, 24), rng.randrange(60)
+        lines.append(f"{day.day}/{day.month:02d}/{day.year % 100} {hour}:{minute:02d}")
+        bill_id = 10000 + n
+        table = f" Table#{rng.randrange(1, 40)}" if rng.random() < 0.9 else ""
+        lines.append(f"{bill_id} ({bill_id}){table}")
+        if rng.random() < 0.1:
+            lines.append("Redistribuée")
+
+        subtotal = 0.0
+        for _ in range(rng.randrange(1, 7)):
+            item, _cat = MENU[rng.randrange(len(MENU))]
+            label = item.upper()
+            form = rng.random()
+            if form < 0.10:
+                label = label[:11]                             # POS truncation
+            elif form < 0.15:
+                label = f"1/2 {label} / {label}"               # combo "/" form
+            elif form < 0.20:
+                label = _typo(rng, label)
+            elif form < 0.23:
+                label = f"SPECIAL {rng.randrange(1, 30)}"      # not on the menu
+            qty = rng.choice(["1", "1", "2", "3", "1.00", "0.5", "x"])
+            price = round(rng.uniform(3, 40), 2)
+            subtotal += price
+            lines.append(f"{qty} {label} ${price:.2f} FP")
+
+        lines.append(f"Sous-total ${subtotal:.2f}")
+        lines.append(f"TPS ${subtotal * 0.05:.2f}")
+        lines.append(f"TVQ ${subtotal * 0.09975:.2f}")
+        total = round(subtotal * 1.14975, 2)
+        if rng.random() < 0.03:
+            continue                                           # receipt cut before the total
+        lines.append(f"Total ${total:.2f}")
+
+        pay = rng.random()
+        if pay < 0.05:
+            lines.append("Merci!")
+        else:
+            paid = total * (rng.uniform(0.9, 1.0) if pay < 0.12 else rng.uniform(1.0, 1.25))
+            lines.append(f"{rng.randrange(1, 5)}.{rng.choice(PAYMENTS)} ${paid:.2f}")
+    return lines
+
+
+def _pdf_text(s):
+    s = s.encode("cp1252", "replace")
+    return s.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def write_pdf(pages, path, height=842):
+    """Minimal Helvetica PDF; pages = [[(x, y_from_top, size, text), ...], ...]."""
+    objs = []
+
+    def add(obj):
+        objs.append(obj)
+        return len(objs)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pages_id = len(objs) + 2 * len(pages) + 1
+    kids = []
+    for words in pages:
+        stream = b"\n".join(b"BT /F1 %.1f Tf %.2f %.2f Td (%s) Tj ET" % (size, x, height - y, _pdf_text(t))
+                            for x, y, size, t in words)
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 %d] /Contents %d 0 R "
+                        b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, height, content, font)))
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids)))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, catalog, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def sales_report(rng, start, end):
+    """Weekly sales report pages in the POS layout (label / count / % / amount columns)."""
+    french = rng.random() < 0.3
+    if french:
+        money = lambda v: f"{v:,.2f} $".replace(",", " ").replace(".", ",")
+    else:
+        money = lambda v: f"${v:,.2f}"
+    rows = [["AUBERGE LE CAMP DE BASE"], ["Rapport des ventes"],
+            [f"{start:%d/%m/%y} @ 04:00 au {end:%d/%m/%y} @ 03:59"]]
+    rows += [[f"Ligne info {i}"] for i in range(rng.randrange(2, 14))]
+
+    # a week the venue was mostly closed: a one-digit bill count right
+    # before an amount under 1000 ("Sous-total 5 100,00 $") must not be
+    # read as one space-grouped number
+    closed = rng.random() < 0.1
+    scale = 0.03 if closed else 1.0
+    sales = round(rng.uniform(15000, 40000) * scale, 2)
+    rows += [["VENTES REGULIERES"], ["Nourriture", str(rng.randrange(1, 10) if closed else rng.randrange(100, 500)), "", money(sales * 0.6)],
+             ["Sous-total", str(rng.randrange(1, 10) if closed else rng.randrange(300, 900)), "", money(sales)],
+             ["ESCOMPTES"]]
+    discounts = 0.0
+    labels = rng.sample(ESCOMPTES, rng.randrange(1, len(ESCOMPTES)))
+    if rng.random() < 0.2:
+        labels.append("INCONNU")
+    for i, label in enumerate(labels, start=1):
+        amount = round(rng.uniform(5, 300) * scale, 2)
+        discounts += amount
+        rows.append([f"{i}. {label}", str(rng.randrange(1, 40)), "", money(-amount)])
+    after = sales - discounts
+    tps, tvq = after * 0.05, after * 0.09975
+    rows += [["TOTAL DES ESCOMPTES", str(len(labels)), "", money(-discounts)],
+             ["Sous-total", "", "", money(after)], ["TPS", "", "", money(tps)],
+             ["TVQ", "", "", money(tvq)], ["Total", "", "", money(after + tps + tvq)]]
+
+    page2 = [["VENTES ENTRAINEMENT"], ["Total", "", "", money(rng.uniform(1, 50))],
+             ["MODES DE PAIEMENT GLOBAL"], ["DESCRIPTION", "NOMBRE", "%", "MONTANT"]]
+    shares = [rng.random() for _ in PAYMENTS]
+    for i, (label, share) in enumerate(zip(PAYMENTS, shares), start=1):
+        pct = share / sum(shares) * 100
+        page2.append([f"{i}. {label}", str(rng.randrange(10, 400)), f"{pct:.2f}%", money(after * pct / 100)])
+    page2.append(["TOTAL", str(rng.randrange(300, 900)), "100.00%", money(after + tps + tvq)])
+
+    columns = (30, 250, 330, 420)
+    return [[(x, 40 + 14 * r, 9, cell) for r, row in enumerate(page) for x, cell in zip(columns, row) if cell]
+            for page in (rows, page2)]
+
+
+def write_csv(path, header, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def generate(name="synthetic", bills=SYNTHETIC_BILLS, weeks=SYNTHETIC_WEEKS, seed=SEED,
+             corpus_dir=CORPUS_DIR):
+    """Write a reproducible synthetic corpus to corpus_dir/<name>."""
+    rng = random.Random(seed)
+    root = os.path.join(corpus_dir, name)
+    if os.path.exists(root):
+        shutil.rmtree(root)
+
+    write_csv(os.path.join(root, "tables", "item_id.csv"), ["item_id", "name", "category_id"],
+              [(i, item, cat) for i, (item, cat) in enumerate(MENU, start=1)])
+    write_csv(os.path.join(root, "tables", "Employee.csv"), ["employee_id", "name"],
+              list(enumerate(STAFF, start=1)))
+    os.makedirs(os.path.join(root, "Process"))
+    with open(os.path.join(root, "Process", "pdf_to_text.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(receipt_lines(rng, bills)) + "\n")
+
+    feed = os.path.join(root, "vente", "Feed")
+    first = date(2025, 6, 1)
+    write_csv(os.path.join(feed, "week_id_table.csv"), ["week_id", "week_start", "week_end"],
+              [(w + 1, f"{first + timedelta(weeks=w)} 04:00:00", f"{first + timedelta(weeks=w, days=7)} 03:59:00")
+               for w in range(weeks)])
+    write_csv(os.path.join(feed, "escompte.csv"), ["escompte_id", "escompte"], list(enumerate(ESCOMPTES, start=1)))
+    write_csv(os.path.join(feed, "methode_paiement.csv"), ["methode_paiement_id", "methode_paiement"],
+              list(enumerate(PAYMENTS, start=1)))
+    os.makedirs(os.path.join(root, "vente", "Input"))
+    for w in range(weeks):
+        start = first + timedelta(weeks=w)
+        write_pdf(sales_report(rng, start, start + timedelta(days=7)),
+                  os.path.join(root, "vente", "Input", f"ventes_{start:%Y_%m_%d}.pdf"))
+    write_manifest(root, source="generate", seed=seed, bills=bills, weeks=weeks)
+
+    print(f"Synthetic corpus ({bills} bills, {weeks} weekly reports) → {root}")
+    return root
+
+# ----------------------------------------------------
+# ANONYMIZED CORPUS
+# ----------------------------------------------------
+name_token = re.compile(r"[A-Za-zÀ-ÖØ-öø-ÿ'\-]+")
+server_line = re.compile(r"^(\s*\d{1,3}\.)([A-Za-zÀ-ÖØ-öø-ÿ \-']+)$")
+
+
+def pseudonym(n):
+    """Letters only (server lines must not contain digits): NOMA, NOMB, ..., NOMBA, ..."""
+    s = ""
+    while True:
+        s = chr(ord("A") + n % 26) + s
+        n //= 26
+        if not n:
+            return "NOM" + s
+
+
+class Anonymizer:
+    """Consistent token-level replacement of staff names."""
+
+    def __init__(self):
+        self.tokens = {}
+
+    def learn(self, name):
+        for token in name_token.findall(name):
+            key = token.upper()
+            if len(key) > 1 and key not in self.tokens:
+                self.tokens[key] = pseudonym(len(self.tokens))
+
+    def __call__(self, text):
+        return name_token.sub(lambda m: self.tokens.get(m.group(0).upper(), m.group(0)), text)
+
+
+def text_runs(page):
+    """Words of a pdfplumber page joined into runs: one run per column cell of a line."""
+    runs = []
+    words = sorted(page.extract_words(extra_attrs=["size"]), key=lambda w: (round(w["bottom"]), w["x0"]))
+    for w in words:
+        last = runs[-1] if runs else None
+        if last and round(w["bottom"]) == round(last[1]) and w["x0"] - last[4] < w["size"]:
+            last[3] += " " + w["text"]
+            last[4] = w["x1"]
+        else:
+            runs.append([w["x0"], w["bottom"], w["size"], w["text"], w["x1"]])
+    return [run[:4] for run in runs]
+
+
+def anonymize(process_dir, table_dir, vente_dir=None, name="anonymized", corpus_dir=CORPUS_DIR):
+    """Copy a real run into corpus_dir/<name> with every staff name replaced."""
+    root = os.path.join(corpus_dir, name)
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    anon = Anonymizer()
+
+    with open(os.path.join(table_dir, "Employee.csv"), newline="", encoding="utf-8-sig") as f:
+        staff = list(csv.DictReader(f))
+    for row in staff:
+        anon.learn(row["name"])
+    with open(os.path.join(process_dir, "pdf_to_text.txt"), encoding="utf-8") as f:
+        lines = [line.rstrip("\n") for line in f]
+    for line in lines:
+        m = server_line.match(line.strip())
+        if m:
+            anon.learn(m.group(2))     # misspelled and unknown server names too
+
+    write_csv(os.path.join(root, "tables", "Employee.csv"), ["employee_id", "name"],
+              [(row["employee_id"], anon(row["name"])) for row in staff])
+    shutil.copyfile(os.path.join(table_dir, "item_id.csv"), os.path.join(root, "tables", "item_id.csv"))
+    os.makedirs(os.path.join(root, "Process"))
+    with open(os.path.join(root, "Process", "pdf_to_text.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(anon(line) for line in lines) + "\n")
+
+    pdfs = 0
+    if vente_dir:
+        import pdfplumber
+        feed = os.path.join(root, "vente", "Feed")
+        os.makedirs(feed)
+        for table in ("week_id_table.csv", "escompte.csv", "methode_paiement.csv"):
+            src = os.path.join(vente_dir, "Feed", table)
+            if os.path.exists(src):
+                with open(src, encoding="utf-8") as f, open(os.path.join(feed, table), "w", encoding="utf-8") as out:
+                    out.write(anon(f.read()))
+        os.makedirs(os.path.join(root, "vente", "Input"))
+        # words are redrawn at their original position, so both the text
+        # and the layout readers see the same columns
+        for pdf in sorted(os.listdir(os.path.join(vente_dir, "Input"))):
+            if not pdf.lower().endswith(".pdf"):
+                continue
+            with pdfplumber.open(os.path.join(vente_dir, "Input", pdf)) as doc:
+                pages = [[(x, bottom - size * 0.2, size, anon(text)) for x, bottom, size, text in text_runs(page)]
+                         for page in doc.pages]
+                height = float(doc.pages[0].height) if doc.pages else 842
+            write_pdf(pages, os.path.join(root, "vente", "Input", f"report_{pdfs + 1:03d}.pdf"), height)
+            pdfs += 1
+    write_manifest(root, source="anonymize", lines=len(lines), reports=pdfs)
+
+    print(f"Anonymized corpus ({len(lines)} lines, {pdfs} reports, {len(anon.tokens)} name tokens) → {root}")
+    return root
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Legacy vs current parser regression gate.")
+    parser.add_argument("--corpus-dir", default=CORPUS_DIR, help="folder holding the corpora")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("check", help="run the gate")
+    p.add_argument("--corpus", nargs="+", help="corpus names under --corpus-dir (default: all)")
+    p.add_argument("--parser", nargs="+", choices=list(PARSERS), help="default: all")
+    p.add_argument("--legacy-rev", help="commit or tag the legacy scripts are read from "
+                                        f"(default: _meta.legacy_rev of the baseline, else {LEGACY_TAG})")
+    p.add_argument("--legacy-dir", help="folder with the legacy scripts instead of git")
+    p.add_argument("--baseline", default=BASELINE_JSON, help="baseline JSON")
+    p.add_argument("--repeat", type=int, default=REPEAT)
+    p.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+
+    p = sub.add_parser("generate", help="write the synthetic corpus")
+    p.add_argument("--name", default="synthetic")
+    p.add_argument("--bills", type=int, default=SYNTHETIC_BILLS)
+    p.add_argument("--weeks", type=int, default=SYNTHETIC_WEEKS)
+    p.add_argument("--seed", type=int, default=SEED)
+
+    p = sub.add_parser("anonymize", help="build a corpus from a real run with staff names replaced")
+    p.add_argument("--process", required=True, help="folder with pdf_to_text.txt")
+    p.add_argument("--tables", required=True, help="folder with item_id.csv and Employee.csv")
+    p.add_argument("--vente", help="Vente_extract folder (Input/ and Feed/)")
+    p.add_argument("--name", default="anonymized")
+
+    p = sub.add_parser("measure", help=argparse.SUPPRESS)
+    p.add_argument("name", choices=list(PARSERS))
+    p.add_argument("impl", choices=["legacy", "current"])
+    p.add_argument("work")
+    p.add_argument("--legacy-dir")
+    p.add_argument("--trace", action="store_true")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "measure":
+        print(json.dumps(measure(args.name, args.impl, args.work, args.legacy_dir, args.trace)))
+        return 0
+    if args.command == "generate":
+        generate(args.name, args.bills, args.weeks, args.seed, args.corpus_dir)
+        return 0
+    if args.command == "anonymize":
+        anonymize(args.process, args.tables, args.vente, args.name, args.corpus_dir)
+        return 0
+
+    if not args.corpus and not os.path.isdir(os.path.join(args.corpus_dir, "synthetic")):
+        generate(corpus_dir=args.corpus_dir)
+    return check(args.corpus, args.parser, args.legacy_dir, args.repeat, args.update_baseline,
+                 args.baseline, args.corpus_dir, args.legacy_rev)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import os
+import re
+import csv
+
+from delta_outputs import write_changes
+from checkpoint import atomic_output
+
+# ----------------------------------------------------
+# Rolling load per bill: how many bills were opened in the
+# WINDOW_MINUTES around it (same service, any server).
+# analysis_query.sql classifies whole days by their bill count
+# (<=39 / 40-75 / >=76); a rush inside a quiet day disappears at
+# that grain. Here every bill gets the load of its own hour:
+#   timestamps (date + time) -> minutes, sorted once
+#   window edges of all bills at once with searchsorted on the
+#   sorted array (the vectorized form of a two-pointer sweep)
+#   window_bills = right edge - left edge (includes the bill)
+# bill_id.csv is written in bill order, which is time order, so
+# the stable sort is close to a single linear pass.
+# Output: bill_load.csv (bill_id, window_bills, load_level
+# 1/2/3; same columns as the bill_load table), read by the
+# upsell reports when their ROLLING_LOAD switch is on. Bills
+# without a date/time have no load and are left out.
+# ----------------------------------------------------
+
+# ----------------------------------------------------
+# PATHS
+# ----------------------------------------------------
+PROCESS_DIR = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process"
+BILL_ID_CSV = os.path.join(PROCESS_DIR, "bill_id.csv")
+OUTPUT_CSV = os.path.join(PROCESS_DIR, "bill_load.csv")
+
+# ----------------------------------------------------
+# CONFIG
+# ----------------------------------------------------
+WINDOW_MINUTES = 60      # centered on the bill: [t - 30, t + 30)
+
+# bills opened in the window: <= 8 -> 1 (slow), >= 16 -> 3 (high), else 2.
+# Same 1/2/3 scale as the daily volume_category, with hourly thresholds.
+LOAD_SLOW_MAX = 8
+LOAD_HIGH_MIN = 16
+
+LOAD_FIELDS = ["bill_id", "window_bills", "load_level"]
+
+# Also write <output>_changes.csv (insert/update/delete vs previous run)
+DELTA_MODE = False
+
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+TIME_RE = re.compile(r"^(\d{1,2}):(\d{2})")
+
+# ----------------------------------------------------
+# LOAD
+# ----------------------------------------------------
+def load_bill_times(path=BILL_ID_CSV):
+    """(rows, minutes): header rows and their timestamps in minutes (-1 = no date/time)."""
+    import numpy as np
+
+    rows, stamps = [], []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            date = (row.get("date") or "").strip()
+            m = TIME_RE.match((row.get("time") or "").strip())
+            rows.append(row)
+            stamps.append(f"{date}T{int(m.group(1)):02d}:{m.group(2)}"
+                          if m and DATE_RE.match(date) else "NaT")
+
+    stamps = np.array(stamps, dtype="datetime64[m]")
+    minutes = np.where(np.isnat(stamps), -1, stamps.astype(np.int64))
+    return rows, minutes
+
+# ----------------------------------------------------
+# WINDOW COUNTS
+# ----------------------------------------------------
+def window_counts(minutes, window=WINDOW_MINUTES):
+    """Bills opened in [t - window/2, t + window/2) for every t (-1 = no timestamp -> 0)."""
+    import numpy as np
+
+    valid = minutes >= 0
+    t = minutes[valid]
+    order = np.argsort(t, kind="stable")
+    ts = t[order]
+
+    half = window // 2
+    left = np.searchsorted(ts, ts - half, side="left")
+    right = np.searchsorted(ts, ts - half + window, side="left")
+
+    counts_sorted = right - left
+    counts = np.zeros(len(minutes), dtype=np.int64)
+    valid_idx = np.flatnonzero(valid)
+    counts[valid_idx[order]] = counts_sorted
+    return counts
+
+
+def load_level(window_bills):
+    import numpy as np
+
+    return np.where(window_bills <= LOAD_SLOW_MAX, 1,
+                    np.where(window_bills >= LOAD_HIGH_MIN, 3, 2))
+
+# ----------------------------------------------------
+# WRITE CSV
+# ----------------------------------------------------
+def build_records(rows, minutes, counts, levels):
+    records = []
+    for row, minute, n, level in zip(rows, minutes, counts, levels):
+        if minute < 0:
+            continue
+        records.append({
+            "bill_id": row.get("bill_id", ""),
+            "window_bills": str(int(n)),
+            "load_level": str(int(level)),
+        })
+    return records
+
+
+def write_load_csv(records, path=OUTPUT_CSV):
+    if DELTA_MODE:
+        write_changes(path, records, LOAD_FIELDS, ["bill_id"])
+
+    with atomic_output(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=LOAD_FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def load_levels(path=OUTPUT_CSV):
+    """bill_id -> load_level, for the reports (untimed bills have no row)."""
+    levels = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            if row.get("load_level"):
+                levels[row["bill_id"]] = int(row["load_level"])
+    return levels
+
+
+def main():
+    import numpy as np
+
+    rows, minutes = load_bill_times(BILL_ID_CSV)
+    counts = window_counts(minutes, WINDOW_MINUTES)
+    levels = load_level(counts)
+    write_load_csv(build_records(rows, minutes, counts, levels), OUTPUT_CSV)
+
+    timed = minutes >= 0
+    spread = np.bincount(levels[timed], minlength=4)[1:]
+    print(f"{int(timed.sum())} bills timed ({len(rows) - int(timed.sum())} without date/time), "
+          f"{WINDOW_MINUTES}-minute window")
+    print(f"load levels: slow={spread[0]} medium={spread[1]} high={spread[2]}")
+    print(f"bill_load.csv created → {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,575 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import importlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# ----------------------------------------------------
+# One entry point for every ETL script.
+# Stages form a DAG; independent branches (receipts, item
+# sales, finance, prices) run concurrently in worker
+# processes. A stage is skipped when the content hash of
+# its inputs, its settings and its script matches the last
+# successful run.
+# ----------------------------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ----------------------------------------------------
+# DEFAULT PATHS (same folders the scripts hardcode)
+# Override any key with --config paths.json
+# ----------------------------------------------------
+DEFAULT_CONFIG = {
+    "bill_input_dir": r"D:\BASE CAMP TOOL\item_extract_fool_bill\Input",
+    "bill_process_dir": r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process",
+    "table_dir": r"D:\TABLE FINAL",
+    "sales_dir": SCRIPT_DIR,
+    "vente_dir": r"D:\Vente_extract",
+    "price_dir": r"D:\Get_price",
+    "state_file": os.path.join(SCRIPT_DIR, "pipeline_state.json"),
+    "venue_headers": ["AUBERGE LE CAMP DE BASE"],
+}
+
+
+def load_config(path=None):
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    return config
+
+# ----------------------------------------------------
+# STAGES
+# name -> deps, inputs, outputs (paths or glob patterns)
+# ----------------------------------------------------
+def build_stages(cfg):
+    process = cfg["bill_process_dir"]
+    tables = cfg["table_dir"]
+    sales = cfg["sales_dir"]
+    vente = cfg["vente_dir"]
+    price = cfg["price_dir"]
+    text = os.path.join(process, "pdf_to_text.txt")
+
+    return {
+        # ---- receipt chain ----
+        "pdf_to_txt": {
+            "deps": [],
+            "inputs": [os.path.join(cfg["bill_input_dir"], "*.pdf")],
+            "outputs": [text],
+        },
+        "extract_id": {
+            "deps": ["pdf_to_txt"],
+            "inputs": [text, os.path.join(tables, "Employee.csv"), os.path.join(tables, "employee_alias.csv")],
+            "outputs": [os.path.join(process, "bill_id.csv")],
+        },
+        "get_the_item": {
+            "deps": ["pdf_to_txt"],
+            "inputs": [text, os.path.join(tables, "item_id.csv")],
+            "outputs": [os.path.join(process, "bill_items.csv")],
+        },
+        "customer_count": {
+            "deps": ["get_the_item"],
+            "inputs": [os.path.join(process, "bill_items.csv"), os.path.join(tables, "item_id.csv")],
+            "outputs": [os.path.join(process, "bill_customers.csv")],
+        },
+        "bill_total": {
+            "deps": ["pdf_to_txt"],
+            "inputs": [text],
+            "outputs": [os.path.join(process, "bill_total.csv")],
+        },
+        # ---- item sales ----
+        "sales_extractor": {
+            "deps": [],
+            "inputs": [
+                os.path.join(sales, "*.pdf"),
+                os.path.join(sales, "item_id.csv"),
+                os.path.join(sales, "week_id_table.csv"),
+                os.path.join(sales, "Employee.csv"),
+            ],
+            "outputs": [os.path.join(sales, "Output")],
+        },
+        # ---- finance ----
+        "vente_extract": {
+            "deps": [],
+            "inputs": [
+                os.path.join(vente, "Input", "*.pdf"),
+                os.path.join(vente, "Feed", "*.csv"),
+            ],
+            "outputs": [os.path.join(vente, "Output", "total_sale.csv")],
+        },
+        # ---- control totals gate ----
+        "reconcile": {
+            "deps": ["extract_id", "get_the_item", "bill_total", "sales_extractor", "vente_extract"],
+            "inputs": [
+                os.path.join(process, "bill_id.csv"),
+                os.path.join(process, "bill_items.csv"),
+                os.path.join(process, "bill_total.csv"),
+                os.path.join(vente, "Feed", "week_id_table.csv"),
+                os.path.join(vente, "Output", "total_sale.csv"),
+                os.path.join(sales, "Output", "*.csv"),
+            ],
+            "outputs": [os.path.join(process, "reconciliation_report.csv")],
+        },
+        # ---- dashboard summary cube ----
+        "olap_cube": {
+            "deps": ["extract_id", "get_the_item", "bill_total"],
+            "inputs": [
+                os.path.join(process, "bill_id.csv"),
+                os.path.join(process, "bill_items.csv"),
+                os.path.join(process, "bill_total.csv"),
+                os.path.join(tables, "item_id.csv"),
+                os.path.join(vente, "Feed", "week_id_table.csv"),
+            ],
+            "outputs": [os.path.join(process, "cube_items.csv"), os.path.join(process, "cube_bills.csv")],
+        },
+        # ---- per-bill rolling hourly load ----
+        "rolling_load": {
+            "deps": ["extract_id"],
+            "inputs": [os.path.join(process, "bill_id.csv")],
+            "outputs": [os.path.join(process, "bill_load.csv")],
+        },
+        # ---- upsell scoreboard (rules in upsell_rules.json) ----
+        "upsell_scoreboard": {
+            "deps": ["extract_id", "get_the_item", "bill_total", "rolling_load"],
+            "inputs": [
+                os.path.join(process, "bill_id.csv"),
+                os.path.join(process, "bill_items.csv"),
+                os.path.join(process, "bill_total.csv"),
+                os.path.join(process, "bill_load.csv"),
+                os.path.join(tables, "item_id.csv"),
+                os.path.join(SCRIPT_DIR, "upsell_rules.json"),
+            ],
+            "outputs": [os.path.join(process, "upsell_scoreboard.csv")],
+        },
+        # ---- bootstrap intervals for the scoreboard uplift ----
+        "uplift_bootstrap": {
+            "deps": ["extract_id", "get_the_item", "bill_total", "rolling_load"],
+            "inputs": [
+                os.path.join(process, "bill_id.csv"),
+                os.path.join(process, "bill_items.csv"),
+                os.path.join(process, "bill_total.csv"),
+                os.path.join(process, "bill_load.csv"),
+                os.path.join(tables, "item_id.csv"),
+                os.path.join(SCRIPT_DIR, "upsell_rules.json"),
+            ],
+            "outputs": [os.path.join(process, "uplift_ci.csv")],
+        },
+        # ---- tip / ticket-size statistics ----
+        "tip_stats": {
+            "deps": ["extract_id", "bill_total"],
+            "inputs": [
+                os.path.join(process, "bill_id.csv"),
+                os.path.join(process, "bill_total.csv"),
+                os.path.join(vente, "Feed", "week_id_table.csv"),
+            ],
+            "outputs": [os.path.join(process, "tip_stats.csv")],
+        },
+        # ---- embedded SQLite run of analysis_query.sql ----
+        "local_warehouse": {
+            "deps": ["extract_id", "get_the_item", "bill_total", "rolling_load"],
+            "inputs": [
+                os.path.join(process, "bill_id.csv"),
+                os.path.join(process, "bill_items.csv"),
+                os.path.join(process, "bill_total.csv"),
+                os.path.join(process, "bill_load.csv"),
+                os.path.join(tables, "*.csv"),
+                os.path.join(os.path.dirname(SCRIPT_DIR), "sql", "*.sql"),
+            ],
+            "outputs": [os.path.join(process, "warehouse.sqlite3")],
+        },
+        # ---- prices (updates its own item_id.csv) ----
+        "get_price": {
+            "deps": [],
+            "inputs": [os.path.join(price, "*.pdf"), os.path.join(price, "item_id.csv")],
+            "outputs": [os.path.join(price, "item_id.csv")],
+        },
+    }
+
+
+# stage -> script module (code/<module>.py)
+STAGE_MODULES = {
+    "pdf_to_txt": "PDF_TO_TXT",
+    "extract_id": "EXTRACT_ID",
+    "get_the_item": "get_the_item",
+    "customer_count": "customer_count",
+    "bill_total": "bill_total",
+    "sales_extractor": "Sales_extractor",
+    "vente_extract": "vente_extract",
+    "reconcile": "reconcile",
+    "olap_cube": "olap_cube",
+    "rolling_load": "rolling_load",
+    "upsell_scoreboard": "upsell_scoreboard",
+    "uplift_bootstrap": "uplift_bootstrap",
+    "tip_stats": "tip_stats",
+    "local_warehouse": "local_warehouse",
+    "get_price": "Get_price",
+}
+
+
+def configure_stage(name, cfg):
+    """Import the stage's script, point its path constants at cfg, return its entry point."""
+    process = cfg["bill_process_dir"]
+    tables = cfg["table_dir"]
+    text = os.path.join(process, "pdf_to_text.txt")
+
+    if name == "pdf_to_txt":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.input_folder = cfg["bill_input_dir"]
+        mod.output_folder = process
+        mod.output_file = text
+        mod.VENUE_HEADERS = tuple(cfg["venue_headers"])
+        return mod.main
+
+    if name == "extract_id":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.INPUT_TXT = text
+        mod.OUTPUT_CSV = os.path.join(process, "bill_id.csv")
+        mod.MISSING_NAMES = os.path.join(process, "missing_name.txt")
+        mod.EMPLOYEE_TABLE = os.path.join(tables, "Employee.csv")
+        mod.ALIAS_CSV = os.path.join(tables, "employee_alias.csv")
+        return mod.main
+
+    if name == "get_the_item":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.INPUT_TXT = text
+        mod.ITEM_TABLE = os.path.join(tables, "item_id.csv")
+        mod.OUTPUT_CSV = os.path.join(process, "bill_items.csv")
+        mod.MISSING_TXT = os.path.join(process, "missing_items.txt")
+        return mod.main
+
+    if name == "customer_count":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.BILL_ITEMS_CSV = os.path.join(process, "bill_items.csv")
+        mod.ITEM_TABLE = os.path.join(tables, "item_id.csv")
+        mod.OUTPUT_CSV = os.path.join(process, "bill_customers.csv")
+        return mod.main
+
+    if name == "bill_total":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.INPUT_TXT = text
+        mod.OUTPUT_CSV = os.path.join(process, "bill_total.csv")
+        return mod.main
+
+    if name == "sales_extractor":
+        sales = cfg["sales_dir"]
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.INPUT_FOLDER = sales
+        mod.OUTPUT_FOLDER = os.path.join(sales, "Output")
+        mod.ITEM_ID_FILE = os.path.join(sales, "item_id.csv")
+        mod.WEEK_ID_FILE = os.path.join(sales, "week_id_table.csv")
+        mod.EMPLOYEE_FILE = os.path.join(sales, "Employee.csv")
+        return mod.process_all_pdfs
+
+    if name == "vente_extract":
+        from pathlib import Path
+        base = Path(cfg["vente_dir"])
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.BASE_DIR = base
+        mod.INPUT_DIR = base / "Input"
+        mod.OUTPUT_DIR = base / "Output"
+        mod.FEED_DIR = base / "Feed"
+        mod.WEEK_TABLE = mod.FEED_DIR / "week_id_table.csv"
+        mod.ESCOMPTE_TABLE = mod.FEED_DIR / "escompte.csv"
+        mod.METHODE_TABLE = mod.FEED_DIR / "methode_paiement.csv"
+        mod.ESCOMPTE_CSV = mod.OUTPUT_DIR / "escompte_sale.csv"
+        mod.METHODE_CSV = mod.OUTPUT_DIR / "methode_paiement_sale.csv"
+        mod.TOTAL_CSV = mod.OUTPUT_DIR / "total_sale.csv"
+        mod.LAYOUT_CACHE = mod.FEED_DIR / "layout_cache.json"
+        return mod.process_all
+
+    if name == "reconcile":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.BILL_ID_CSV = os.path.join(process, "bill_id.csv")
+        mod.BILL_ITEMS_CSV = os.path.join(process, "bill_items.csv")
+        mod.BILL_TOTAL_CSV = os.path.join(process, "bill_total.csv")
+        mod.REPORT_CSV = os.path.join(process, "reconciliation_report.csv")
+        mod.WEEK_TABLE = os.path.join(cfg["vente_dir"], "Feed", "week_id_table.csv")
+        mod.TOTAL_SALE_CSV = os.path.join(cfg["vente_dir"], "Output", "total_sale.csv")
+        mod.SALES_ITEMS_GLOB = os.path.join(cfg["sales_dir"], "Output", "*.csv")
+        return mod.run
+
+    if name == "olap_cube":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.BILL_ID_CSV = os.path.join(process, "bill_id.csv")
+        mod.BILL_ITEMS_CSV = os.path.join(process, "bill_items.csv")
+        mod.BILL_TOTAL_CSV = os.path.join(process, "bill_total.csv")
+        mod.ITEM_TABLE = os.path.join(tables, "item_id.csv")
+        mod.WEEK_TABLE = os.path.join(cfg["vente_dir"], "Feed", "week_id_table.csv")
+        mod.CUBE_ITEMS_CSV = os.path.join(process, "cube_items.csv")
+        mod.CUBE_BILLS_CSV = os.path.join(process, "cube_bills.csv")
+        mod.CUBE_STATE = os.path.join(process, "cube_state.json")
+        return mod.refresh
+
+    if name == "rolling_load":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.BILL_ID_CSV = os.path.join(process, "bill_id.csv")
+        mod.OUTPUT_CSV = os.path.join(process, "bill_load.csv")
+        return mod.main
+
+    if name == "upsell_scoreboard":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.BILL_ID_CSV = os.path.join(process, "bill_id.csv")
+        mod.BILL_ITEMS_CSV = os.path.join(process, "bill_items.csv")
+        mod.BILL_TOTAL_CSV = os.path.join(process, "bill_total.csv")
+        mod.BILL_LOAD_CSV = os.path.join(process, "bill_load.csv")
+        mod.ITEM_TABLE = os.path.join(tables, "item_id.csv")
+        mod.OUTPUT_CSV = os.path.join(process, "upsell_scoreboard.csv")
+        return mod.main
+
+    if name == "uplift_bootstrap":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.BILL_ID_CSV = os.path.join(process, "bill_id.csv")
+        mod.BILL_ITEMS_CSV = os.path.join(process, "bill_items.csv")
+        mod.BILL_TOTAL_CSV = os.path.join(process, "bill_total.csv")
+        mod.BILL_LOAD_CSV = os.path.join(process, "bill_load.csv")
+        mod.ITEM_TABLE = os.path.join(tables, "item_id.csv")
+        mod.OUTPUT_CSV = os.path.join(process, "uplift_ci.csv")
+        return mod.main
+
+    if name == "tip_stats":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.BILL_ID_CSV = os.path.join(process, "bill_id.csv")
+        mod.BILL_TOTAL_CSV = os.path.join(process, "bill_total.csv")
+        mod.WEEK_TABLE = os.path.join(cfg["vente_dir"], "Feed", "week_id_table.csv")
+        mod.STATS_CSV = os.path.join(process, "tip_stats.csv")
+        mod.STATE_JSON = os.path.join(process, "tip_stats_state.json")
+        return mod.main
+
+    if name == "local_warehouse":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.PROCESS_DIR = process
+        mod.TABLE_DIR = tables
+        mod.SOURCES = mod.sources(process, tables)
+        mod.DB_PATH = os.path.join(process, "warehouse.sqlite3")
+        mod.RESULTS_DIR = os.path.join(process, "warehouse_results")
+        return mod.run
+
+    if name == "get_price":
+        mod = importlib.import_module(STAGE_MODULES[name])
+        mod.SCRIPT_DIR = cfg["price_dir"]
+        mod.INPUT_FOLDER = cfg["price_dir"]
+        mod.ITEM_ID_FILE = os.path.join(cfg["price_dir"], "item_id.csv")
+        return mod.main
+
+    raise ValueError(f"Unknown stage: {name}")
+
+
+def run_stage(name, cfg):
+    """Worker-process entry point: returns the stage's wall time in seconds."""
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    entry = configure_stage(name, cfg)
+    module = sys.modules[entry.__module__]
+    if hasattr(module, "DELTA_MODE"):
+        module.DELTA_MODE = cfg.get("delta", False)
+    start = time.perf_counter()
+    entry()
+    return time.perf_counter() - start
+
+# ----------------------------------------------------
+# CONTENT HASHES
+# ----------------------------------------------------
+def expand(patterns):
+    paths = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern)))
+        else:
+            paths.append(pattern)
+    return paths
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprint(patterns):
+    h = hashlib.sha256()
+    for path in expand(patterns):
+        h.update(path.encode("utf-8"))
+        h.update(file_hash(path).encode() if os.path.isfile(path) else b"missing")
+    return h.hexdigest()
+
+
+def stage_fingerprint(name, stage, cfg):
+    """Hash of the stage's inputs, its settings (paths, --delta) and its script."""
+    settings = {
+        "stage": stage,
+        "config": {k: v for k, v in cfg.items() if k != "state_file"},
+        "delta": bool(cfg.get("delta")),
+    }
+    h = hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+    script = os.path.join(SCRIPT_DIR, STAGE_MODULES[name] + ".py")
+    h.update(fingerprint(list(stage["inputs"]) + [script]).encode())
+    return h.hexdigest()
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+# ----------------------------------------------------
+# SCHEDULER
+# ----------------------------------------------------
+def prebuilt(stage):
+    """Outputs are there but none of the inputs: nothing to rebuild them from."""
+    return (all(os.path.exists(p) for p in expand(stage["outputs"]))
+            and not any(os.path.exists(p) for p in expand(stage["inputs"])))
+
+
+def select_stages(stages, only):
+    """
+    The requested stages plus everything upstream of them. An upstream
+    stage whose outputs exist but whose inputs do not (e.g. pdf_to_text.txt
+    kept, the receipt PDFs gone) is left out and its outputs used as-is.
+    """
+    selected = set()
+    todo = list(only) if only else list(stages)
+    requested = set(todo) if only else set()
+    while todo:
+        name = todo.pop()
+        if name not in stages:
+            raise ValueError(f"Unknown stage: {name}")
+        if name in selected:
+            continue
+        if name not in requested and prebuilt(stages[name]):
+            print(f"[KEEP] {name}: outputs present, no inputs to rebuild them from")
+            continue
+        selected.add(name)
+        todo.extend(stages[name]["deps"])
+    return selected
+
+
+def run_dag(cfg, only=None, force=False, jobs=None):
+    stages = build_stages(cfg)
+    selected = select_stages(stages, only)
+    state = load_state(cfg["state_file"])
+
+    durations = {}
+    status = {}
+    pending = set(selected)
+    running = {}
+    t0 = time.perf_counter()
+
+    with ProcessPoolExecutor(jobs) as pool:
+        while pending or running:
+            # ----------- SUBMIT READY STAGES -----------
+            for name in sorted(pending):
+                deps = [d for d in stages[name]["deps"] if d in selected]
+                if any(d not in status for d in deps):
+                    continue
+                if any(status[d] == "failed" for d in deps):
+                    pending.discard(name)
+                    status[name] = "failed"
+                    durations[name] = 0.0
+                    print(f"[SKIP] {name}: upstream failed")
+                    continue
+
+                pending.discard(name)
+                fp = stage_fingerprint(name, stages[name], cfg)
+                outputs_ok = all(os.path.exists(p) for p in expand(stages[name]["outputs"]))
+                if not force and outputs_ok and state.get(name) == fp:
+                    status[name] = "unchanged"
+                    durations[name] = 0.0
+                    print(f"[SKIP] {name}: inputs unchanged")
+                    continue
+
+                print(f"[RUN ] {name}")
+                running[pool.submit(run_stage, name, cfg)] = name
+
+            if not running:
+                continue
+
+            # ----------- COLLECT FINISHED STAGES -----------
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    durations[name] = future.result()
+                    status[name] = "ran"
+                    # hash after the run: some stages update their own inputs
+                    state[name] = stage_fingerprint(name, stages[name], cfg)
+                    save_state(cfg["state_file"], state)
+                    print(f"[DONE] {name} ({durations[name]:.2f}s)")
+                except Exception as e:
+                    durations[name] = 0.0
+                    status[name] = "failed"
+                    print(f"[FAIL] {name}: {e}")
+
+    wall = time.perf_counter() - t0
+    report(stages, selected, durations, status, wall)
+    return status
+
+
+def critical_path(stages, selected, durations):
+    """Longest chain of dependent stage durations: (seconds, [stages])."""
+    finish = {}
+    best_dep = {}
+
+    def visit(name):
+        if name in finish:
+            return finish[name]
+        deps = [d for d in stages[name]["deps"] if d in selected]
+        prev = max(deps, key=visit, default=None)
+        best_dep[name] = prev
+        finish[name] = durations.get(name, 0.0) + (finish[prev] if prev else 0.0)
+        return finish[name]
+
+    end = max(selected, key=visit)
+    chain = []
+    while end:
+        chain.append(end)
+        end = best_dep[end]
+    return finish[chain[0]], list(reversed(chain))
+
+
+def report(stages, selected, durations, status, wall):
+    print("\n=== Pipeline Summary ===")
+    for name in stages:
+        if name in selected:
+            print(f"  {name:<16} {status.get(name, '-'):<10} {durations.get(name, 0.0):8.2f}s")
+
+    if selected:
+        length, chain = critical_path(stages, selected, durations)
+        print(f"Critical path: {' -> '.join(chain)} ({length:.2f}s)")
+    print(f"Stage time: {sum(durations.values()):.2f}s, wall time: {wall:.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the ETL stages as a dependency DAG.")
+    parser.add_argument("--config", help="JSON file overriding the default paths")
+    parser.add_argument("--only", nargs="+", metavar="STAGE",
+                        help="run these stages (and their upstream stages) only")
+    parser.add_argument("--force", action="store_true", help="ignore stored input hashes")
+    parser.add_argument("--jobs", type=int, default=None, help="max concurrent stages")
+    parser.add_argument("--delta", action="store_true",
+                        help="also write <output>_changes.csv change sets")
+    args = parser.parse_args(argv)
+
+    cfg = load_config(args.config)
+    if args.delta:
+        cfg["delta"] = True
+
+    status = run_dag(cfg, args.only, args.force, args.jobs)
+    return 1 if "failed" in status.values() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import math
+from bisect import bisect_left
+
+# ----------------------------------------------------
+# Single-pass, bounded-memory summaries that can be merged
+# (across weeks, across worker processes):
+#   TDigest       approximate quantiles (merging t-digest)
+#   RunningStats  count / mean / variance (Welford, Chan merge)
+#                 plus a TDigest of the same values
+# Both serialize to plain dicts for JSON state files.
+# ----------------------------------------------------
+
+DEFAULT_COMPRESSION = 100
+
+
+class TDigest:
+    """
+    Merging t-digest (Dunning). Keeps at most ~compression
+    centroids, small ones at the tails, so extreme quantiles
+    stay accurate. Values are buffered and folded in batches.
+    """
+
+    __slots__ = ("compression", "means", "weights", "total", "min", "max", "_buffer")
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = []
+        self.weights = []
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer = []
+
+    def add(self, x, w=1.0):
+        self._buffer.append((x, w))
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other):
+        for m, w in zip(other.means, other.weights):
+            self._buffer.append((m, w))
+        self._buffer.extend(other._buffer)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _k(self, q):
+        # k1 scale function: centroids shrink towards q=0 and q=1
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in points)
+
+        means, weights = [], []
+        cum = 0.0
+        cur_m, cur_w = points[0]
+        k_left = self._k(0.0)
+        for m, w in points[1:]:
+            q = (cum + cur_w + w) / total
+            if self._k(min(q, 1.0)) - k_left <= 1.0:
+                cur_m += (m - cur_m) * w / (cur_w + w)
+                cur_w += w
+            else:
+                means.append(cur_m)
+                weights.append(cur_w)
+                cum += cur_w
+                k_left = self._k(cum / total)
+                cur_m, cur_w = m, w
+        means.append(cur_m)
+        weights.append(cur_w)
+
+        self.means, self.weights, self.total = means, weights, total
+
+    def quantile(self, q):
+        self._compress()
+        if not self.means:
+            return None
+        if len(self.means) == 1:
+            return self.means[0]
+
+        # centroid i covers cumulative weight centered at mid[i]
+        mids = []
+        cum = 0.0
+        for w in self.weights:
+            mids.append(cum + w / 2)
+            cum += w
+        target = q * self.total
+
+        if target <= mids[0]:
+            return self._interp(0.0, self.min, mids[0], self.means[0], target)
+        if target >= mids[-1]:
+            return self._interp(mids[-1], self.means[-1], self.total, self.max, target)
+        i = bisect_left(mids, target)
+        return self._interp(mids[i - 1], self.means[i - 1], mids[i], self.means[i], target)
+
+    @staticmethod
+    def _interp(x0, y0, x1, y1, x):
+        if x1 == x0:
+            return y0
+        return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+    def to_dict(self):
+        self._compress()
+        return {"compression": self.compression, "means": self.means, "weights": self.weights,
+                "min": self.min if self.total else None, "max": self.max if self.total else None}
+
+    @classmethod
+    def from_dict(cls, d):
+        t = cls(d["compression"])
+        t.means = list(d["means"])
+        t.weights = list(d["weights"])
+        t.total = float(sum(t.weights))
+        if t.total:
+            t.min, t.max = d["min"], d["max"]
+        return t
+
+
+class RunningStats:
+    __slots__ = ("n", "mean", "m2", "digest")
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.digest = TDigest(compression)
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.digest.add(x)
+
+    def merge(self, other):
+        if other.n:
+            n = self.n + other.n
+            delta = other.mean - self.mean
+            self.mean += delta * other.n / n
+            self.m2 += other.m2 + delta * delta * self.n * other.n / n
+            self.n = n
+            self.digest.merge(other.digest)
+        return self
+
+    def copy(self):
+        return RunningStats(self.digest.compression).merge(self)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def to_dict(self):
+        return {"n": self.n, "mean": self.mean, "m2": self.m2, "digest": self.digest.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d):
+        s = cls()
+        s.n, s.mean, s.m2 = d["n"], d["mean"], d["m2"]
+        s.digest = TDigest.from_dict(d["digest"])
+        return s
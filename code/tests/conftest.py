@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the scripts are flat modules in code/
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CODE_DIR not in sys.path:
+    sys.path.insert(0, CODE_DIR)
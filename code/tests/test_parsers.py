@@ -0,0 +1,65 @@
+import random
+
+import get_the_item
+import line_classifier
+import regression_gate
+from employee_resolver import EmployeeResolver, normalize_name
+from item_scorer import MenuScorer
+
+
+def receipt_sample(bills=400, seed=regression_gate.SEED):
+    return regression_gate.receipt_lines(random.Random(seed), bills)
+
+
+# ----------------------------------------------------
+# line_classifier: same tokens as the per-script patterns
+# ----------------------------------------------------
+def test_classify_line_matches_legacy():
+    edge_cases = ["", "   ", "12345 (12345) Table#7", "TOTAL 12.34", "Total: 1.00 $", "3.MARIE",
+                  "3.Jean-Philippe", "1/06/25 19:45", "BIERE BLONDE FP", "Pourboire 4.50 ", "12.3"]
+    for line in receipt_sample() + edge_cases:
+        assert line_classifier.classify_line(line) == line_classifier.classify_line_legacy(line), line
+
+
+# ----------------------------------------------------
+# item_scorer: same scores as the per-candidate loops
+# ----------------------------------------------------
+def test_menu_scorer_matches_python_loops():
+    items = [(get_the_item.normalize(name), item_id)
+             for item_id, (name, _) in enumerate(regression_gate.MENU, start=1)]
+    scorer = MenuScorer(items)
+    rng = random.Random(7)
+    queries = [name for name, _ in items]
+    queries += [regression_gate._typo(rng, name) for name, _ in items]
+    queries += [name[:4] for name, _ in items] + ["ZZZ", "VIN", "BURGER CLASSIQUE XL"]
+
+    for query, (score, _) in zip(queries, scorer.best_similarity_batch(queries)):
+        assert score == max(get_the_item.similarity(query, name) for name, _ in items), query
+    for query, (score, _) in zip(queries, scorer.best_prefix_batch(queries)):
+        assert score == max(get_the_item.prefix_ratio(query, name) for name, _ in items), query
+
+
+# ----------------------------------------------------
+# employee_resolver: every name legacy matched keeps its id,
+# and a fuzzy match never assigns one
+# ----------------------------------------------------
+def test_employee_resolver_keeps_legacy_matches():
+    employee_map = {name: str(i) for i, name in enumerate(regression_gate.STAFF, start=1)}
+    legacy = {name.strip().upper(): employee_id for name, employee_id in employee_map.items()}
+    resolver = EmployeeResolver(employee_map)
+    exact = {normalize_name(name): employee_id for name, employee_id in employee_map.items()}
+
+    raw_names = [name.upper() for name in regression_gate.STAFF]
+    raw_names += [" " + name.upper() + " " for name in regression_gate.STAFF]
+    raw_names += ["ELODIE", "MARC ANDRE", "JEAN PHIL", "MARIO", "SOPHIA", "INCONNU", ""]
+
+    for raw in raw_names:
+        found = resolver.resolve(raw)
+        if raw.strip().upper() in legacy:
+            assert found == legacy[raw.strip().upper()], raw
+        else:
+            assert found == exact.get(normalize_name(raw)), raw
+
+    # truncated / misspelled names are only suggested, as pending aliases
+    assert resolver.resolve("JEAN PHIL") is None
+    assert "JEAN PHIL" in resolver.learned
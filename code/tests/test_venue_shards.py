@@ -0,0 +1,101 @@
+import os
+import time
+import sqlite3
+import threading
+
+import regression_gate
+import venue_shards
+
+
+def synthetic_venue(tmp_path, venue_id, bills, seed):
+    """A venue whose receipts / tables / reports are a small synthetic corpus."""
+    regression_gate.generate(venue_id, bills=bills, weeks=2, seed=seed, corpus_dir=str(tmp_path))
+    root = str(tmp_path / venue_id)
+    return {
+        "venue_id": venue_id,
+        "name": "AUBERGE LE CAMP DE BASE",
+        "root": root,
+        "paths": {
+            "bill_process_dir": os.path.join(root, "Process"),
+            "table_dir": os.path.join(root, "tables"),
+            "vente_dir": os.path.join(root, "vente"),
+        },
+    }
+
+
+def warehouse_bills(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT COUNT(*) FROM bill_id").fetchone()[0]
+
+
+def test_each_venue_gets_its_own_warehouse(tmp_path):
+    venues = [synthetic_venue(tmp_path, "V01", 300, 1), synthetic_venue(tmp_path, "V02", 500, 2)]
+
+    for venue in venues:
+        status = venue_shards.run_shard(venue, jobs=2)
+        assert status["local_warehouse"] == "ran"
+
+    paths = [os.path.join(venue["paths"]["bill_process_dir"], "warehouse.sqlite3") for venue in venues]
+    counts = []
+    for venue, path in zip(venues, paths):
+        assert os.path.exists(path)
+        with open(os.path.join(venue["paths"]["bill_process_dir"], "bill_id.csv"), encoding="utf-8") as f:
+            counts.append(sum(1 for _ in f) - 1)
+        assert warehouse_bills(path) == counts[-1]
+    assert counts[0] != counts[1]
+
+
+# ----------------------------------------------------
+# file-lock queue
+# ----------------------------------------------------
+def age_lock(queue, venue_id, seconds):
+    lock = queue._path(venue_id, "lock")
+    past = time.time() - seconds
+    os.utime(lock, (past, past))
+
+
+def test_claim_is_exclusive_until_finished(tmp_path):
+    queue = venue_shards.ShardQueue(str(tmp_path))
+    assert queue.claim("V01", "a")
+    assert not queue.claim("V01", "b")
+    assert queue.state("V01") == "lock"
+
+    assert queue.finish("V01", "a", {"extract_id": "ran"}, 1.0)
+    assert queue.state("V01") == "done"
+    assert not queue.claim("V01", "b")
+
+
+def test_stale_lock_is_taken_over(tmp_path):
+    queue = venue_shards.ShardQueue(str(tmp_path))
+    assert queue.claim("V01", "dead")
+    age_lock(queue, "V01", venue_shards.STALE_SECONDS + 5)
+
+    assert queue.claim("V01", "b")
+    assert queue.owner(queue._path("V01", "lock")) == "b"
+    assert [f for f in os.listdir(tmp_path) if ".stale." in f] == []
+
+
+def test_live_lock_is_not_taken_over(tmp_path):
+    queue = venue_shards.ShardQueue(str(tmp_path))
+    assert queue.claim("V01", "a")
+    age_lock(queue, "V01", venue_shards.STALE_SECONDS - 60)
+    assert not queue.claim("V01", "b")
+    assert queue.owner(queue._path("V01", "lock")) == "a"
+
+
+def test_taken_over_worker_keeps_the_new_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(venue_shards, "HEARTBEAT_SECONDS", 0.01)
+    queue = venue_shards.ShardQueue(str(tmp_path))
+    assert queue.claim("V01", "slow")
+    age_lock(queue, "V01", venue_shards.STALE_SECONDS + 5)
+    assert queue.claim("V01", "b")
+
+    # the old holder's heartbeat stops, and its finish leaves b's lock alone
+    stop = threading.Event()
+    beat = threading.Thread(target=queue.heartbeat, args=("V01", "slow", stop))
+    beat.start()
+    beat.join(timeout=5)
+    stop.set()
+    assert not beat.is_alive()
+    queue.finish("V01", "slow", {"extract_id": "ran"}, 1.0)
+    assert queue.owner(queue._path("V01", "lock")) == "b"
@@ -0,0 +1,271 @@
+import os
+import csv
+import json
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime
+
+from stream_stats import RunningStats
+from lookup_tables import parse_week_time
+
+# ----------------------------------------------------
+# Ticket size and tip % by server and by volume category.
+# bill_total.csv is streamed once and joined on the fly with
+# the bill_id.csv headers (employee, date). For every week
+# and group a RunningStats keeps count / mean / variance and
+# a t-digest, so memory does not grow with the number of
+# bills and weeks (or worker chunks) merge into one result.
+# ----------------------------------------------------
+
+# ----------------------------------------------------
+# PATHS
+# ----------------------------------------------------
+PROCESS_DIR = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process"
+BILL_ID_CSV = os.path.join(PROCESS_DIR, "bill_id.csv")
+BILL_TOTAL_CSV = os.path.join(PROCESS_DIR, "bill_total.csv")
+WEEK_TABLE = r"D:\Vente_extract\Feed\week_id_table.csv"
+
+STATS_CSV = os.path.join(PROCESS_DIR, "tip_stats.csv")
+STATE_JSON = os.path.join(PROCESS_DIR, "tip_stats_state.json")
+
+# ----------------------------------------------------
+# CONFIG
+# ----------------------------------------------------
+# Same nightly thresholds as olap_cube.py / analysis_query.sql
+VOLUME_SLOW_MAX = 39
+VOLUME_HIGH_MIN = 76
+
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+METRICS = ("ticket", "tip_percent")
+
+# 0 = single process; N = split bill_total.csv into chunks over N workers
+WORKERS = 0
+CHUNK_ROWS = 20000
+
+STATS_FIELDS = ["group_type", "group_value", "metric", "count", "mean", "variance"] + \
+    [f"p{int(q * 100)}" for q in QUANTILES]
+
+# ----------------------------------------------------
+# LOOKUPS
+# ----------------------------------------------------
+def load_headers(path=BILL_ID_CSV):
+    """bill_id -> (employee_id, date, time) and bills per date."""
+    headers = {}
+    per_day = Counter()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            headers[row["bill_id"]] = (row["employee_id"], row["date"], row["time"])
+            per_day[row["date"]] += 1
+    return headers, per_day
+
+
+def load_weeks(path=WEEK_TABLE):
+    """Sorted (starts, [(end, week_id)]) for bisect lookups."""
+    weeks = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            start = parse_week_time(row["week_start"])
+            end = parse_week_time(row["week_end"])
+            if start is None or end is None:
+                print(f"WARNING: {path} line {line_no}: unreadable week {row['week_start']!r} -> {row['week_end']!r}, skipped")
+                continue
+            weeks.append((start, end, int(row["week_id"])))
+    weeks.sort()
+    return [w[0] for w in weeks], [(w[1], w[2]) for w in weeks]
+
+
+def week_of(ts, weeks):
+    starts, ends = weeks
+    i = bisect_right(starts, ts) - 1
+    if i < 0 or ts > ends[i][0]:
+        return None
+    return ends[i][1]
+
+
+def volume_category(bills_that_day):
+    if bills_that_day <= VOLUME_SLOW_MAX:
+        return 1
+    if bills_that_day >= VOLUME_HIGH_MIN:
+        return 3
+    return 2
+
+# ----------------------------------------------------
+# STREAM
+# ----------------------------------------------------
+def collect(rows, headers, per_day, weeks):
+    """
+    One pass over bill_total rows.
+    Returns ({week_id: {(group_type, group_value): {metric: RunningStats}}}, unmatched)
+    """
+    result = {}
+    unmatched = 0
+    for row in rows:
+        header = headers.get(row["bill_id"])
+        if header is None:
+            unmatched += 1
+            continue
+
+        total = float(row["total"] or 0)
+        if total <= 0:
+            continue  # empty / staff bills, as in the analysis
+
+        employee_id, date, time = header
+        week_id = week_of(datetime.fromisoformat(f"{date} {time}"), weeks)
+        if week_id is None:
+            unmatched += 1
+            continue
+
+        values = {"ticket": total, "tip_percent": float(row["tip_percent"] or 0)}
+        groups = result.setdefault(week_id, {})
+        for key in (("all", "all"),
+                    ("employee", employee_id or "unknown"),
+                    ("volume_category", str(volume_category(per_day[date])))):
+            stats = groups.get(key)
+            if stats is None:
+                stats = groups[key] = {m: RunningStats() for m in METRICS}
+            for m in METRICS:
+                stats[m].add(values[m])
+
+    return result, unmatched
+
+
+def merge_weeks(target, other):
+    """Fold other's per-week groups into target (in place); other is only read."""
+    for week_id, groups in other.items():
+        t_groups = target.setdefault(week_id, {})
+        for key, stats in groups.items():
+            if key in t_groups:
+                for m in METRICS:
+                    t_groups[key][m].merge(stats[m])
+            else:
+                # a copy: later merges must not write into other's sketches
+                t_groups[key] = {m: stats[m].copy() for m in METRICS}
+    return target
+
+# ----------------------------------------------------
+# WORKERS
+# ----------------------------------------------------
+_worker_lookups = None
+
+
+def _init_worker(bill_id_csv, week_table):
+    global _worker_lookups
+    headers, per_day = load_headers(bill_id_csv)
+    _worker_lookups = (headers, per_day, load_weeks(week_table))
+
+
+def _collect_chunk(rows):
+    result, unmatched = collect(rows, *_worker_lookups)
+    return to_state(result), unmatched
+
+
+def _chunks(reader, size):
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_totals(workers=0):
+    with open(BILL_TOTAL_CSV, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+
+        if not workers:
+            headers, per_day = load_headers(BILL_ID_CSV)
+            return collect(reader, headers, per_day, load_weeks(WEEK_TABLE))
+
+        from concurrent.futures import ProcessPoolExecutor
+        result, unmatched = {}, 0
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(BILL_ID_CSV, WEEK_TABLE)) as pool:
+            for state, n in pool.map(_collect_chunk, _chunks(reader, CHUNK_ROWS)):
+                merge_weeks(result, from_state(state))
+                unmatched += n
+        return result, unmatched
+
+# ----------------------------------------------------
+# STATE (per-week sketches, so weeks merge across runs)
+# ----------------------------------------------------
+def to_state(result):
+    return {
+        str(week_id): {
+            f"{gt}|{gv}": {m: s.to_dict() for m, s in stats.items()}
+            for (gt, gv), stats in groups.items()
+        }
+        for week_id, groups in result.items()
+    }
+
+
+def from_state(state):
+    result = {}
+    for week_id, groups in state.items():
+        result[int(week_id)] = {
+            tuple(key.split("|", 1)): {m: RunningStats.from_dict(d) for m, d in stats.items()}
+            for key, stats in groups.items()
+        }
+    return result
+
+
+def load_state(path=STATE_JSON):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return from_state(json.load(f))
+
+
+def save_state(result, path=STATE_JSON):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(to_state(result), f)
+    os.replace(tmp, path)
+
+# ----------------------------------------------------
+# REPORT
+# ----------------------------------------------------
+def summarize(result, week_ids=None):
+    """Merge the chosen weeks (default: all) into report rows."""
+    merged = {}
+    for week_id in sorted(result):
+        if week_ids is None or week_id in week_ids:
+            merge_weeks(merged, {0: result[week_id]})
+
+    rows = []
+    for (gt, gv), stats in sorted(merged.get(0, {}).items()):
+        for m in METRICS:
+            s = stats[m]
+            row = {"group_type": gt, "group_value": gv, "metric": m, "count": s.n,
+                   "mean": round(s.mean, 4), "variance": round(s.variance, 4)}
+            for q in QUANTILES:
+                row[f"p{int(q * 100)}"] = round(s.digest.quantile(q), 4)
+            rows.append(row)
+    return rows
+
+
+def write_stats_csv(rows, path=STATS_CSV):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=STATS_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    current, unmatched = stream_totals(WORKERS)
+
+    # weeks seen in this run replace their stored sketches
+    result = load_state(STATE_JSON)
+    result.update(current)
+    save_state(result, STATE_JSON)
+
+    rows = summarize(result)
+    write_stats_csv(rows, STATS_CSV)
+
+    print(f"{len(current)} week(s) updated, {len(result)} in state, {unmatched} bill(s) without header/week")
+    print(f"Tip stats → {STATS_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import os
+import csv
+
+from lookup_tables import load_table
+from customer_count import load_bill_items, load_category_array
+from upsell_scoreboard import (load_rules, compile_rules, load_headers, load_paid_bills,
+                               transaction_headers, bill_scores)
+from rolling_load import load_levels
+
+# ----------------------------------------------------
+# Bootstrap confidence intervals for per-server upsell uplift.
+# For every (employee, volume category) group and upsell rule:
+#   rate      = rule score / estimated customers
+#   baseline  = same rate over every bill of that volume category
+#   uplift    = rate / baseline - 1      ("+70% vs house average")
+#   projected = (baseline - rate) x customers x unit price of the
+#               rule's items (item.price, quantity-weighted),
+#               for the groups whose point rate is below baseline
+#               (that set is fixed before resampling, so the
+#               interval is not pushed up by clipping noise at 0)
+# Bills are resampled with replacement inside each group. A batch
+# of replicates is one index matrix (replicates x bills), turned
+# into resample counts with one bincount, so every group sum of the
+# batch is a single matrix product. Batches have their own seed, so
+# WORKERS only changes the speed, never the intervals.
+# ----------------------------------------------------
+
+# ----------------------------------------------------
+# PATHS
+# ----------------------------------------------------
+PROCESS_DIR = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process"
+BILL_ID_CSV = os.path.join(PROCESS_DIR, "bill_id.csv")
+BILL_ITEMS_CSV = os.path.join(PROCESS_DIR, "bill_items.csv")
+BILL_TOTAL_CSV = os.path.join(PROCESS_DIR, "bill_total.csv")
+ITEM_TABLE = r"D:\TABLE FINAL\item_id.csv"
+OUTPUT_CSV = os.path.join(PROCESS_DIR, "uplift_ci.csv")
+BILL_LOAD_CSV = os.path.join(PROCESS_DIR, "bill_load.csv")
+
+# ----------------------------------------------------
+# CONFIG
+# ----------------------------------------------------
+RESAMPLES = 2000
+CONFIDENCE = 0.95
+SEED = 2025
+BATCH = 250        # replicates per index matrix / per worker task
+
+# 0 = single process; N = spread the batches over N workers
+WORKERS = 0
+
+# True = group by rolling hourly load level (bill_load.csv) instead of daily volume
+ROLLING_LOAD = False
+
+UPLIFT_FIELDS = ["employee_id", "volume_category", "rule", "bills", "customers",
+                 "rate", "baseline_rate", "uplift", "uplift_low", "uplift_high",
+                 "unit_price", "projected_revenue", "revenue_low", "revenue_high"]
+
+# ----------------------------------------------------
+# LOAD
+# ----------------------------------------------------
+def load_price_array(path=ITEM_TABLE):
+    """Dense item_id -> price array (NaN = unknown item / no price)."""
+    import numpy as np
+
+    table = load_table(path, "name", "item_id", id_type=int)
+    pairs = []
+    for item_id, row in zip(table.ids, table.rows):
+        try:
+            pairs.append((int(item_id), float(row.get("price"))))
+        except (TypeError, ValueError):
+            continue
+
+    size = max((i for i, _ in pairs), default=0) + 1
+    prices = np.full(size, np.nan)
+    for item_id, price in pairs:
+        if item_id >= 0:
+            prices[item_id] = price
+    return prices
+
+
+def rule_unit_prices(masks, n_rules, item_ids, quantities, prices, keep_lines):
+    """Quantity-weighted item.price of the lines each rule selects (NaN if none priced)."""
+    import numpy as np
+
+    def lookup(array, fill):
+        ok = (item_ids >= 0) & (item_ids < len(array))
+        return np.where(ok, array[np.clip(item_ids, 0, len(array) - 1)], fill)
+
+    bits = lookup(masks, np.uint64(0)).astype(np.uint64)
+    price = lookup(prices, np.nan)
+    priced = keep_lines & ~np.isnan(price)
+
+    unit = np.full(n_rules, np.nan)
+    for r in range(n_rules):
+        hit = priced & ((bits >> np.uint64(r)) & np.uint64(1)).astype(bool)
+        qty = quantities[hit].sum()
+        if qty > 0:
+            unit[r] = (quantities[hit] * price[hit]).sum() / qty
+    return unit
+
+# ----------------------------------------------------
+# GROUPS
+# ----------------------------------------------------
+def group_bills(bills, headers):
+    """[(employee_id, volume_category), ...] and the bill positions of each group."""
+    import numpy as np
+
+    keys, members = {}, []
+    for b, bill_id in enumerate(bills):
+        key = headers.get(str(bill_id))
+        if key is None:
+            continue
+        if key not in keys:
+            keys[key] = len(members)
+            members.append([])
+        members[keys[key]].append(b)
+
+    order = sorted(keys, key=lambda k: (_sort_id(k[0]), k[1]))
+    return order, [np.array(members[keys[k]], dtype=np.int64) for k in order]
+
+
+def _sort_id(value):
+    try:
+        return (0, int(value))
+    except (TypeError, ValueError):
+        return (1, str(value))
+
+# ----------------------------------------------------
+# BOOTSTRAP
+# ----------------------------------------------------
+_worker_groups = None
+
+
+def _init_worker(groups):
+    global _worker_groups
+    _worker_groups = groups
+
+
+def resample_batch(groups, n, seed):
+    """
+    groups: [(scores (bills x rules), customers (bills))].
+    Return (sums (groups x n x rules), customers (groups x n)) of n resamples.
+    """
+    import numpy as np
+
+    if not groups:
+        return np.empty((0, n, 0)), np.empty((0, n))
+
+    rng = np.random.default_rng(seed)
+    n_rules = groups[0][0].shape[1]
+    sums = np.empty((len(groups), n, n_rules))
+    customers = np.empty((len(groups), n))
+    rows = np.arange(n)[:, None]
+
+    for g, (scores, cust) in enumerate(groups):
+        size = len(cust)
+        idx = rng.integers(0, size, size=(n, size))                 # index matrix
+        counts = np.bincount((rows * size + idx).ravel(),
+                             minlength=n * size).reshape(n, size)   # times each bill drawn
+        sums[g] = counts @ scores
+        customers[g] = counts @ cust
+    return sums, customers
+
+
+def _resample_task(args):
+    n, seed = args
+    return resample_batch(_worker_groups, n, seed)
+
+
+def bootstrap(groups, resamples=RESAMPLES, seed=SEED, workers=0):
+    import numpy as np
+
+    sizes = [min(BATCH, resamples - start) for start in range(0, resamples, BATCH)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = list(zip(sizes, seeds))
+
+    if workers:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(groups,)) as pool:
+            parts = list(pool.map(_resample_task, tasks))
+    else:
+        parts = [resample_batch(groups, n, s) for n, s in tasks]
+
+    return (np.concatenate([p[0] for p in parts], axis=1),
+            np.concatenate([p[1] for p in parts], axis=1))
+
+# ----------------------------------------------------
+# ESTIMATES
+# ----------------------------------------------------
+def uplift_and_revenue(sums, customers, volume_of, unit_price, below):
+    """
+    sums (groups x ... x rules), customers (groups x ...): point values
+    or replicates; below (groups x rules): cells that get a projection.
+    Return (rate, baseline, uplift, projected revenue), each shaped like sums.
+    """
+    import numpy as np
+
+    base_sums = np.zeros_like(sums)
+    base_cust = np.zeros_like(customers)
+    for v in set(volume_of):
+        in_v = np.array([x == v for x in volume_of])
+        base_sums[in_v] = sums[in_v].sum(axis=0)
+        base_cust[in_v] = customers[in_v].sum(axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = sums / customers[..., None]
+        baseline = base_sums / base_cust[..., None]
+        uplift = rate / baseline - 1.0
+    gap = (baseline - rate) * customers[..., None] * unit_price
+    below = below.reshape(below.shape[:1] + (1,) * (sums.ndim - 2) + below.shape[1:])
+    revenue = np.where(below, gap, 0.0)
+    return rate, baseline, uplift, revenue
+
+
+def interval(replicates, axis):
+    """Percentile interval at CONFIDENCE, ignoring undefined replicates."""
+    import warnings
+    import numpy as np
+
+    tail = (1.0 - CONFIDENCE) / 2 * 100
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN cells stay NaN
+        return (np.nanpercentile(replicates, tail, axis=axis),
+                np.nanpercentile(replicates, 100 - tail, axis=axis))
+
+
+def build_rows(rules, keys, groups, boot, unit_price):
+    import numpy as np
+
+    volume_of = [volume for _, volume in keys]
+    sums = np.stack([scores.sum(axis=0) for scores, _ in groups])
+    customers = np.array([cust.sum() for _, cust in groups], dtype=np.float64)
+    everyone = np.ones(sums.shape, dtype=bool)
+    rate, baseline, uplift, _ = uplift_and_revenue(sums, customers, volume_of, unit_price, everyone)
+    with np.errstate(invalid="ignore"):
+        below = rate < baseline
+    _, _, _, revenue = uplift_and_revenue(sums, customers, volume_of, unit_price, below)
+
+    b_sums, b_cust = boot
+    _, _, b_uplift, b_revenue = uplift_and_revenue(b_sums, b_cust, volume_of, unit_price, below)
+    up_lo, up_hi = interval(b_uplift, axis=1)
+    rev_lo, rev_hi = interval(b_revenue, axis=1)
+    # a rule without a known unit price has no projection, not $0
+    unpriced = np.isnan(unit_price)
+    total = np.where(unpriced, np.nan, np.nansum(revenue, axis=0))
+    b_total = np.nansum(b_revenue, axis=0)
+    b_total[..., unpriced] = np.nan
+    tot_lo, tot_hi = interval(b_total, axis=0)
+
+    rows = []
+    for g, (employee_id, volume) in enumerate(keys):
+        for r, rule in enumerate(rules):
+            rows.append({
+                "employee_id": employee_id, "volume_category": volume, "rule": rule["name"],
+                "bills": len(groups[g][1]), "customers": int(customers[g]),
+                "rate": _fmt(rate[g, r]), "baseline_rate": _fmt(baseline[g, r]),
+                "uplift": _fmt(uplift[g, r]), "uplift_low": _fmt(up_lo[g, r]), "uplift_high": _fmt(up_hi[g, r]),
+                "unit_price": _fmt(unit_price[r], 2), "projected_revenue": _fmt(revenue[g, r], 2),
+                "revenue_low": _fmt(rev_lo[g, r], 2), "revenue_high": _fmt(rev_hi[g, r], 2),
+            })
+
+    # house total per rule: every group brought up to its volume baseline
+    for r, rule in enumerate(rules):
+        rows.append({
+            "employee_id": "ALL", "volume_category": "ALL", "rule": rule["name"],
+            "bills": sum(len(c) for _, c in groups), "customers": int(customers.sum()),
+            "rate": "", "baseline_rate": "", "uplift": "", "uplift_low": "", "uplift_high": "",
+            "unit_price": _fmt(unit_price[r], 2), "projected_revenue": _fmt(total[r], 2),
+            "revenue_low": _fmt(tot_lo[r], 2), "revenue_high": _fmt(tot_hi[r], 2),
+        })
+    return rows
+
+
+def _fmt(value, digits=4):
+    import math
+    return "" if value is None or math.isnan(value) else f"{value:.{digits}f}"
+
+# ----------------------------------------------------
+# WRITE CSV
+# ----------------------------------------------------
+def write_uplift_csv(rows, path=OUTPUT_CSV):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=UPLIFT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    import time
+    import numpy as np
+
+    period, rules = load_rules()
+    masks = compile_rules(rules, ITEM_TABLE)
+    categories = load_category_array(ITEM_TABLE)
+    prices = load_price_array(ITEM_TABLE)
+
+    levels = load_levels(BILL_LOAD_CSV) if ROLLING_LOAD else None
+    headers = load_headers(BILL_ID_CSV, period, levels)
+    bill_ids, item_ids, quantities = load_bill_items(BILL_ITEMS_CSV)
+    headers = transaction_headers(headers, bill_ids, item_ids, categories, load_paid_bills(BILL_TOTAL_CSV))
+
+    bills, scores, estimated = bill_scores(rules, masks, bill_ids, item_ids, quantities, categories)
+    keys, members = group_bills(bills, headers)
+    groups = [(scores[m], estimated[m].astype(np.float64)) for m in members]
+    if not groups:
+        write_uplift_csv([], OUTPUT_CSV)
+        print(f"No bill falls in an employee x volume group; empty uplift_ci.csv → {OUTPUT_CSV}")
+        return
+
+    keep_lines = np.isin(bill_ids, np.array(list(headers), dtype=str))
+    unit_price = rule_unit_prices(masks, len(rules), item_ids, quantities, prices, keep_lines)
+
+    start = time.perf_counter()
+    boot = bootstrap(groups, RESAMPLES, SEED, WORKERS)
+    elapsed = time.perf_counter() - start
+
+    rows = build_rows(rules, keys, groups, boot, unit_price)
+    write_uplift_csv(rows, OUTPUT_CSV)
+
+    print(f"{sum(len(m) for m in members)} bills, {len(keys)} employee x volume groups, "
+          f"{len(rules)} rules, {RESAMPLES} resamples in {elapsed:.1f}s")
+    for row in rows[-len(rules):]:
+        print(f"  {row['rule']}: projected ${row['projected_revenue'] or '?'} "
+              f"[{row['revenue_low'] or '?'} - {row['revenue_high'] or '?'}]")
+    print(f"uplift_ci.csv created → {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import os
+import re
+import csv
+import json
+from collections import Counter
+
+from lookup_tables import load_table
+from customer_count import load_bill_items, bill_index, estimate_customers, load_category_array
+from rolling_load import load_levels
+
+# ----------------------------------------------------
+# Upsell scoreboard (employee x volume category) driven by
+# upsell_rules.json instead of hardcoded SQL.
+# Each rule selects items by category and/or name pattern:
+#   no "per_customer"   -> sum of the selected quantities
+#   "per_customer": N   -> number of bills where the selected
+#                          quantity >= estimated_customers x N
+#                          (same comparison as analysis_query.sql)
+# Rules are compiled once into one bitmask per item_id
+# (bit r = item matches rule r); every bill line is then
+# expanded over all rules in one vectorized pass, so adding
+# a rule only adds a column.
+# ----------------------------------------------------
+
+# ----------------------------------------------------
+# PATHS
+# ----------------------------------------------------
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROCESS_DIR = r"D:\BASE CAMP TOOL\item_extract_fool_bill\Process"
+BILL_ID_CSV = os.path.join(PROCESS_DIR, "bill_id.csv")
+BILL_ITEMS_CSV = os.path.join(PROCESS_DIR, "bill_items.csv")
+BILL_TOTAL_CSV = os.path.join(PROCESS_DIR, "bill_total.csv")
+ITEM_TABLE = r"D:\TABLE FINAL\item_id.csv"
+RULES_FILE = os.path.join(SCRIPT_DIR, "upsell_rules.json")
+OUTPUT_CSV = os.path.join(PROCESS_DIR, "upsell_scoreboard.csv")
+BILL_LOAD_CSV = os.path.join(PROCESS_DIR, "bill_load.csv")
+
+# Same nightly thresholds as olap_cube.py / analysis_query.sql
+VOLUME_SLOW_MAX = 39
+VOLUME_HIGH_MIN = 76
+
+# transaction_25 filter (analysis_query.sql, local_warehouse.py): only bills
+# with a food item (these categories) and a positive total are scored
+FOOD_CATEGORIES = (1, 2)
+
+# True = volume_category is the bill's rolling hourly load level
+# (bill_load.csv from rolling_load.py) instead of its day's bill count
+ROLLING_LOAD = False
+
+MAX_RULES = 64   # one bit per rule in a uint64 mask
+
+
+class RuleError(Exception):
+    pass
+
+# ----------------------------------------------------
+# RULES
+# ----------------------------------------------------
+def load_rules(path=RULES_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+
+    rules = spec.get("rules", [])
+    if not rules:
+        raise RuleError(f"No rules in {path}")
+    if len(rules) > MAX_RULES:
+        raise RuleError(f"At most {MAX_RULES} rules are supported, got {len(rules)}")
+
+    names = set()
+    for rule in rules:
+        if "name" not in rule:
+            raise RuleError(f"Rule without a name: {rule}")
+        if rule["name"] in names:
+            raise RuleError(f"Duplicate rule name: {rule['name']}")
+        if "categories" not in rule and "name_pattern" not in rule:
+            raise RuleError(f"Rule {rule['name']} needs 'categories' and/or 'name_pattern'")
+        names.add(rule["name"])
+
+    return spec.get("period"), rules
+
+
+def compile_rules(rules, item_table):
+    """Return a dense uint64 array: item_id -> bitmask of the rules it matches."""
+    import numpy as np
+
+    categories = load_category_array(item_table)
+    table = load_table(item_table, "name", "item_id", id_type=int)
+
+    ids, names = [], []
+    for item_id, name in zip(table.ids, table.names):
+        if isinstance(item_id, int) and 0 <= item_id < len(categories):
+            ids.append(item_id)
+            names.append(name or "")
+    ids = np.array(ids, dtype=np.int64)
+    item_cats = categories[ids]
+
+    masks = np.zeros(len(categories), dtype=np.uint64)
+    for r, rule in enumerate(rules):
+        match = np.ones(len(ids), dtype=bool)
+        if "categories" in rule:
+            match &= np.isin(item_cats, rule["categories"])
+        if "name_pattern" in rule:
+            pattern = re.compile(rule["name_pattern"])
+            match &= np.array([bool(pattern.search(n)) for n in names], dtype=bool)
+        masks[ids[match]] |= np.uint64(1 << r)
+    return masks
+
+# ----------------------------------------------------
+# HEADERS
+# ----------------------------------------------------
+def volume_category(bills_that_day):
+    if bills_that_day <= VOLUME_SLOW_MAX:
+        return 1
+    if bills_that_day >= VOLUME_HIGH_MIN:
+        return 3
+    return 2
+
+
+def load_headers(path=BILL_ID_CSV, period=None, levels=None):
+    """
+    bill_id -> (employee_id, volume_category) for bills inside the period.
+    levels: bill_id -> load level; replaces the daily category when given.
+    """
+    start = period.get("start") if period else None
+    end = period.get("end") if period else None
+
+    rows = []
+    per_day = Counter()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            date = row["date"]
+            if (start and date < start) or (end and date > end):
+                continue
+            rows.append((row["bill_id"], row["employee_id"], date))
+            per_day[date] += 1
+
+    if levels is not None:
+        return {bill_id: (employee_id, levels[bill_id])
+                for bill_id, employee_id, _ in rows if bill_id in levels}
+    return {bill_id: (employee_id, volume_category(per_day[date]))
+            for bill_id, employee_id, date in rows}
+
+def load_paid_bills(path=BILL_TOTAL_CSV):
+    """bill_ids with a positive bill_total.csv total."""
+    paid = set()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            try:
+                if float(row["total"] or 0) > 0:
+                    paid.add(row["bill_id"])
+            except ValueError:
+                continue
+    return paid
+
+
+def transaction_headers(headers, bill_ids, item_ids, categories, paid):
+    """
+    Keep the headers of transaction_25 bills. Drinks-only and zero-total
+    bills have 0 estimated customers, so they would meet every
+    per-customer rule and count in total_bills_analyzed.
+    """
+    import numpy as np
+
+    known = (item_ids >= 0) & (item_ids < len(categories))
+    food = np.zeros(len(item_ids), dtype=bool)
+    food[known] = np.isin(categories[item_ids[known]], FOOD_CATEGORIES)
+    with_food = set(np.unique(bill_ids[food]).tolist())
+    return {bill_id: key for bill_id, key in headers.items() if bill_id in with_food and bill_id in paid}
+
+# ----------------------------------------------------
+# SCOREBOARD
+# ----------------------------------------------------
+def rule_quantities(bill_idx, n_bills, item_ids, quantities, masks, n_rules):
+    """(bills x rules) matrix of matched quantities, one bincount for all rules."""
+    import numpy as np
+
+    in_table = (item_ids >= 0) & (item_ids < len(masks))
+    bits = np.where(in_table, masks[np.clip(item_ids, 0, len(masks) - 1)], np.uint64(0))
+
+    shifts = np.arange(n_rules, dtype=np.uint64)
+    hits = ((bits[:, None] >> shifts) & np.uint64(1)).astype(bool)   # lines x rules
+    line, rule = np.nonzero(hits)
+    flat = np.bincount(bill_idx[line] * n_rules + rule, weights=quantities[line],
+                       minlength=n_bills * n_rules)
+    return flat.reshape(n_bills, n_rules)
+
+
+def bill_scores(rules, masks, bill_ids, item_ids, quantities, categories):
+    """
+    Return (bills, scores, estimated): scores[b, r] is bill b's quantity
+    for rule r, or 1/0 for a per-customer rule met/not met.
+    """
+    bills, bill_idx = bill_index(bill_ids)
+    _, _, _, estimated = estimate_customers(bill_ids, item_ids, quantities, categories)
+    qty = rule_quantities(bill_idx, len(bills), item_ids, quantities, masks, len(rules))
+
+    scores = qty.copy()
+    for r, rule in enumerate(rules):
+        if "per_customer" in rule:
+            scores[:, r] = qty[:, r] >= estimated * rule["per_customer"]
+    return bills, scores, estimated
+
+
+def build_scoreboard(rules, masks, bill_ids, item_ids, quantities, categories, headers):
+    import numpy as np
+
+    bills, scores, estimated = bill_scores(rules, masks, bill_ids, item_ids, quantities, categories)
+
+    # group bills (with a header in the period) by employee x volume
+    groups = {}
+    group_of = np.full(len(bills), -1, dtype=np.int64)
+    for b, bill_id in enumerate(bills):
+        key = headers.get(str(bill_id))
+        if key is not None:
+            group_of[b] = groups.setdefault(key, len(groups))
+
+    keep = group_of >= 0
+    n_groups = len(groups)
+    totals = np.zeros((n_groups, len(rules)))
+    np.add.at(totals, group_of[keep], scores[keep])
+    n_bills = np.bincount(group_of[keep], minlength=n_groups)
+    customers = np.bincount(group_of[keep], weights=estimated[keep], minlength=n_groups)
+
+    fieldnames = ["employee_id", "volume_category", "total_bills_analyzed", "total_customer_count"] + \
+        [rule["name"] for rule in rules]
+    records = []
+    for (employee_id, volume), g in groups.items():
+        record = {"employee_id": employee_id, "volume_category": volume,
+                  "total_bills_analyzed": int(n_bills[g]), "total_customer_count": int(customers[g])}
+        for r, rule in enumerate(rules):
+            record[rule["name"]] = f"{totals[g, r]:g}"
+        records.append(record)
+
+    records.sort(key=lambda rec: (_sort_id(rec["employee_id"]), rec["volume_category"]))
+    return fieldnames, records
+
+
+def _sort_id(value):
+    try:
+        return (0, int(value))
+    except (TypeError, ValueError):
+        return (1, str(value))
+
+# ----------------------------------------------------
+# WRITE CSV
+# ----------------------------------------------------
+def write_scoreboard_csv(fieldnames, records, path=OUTPUT_CSV):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def main():
+    period, rules = load_rules(RULES_FILE)
+    masks = compile_rules(rules, ITEM_TABLE)
+    categories = load_category_array(ITEM_TABLE)
+
+    levels = load_levels(BILL_LOAD_CSV) if ROLLING_LOAD else None
+    headers = load_headers(BILL_ID_CSV, period, levels)
+    bill_ids, item_ids, quantities = load_bill_items(BILL_ITEMS_CSV)
+    headers = transaction_headers(headers, bill_ids, item_ids, categories, load_paid_bills(BILL_TOTAL_CSV))
+
+    fieldnames, records = build_scoreboard(rules, masks, bill_ids, item_ids, quantities, categories, headers)
+    write_scoreboard_csv(fieldnames, records, OUTPUT_CSV)
+
+    print(f"{len(rules)} rules, {len(records)} employee x volume rows")
+    print(f"upsell_scoreboard.csv created → {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 import os
 import re
 import csv
+import json
+import hashlib
+import itertools
 import unicodedata
 from datetime import datetime
 from pathlib import Path
-import pdfplumber
 import tempfile
 
+from delta_outputs import write_changes
+
 # -------------------------
 # CONFIG PATHS
 # -------------------------
@@ -27,6 +31,13 @@ ESCOMPTE_FIELDS = ["week_id", "escompte_id", "number", "amount"]
 METHODE_FIELDS = ["week_id", "methode_paiement_id", "number", "pourcentage"]
 TOTAL_FIELDS = ["week_id", "total_before_escompte", "total_after_escompte", "t_p_s", "t_v_q", "total_sale"]
 
+# Also write total_sale_changes.csv (insert/update/delete vs previous run)
+DELTA_MODE = False
+
+# Read only the needed sections from word positions (see LAYOUT MODE)
+LAYOUT_MODE = False
+LAYOUT_CACHE = FEED_DIR / "layout_cache.json"
+
 # -------------------------
 # NORMALIZATION
 # -------------------------
@@ -249,84 +260,434 @@ def parse_payment_line(line: str):
     label = normalize_text(raw_label)
     return label, number, percent
 
+# -------------------------
+# AMOUNT TABLE
+# One pass over the report: every monetary amount with its
+# line index, column and sign, plus the line numbers of the
+# section keywords. Totals and taxes are then looked up in
+# this table instead of re-scanning the text.
+# -------------------------
+# Extracted text keeps a single space between columns, so in
+# "Sous-total 4 575,26 $" the count may be glued to the amount as
+# 4 575,26. parse_readings() keeps both readings and settle_totals()
+# picks the ones the report's own arithmetic agrees with.
+AMOUNT_RE = re.compile(
+    r"""(?P<open>\()?(?P<lead>-)?\s*\$?\s*(?P<lead2>-)?\s*
+    (?P<num>
+        \d{1,3}(?:,\d{3})+\.\d{2}               # 1,234.56
+      | \d{1,3}(?:[ \u00A0\u202F.]\d{3})+,\d{2}  # 1 234,56  1.234,56
+      | \d+[.,]\d{2}                           # 1234.56  1234,56
+    )(?!\d)(?!\s*%)
+    \s*\$?(?P<trail>-)?(?P<close>\))?""",
+    re.X,
+)
+
+TOTAL_LINE_RE = re.compile(r"^\s*Total\b", re.IGNORECASE)
+SUBTOTAL_RE = re.compile(r"Sous-?total", re.IGNORECASE)
+
+KEYWORDS = ("VENTES REGUL", "TOTAL DES ESCOMPTE", "TPS", "T.P.S", "TVQ", "T.V.Q")
+
+
+def parse_amount(m):
+    """Signed float from an AMOUNT_RE match (French or English decimals)."""
+    num = m.group("num")
+    whole, dec = num[:-3], num[-2:]
+    value = float(re.sub(r"[^\d]", "", whole) + "." + dec)
+    negative = m.group("lead") or m.group("lead2") or m.group("trail") or (
+        m.group("open") and m.group("close"))
+    return -value if negative else value
+
+
+def parse_readings(m):
+    """Readings of an AMOUNT_RE match: (value,) or (value, value without its first group)."""
+    value = parse_amount(m)
+    num = m.group("num")
+    head, sep, rest = num.partition(" ")
+    if not sep or num[-3] != "," or m.group("open") or m.group("lead") or m.group("lead2"):
+        return (value,)
+    # "4 575,26": a count column followed by 575,26
+    alt = float(re.sub(r"[^\d]", "", rest[:-3]) + "." + rest[-2:])
+    return (value, -alt if m.group("trail") else alt)
+
+
+class AmountTable:
+    def __init__(self, text: str):
+        self.lines = text.splitlines()
+        self.amounts = []            # per line: [(column, readings), ...]
+        self.keyword_lines = {k: [] for k in KEYWORDS}
+        self.total_lines = []        # lines starting with "Total"
+
+        for i, ln in enumerate(self.lines):
+            self.amounts.append([(m.start("num"), parse_readings(m)) for m in AMOUNT_RE.finditer(ln)])
+
+            norm = normalize_text(ln)
+            for k in KEYWORDS:
+                if k in norm:
+                    self.keyword_lines[k].append(i)
+            if TOTAL_LINE_RE.search(ln):
+                self.total_lines.append(i)
+
+    def first_line(self, *keywords):
+        found = [self.keyword_lines[k][0] for k in keywords if self.keyword_lines[k]]
+        return min(found) if found else None
+
+    def first_amount(self, i, after_col=0):
+        """Readings of the first amount at or after after_col, or None."""
+        for col, readings in self.amounts[i]:
+            if col >= after_col:
+                return readings
+        return None
+
+    def subtotal_after(self, start, window):
+        for i in range(start, min(start + window, len(self.lines))):
+            if not self.amounts[i]:
+                continue
+            m = SUBTOTAL_RE.search(self.lines[i])
+            if m:
+                readings = self.first_amount(i, m.end())
+                if readings is not None:
+                    return readings
+        return None
+
 # -------------------------
 # TOTALS
+# Each finder returns the readings of its amount (see
+# parse_readings); settle_totals() picks one per field.
 # -------------------------
-def find_total_before_escompte(text: str):
-    lines = text.splitlines()
-    start_idx = None
-    for i, ln in enumerate(lines):
-        if "VENTES REGUL" in normalize_text(ln):
-            start_idx = i
-            break
+def find_total_before_escompte(table: AmountTable):
+    start_idx = table.first_line("VENTES REGUL")
     if start_idx is None:
         return None
-    for ln in lines[start_idx:start_idx+40]:
-        m = re.search(r"Sous-?total.*?\$?[-]?\s*([\d,]+\.\d{2})", ln, re.IGNORECASE)
-        if m:
-            return float(m.group(1).replace(",", ""))
-    return None
+    return table.subtotal_after(start_idx, 40)
 
-def find_total_after_escompte(text: str):
-    lines = text.splitlines()
-    esc_total_idx = None
-    for i, ln in enumerate(lines):
-        if "TOTAL DES ESCOMPTE" in normalize_text(ln):
-            esc_total_idx = i
-            break
+def find_total_after_escompte(table: AmountTable):
+    esc_total_idx = table.first_line("TOTAL DES ESCOMPTE")
     if esc_total_idx is None:
         return None
-    for ln in lines[esc_total_idx:esc_total_idx+30]:
-        m = re.search(r"Sous-?total.*?\$?[-]?\s*([\d,]+\.\d{2})", ln, re.IGNORECASE)
-        if m:
-            return float(m.group(1).replace(",", ""))
-    return None
+    return table.subtotal_after(esc_total_idx, 30)
 
-def find_taxes_and_total(text: str):
-    lines = text.splitlines()
-    tps = None
-    tvq = None
-    total_sale = None
+def find_escompte_total(table: AmountTable):
+    esc_total_idx = table.first_line("TOTAL DES ESCOMPTE")
+    if esc_total_idx is None:
+        return None
+    m = re.search(r"ESCOMPTES?", normalize_text(table.lines[esc_total_idx]))
+    return table.first_amount(esc_total_idx, m.end() if m else 0)
+
+def find_taxes_and_total(table: AmountTable):
+    def last_tax(*keys):
+        # last line mentioning the tax that carries an amount
+        lines = sorted(set(i for k in keys for i in table.keyword_lines[k]))
+        for i in reversed(lines):
+            if table.amounts[i]:
+                return table.amounts[i][0][1]
+        return None
 
-    for ln in lines:
-        norm = normalize_text(ln)
-        if "TPS" in norm or "T.P.S" in norm:
-            m = re.search(r"\$?[-]?\s*([\d,]+\.\d{2})", ln)
-            if m:
-                tps = float(m.group(1).replace(",", ""))
-        if "TVQ" in norm or "T.V.Q" in norm:
-            m = re.search(r"\$?[-]?\s*([\d,]+\.\d{2})", ln)
-            if m:
-                tvq = float(m.group(1).replace(",", ""))
+    tps = last_tax("TPS", "T.P.S")
+    tvq = last_tax("TVQ", "T.V.Q")
+    total_sale = None
 
-    tax_idx = None
-    for i, ln in enumerate(lines):
-        if "TPS" in normalize_text(ln) or "TVQ" in normalize_text(ln):
-            tax_idx = i
-            break
+    tax_idx = table.first_line("TPS", "TVQ")
 
     if tax_idx is not None:
-        for ln in lines[tax_idx:tax_idx+40]:
-            if re.search(r"^\s*Total\b", ln, re.IGNORECASE):
-                m = re.search(r"\$?[-]?\s*([\d,]+\.\d{2})", ln)
-                if m:
-                    total_sale = float(m.group(1).replace(",", ""))
-                    break
+        for i in table.total_lines:
+            if tax_idx <= i < tax_idx + 40 and table.amounts[i]:
+                total_sale = table.amounts[i][0][1]
+                break
 
     if total_sale is None:
-        for ln in reversed(lines):
-            if re.search(r"^\s*Total\b", ln, re.IGNORECASE):
-                m = re.search(r"\$?[-]?\s*([\d,]+\.\d{2})", ln)
-                if m:
-                    total_sale = float(m.group(1).replace(",", ""))
-                    break
+        for i in reversed(table.total_lines):
+            if table.amounts[i]:
+                total_sale = table.amounts[i][0][1]
+                break
 
     return tps, tvq, total_sale
 
+def settle_totals(table: AmountTable):
+    """(before, after, tps, tvq, total) with one reading per amount.
+
+    Where a count may be glued to an amount, the readings are chosen so
+    that before + escomptes = after and after + tps + tvq = total hold
+    as closely as possible; ties and unchecked amounts keep the first
+    (whole) reading.
+    """
+    tps, tvq, total_sale = find_taxes_and_total(table)
+    fields = [find_total_before_escompte(table), find_total_after_escompte(table),
+              tps, tvq, total_sale, find_escompte_total(table)]
+    options = [[(None, 0)] if f is None else list(zip(f, range(len(f)))) for f in fields]
+
+    def cost(pick):
+        (tb, _), (ta, _), (tp, _), (tv, _), (tot, _), (esc, _) = pick
+        gap = 0.0
+        if None not in (tb, ta, esc):
+            gap += abs(tb + esc - ta)
+        if None not in (ta, tp, tv, tot):
+            gap += abs(ta + tp + tv - tot)
+        return round(gap, 2), sum(alt for _, alt in pick)
+
+    best = min(itertools.product(*options), key=cost)
+    return tuple(value for value, _ in best[:5])
+
+# -------------------------
+# TEXT MODE
+# Full text of every page, sections found with line regexes.
+# -------------------------
+def read_report_text(doc):
+    full_text = "\n".join(page.extract_text() or "" for page in doc.pages)
+    return {
+        "header": full_text,
+        "escomptes": [p for p in map(parse_escompte_line, extract_escompte_block(full_text)) if p],
+        "paiements": [p for p in map(parse_payment_line, extract_payment_block(full_text)) if p],
+        # NEW FIX: Remove entrainement section before totals
+        "totals": remove_entrainement_section(full_text),
+    }
+
+# -------------------------
+# LAYOUT MODE
+# Words are grouped into rows by their vertical position and
+# the sections are found on those rows with the same anchors
+# as text mode. The rows each section covers are cached per
+# report template (page count, size, page-1 wording); later
+# reports of that template only extract those cropped regions,
+# and fall back to a full pass if an anchor is not inside them.
+# Columns are split by word order, not by whitespace.
+# -------------------------
+ROW_TOLERANCE = 3     # points: words closer than this share a row
+CROP_SLACK = 48       # points added above/below a cached region
+TEMPLATE_WORDS = 12   # leading words of page 1 that identify a template
+COLUMN_GAP = 1.0      # gap wider than this many word heights = next column
+
+
+def join_words(words):
+    """Words of one row -> text; one space inside a cell, two between columns."""
+    parts = []
+    for prev, w in zip([None] + words[:-1], words):
+        if prev is not None:
+            parts.append("  " if w["x0"] - prev["x1"] > COLUMN_GAP * w["height"] else " ")
+        parts.append(w["text"])
+    return "".join(parts)
+
+
+def words_to_rows(words, page_no):
+    rows = []
+    for w in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        if rows and abs(w["top"] - rows[-1]["top"]) <= ROW_TOLERANCE:
+            rows[-1]["words"].append(w)
+            rows[-1]["bottom"] = max(rows[-1]["bottom"], w["bottom"])
+        else:
+            rows.append({"page": page_no, "top": w["top"], "bottom": w["bottom"], "words": [w]})
+    for r in rows:
+        r["words"].sort(key=lambda w: w["x0"])
+        r["text"] = join_words(r["words"])
+        r["norm"] = normalize_text(r["text"])
+    return rows
+
+
+def find_sections(rows):
+    """name -> (first row, last row, first body row, last body row), inclusive."""
+    def first(pred, start=0, stop=None):
+        for i in range(start, len(rows) if stop is None else min(stop, len(rows))):
+            if pred(rows[i]):
+                return i
+        return None
+
+    found = {}
+
+    date_row = first(lambda r: "@" in r["text"] and parse_date_range(r["text"])[0] is not None)
+    if date_row is not None:
+        found["header"] = (date_row, date_row, date_row, date_row)
+
+    regul = first(lambda r: "VENTES REGUL" in r["norm"])
+    esc = first(lambda r: "ESCOMPTES" in r["norm"], regul or 0)
+    if esc is not None:
+        esc_end = first(lambda r: "TOTAL DES ESCOMPTES" in r["norm"], esc + 1)
+        if esc_end is not None:
+            found["escomptes"] = (esc, esc_end, esc + 1, esc_end - 1)
+
+    pay = first(lambda r: "MODES DE PAIEMENT GLOBAL" in r["norm"])
+    if pay is not None:
+        header = first(lambda r: "DESCRIPTION" in r["norm"], pay)
+        header = pay if header is None else header
+        pay_end = first(lambda r: r["norm"].startswith("TOTAL"), header + 1)
+        if pay_end is not None:
+            found["paiements"] = (pay, pay_end, header + 1, pay_end - 1)
+
+    if regul is not None:
+        stop = first(lambda r: "VENTES ENTRAINEMENT" in r["norm"], regul)
+        tax = first(lambda r: "TPS" in r["norm"] or "TVQ" in r["norm"], regul, stop)
+        if tax is not None:
+            total = first(lambda r: TOTAL_LINE_RE.search(r["text"]), tax, tax + 40 if stop is None else min(tax + 40, stop))
+            if total is not None:
+                found["totals"] = (regul, total, regul, total)
+
+    return found
+
+
+def section_regions(rows, first, last):
+    """[[page, top, bottom], ...] covering rows first..last (None = page edge)."""
+    pages = {}
+    for r in rows[first:last + 1]:
+        top, bottom = pages.get(r["page"], (r["top"], r["bottom"]))
+        pages[r["page"]] = (min(top, r["top"]), max(bottom, r["bottom"]))
+    ordered = sorted(pages)
+    regions = []
+    for p in ordered:
+        top, bottom = pages[p]
+        regions.append([p, None if p != ordered[0] else top, None if p != ordered[-1] else bottom])
+    return regions
+
+
+def _split_amount_row(row, with_percent):
+    """label / number / [percent] / amount columns of a section row."""
+    toks = [w["text"] for w in row["words"]]
+    for j in range(1, len(toks)):
+        m = AMOUNT_RE.fullmatch(join_words(row["words"][j:]))
+        if m:
+            break
+    else:
+        return None
+
+    k = j
+    percent = None
+    if with_percent:
+        if k > 1 and toks[k - 1] == "%":
+            toks[k - 2] += "%"
+            k -= 1
+        if k < 1 or not re.fullmatch(r"[\d.,]+%", toks[k - 1]):
+            return None
+        percent = float(toks[k - 1][:-1].replace(",", ".")) / 100.0
+        k -= 1
+
+    if k < 2 or not toks[k - 1].isdigit():
+        return None
+    label = normalize_text(" ".join(toks[:k - 1]))
+    if not label:
+        return None
+    return label, int(toks[k - 1]), percent, parse_amount(m)
+
+
+def parse_escompte_row(row):
+    parsed = _split_amount_row(row, with_percent=False)
+    if not parsed:
+        return None
+    label, number, _, amount = parsed
+    return label, number, abs(amount)
+
+
+def parse_payment_row(row):
+    parsed = _split_amount_row(row, with_percent=True)
+    if not parsed:
+        return None
+    label, number, percent, _ = parsed
+    return label, number, percent
+
+
+def template_key(doc):
+    first = doc.pages[0]
+    words = [re.sub(r"\d", "", w["text"]) for w in first.extract_words()[:TEMPLATE_WORDS]]
+    sig = f"{len(doc.pages)}|{round(first.width)}x{round(first.height)}|{' '.join(w for w in words if w)}"
+    return hashlib.sha1(sig.encode("utf-8")).hexdigest()[:16]
+
+
+def _cropped_rows(doc, regions):
+    # merge the regions of every section per page, then crop once per interval
+    per_page = {}
+    for p, top, bottom in regions:
+        page = doc.pages[p]
+        top = 0 if top is None else max(0, top - CROP_SLACK)
+        bottom = page.height if bottom is None else min(page.height, bottom + CROP_SLACK)
+        per_page.setdefault(p, []).append([top, bottom])
+
+    rows = []
+    for p in sorted(per_page):
+        intervals = sorted(per_page[p])
+        merged = [intervals[0]]
+        for top, bottom in intervals[1:]:
+            if top <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], bottom)
+            else:
+                merged.append([top, bottom])
+        page = doc.pages[p]
+        for top, bottom in merged:
+            part = (p, top, bottom, top <= 0, bottom >= page.height)
+            for r in words_to_rows(page.crop((0, top, page.width, bottom)).extract_words(), p):
+                r["part"] = part
+                rows.append(r)
+    return rows
+
+
+def _inside_crop(rows, first, last):
+    """True when rows first..last were read from one unbroken stretch of crops."""
+    parts = sorted({r["part"] for r in rows[first:last + 1]})
+    pages = [part[0] for part in parts]
+    if pages != list(range(pages[0], pages[-1] + 1)):
+        return False      # one page twice (gap between crops) or a page missing
+    return all(part[4] for part in parts[:-1]) and all(part[3] for part in parts[1:])
+
+
+def _sections_from_rows(rows, spans):
+    def body(name):
+        if name not in spans:
+            return []
+        _, _, b0, b1 = spans[name]
+        return rows[b0:b1 + 1]
+
+    def text(name):
+        if name not in spans:
+            return ""
+        first, last, _, _ = spans[name]
+        return "\n".join(r["text"] for r in rows[first:last + 1])
+
+    return {
+        "header": text("header"),
+        "escomptes": [p for p in map(parse_escompte_row, body("escomptes")) if p],
+        "paiements": [p for p in map(parse_payment_row, body("paiements")) if p],
+        "totals": text("totals"),
+    }
+
+
+def read_report_layout(doc, cache):
+    """Return (sections, how) where how is "cached" or "scanned"; updates cache."""
+    key = template_key(doc)
+    cached = cache.get(key)
+
+    if cached:
+        regions = [reg for name in cached["sections"] for reg in cached["sections"][name]]
+        rows = _cropped_rows(doc, regions)
+        spans = find_sections(rows)
+        if all(name in spans and _inside_crop(rows, spans[name][0], spans[name][1])
+               for name in cached["sections"]):
+            return _sections_from_rows(rows, spans), "cached"
+
+    rows = []
+    for p, page in enumerate(doc.pages):
+        rows.extend(words_to_rows(page.extract_words(), p))
+    spans = find_sections(rows)
+
+    cache[key] = {"sections": {name: section_regions(rows, first, last)
+                               for name, (first, last, _, _) in spans.items()}}
+    return _sections_from_rows(rows, spans), "scanned"
+
+
+def load_layout_cache(path: Path):
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_layout_cache(path: Path, cache):
+    os.makedirs(path.parent, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(str(tmp), str(path))
+
 # -------------------------
 # MAIN PROCESS
 # -------------------------
 def process_all():
+    import pdfplumber
+
     print("[START] Processing PDFs...")
 
     ensure_csv(ESCOMPTE_CSV, ESCOMPTE_FIELDS)
@@ -347,16 +708,22 @@ def process_all():
             for r in reader:
                 existing_totals[r.get("week_id")] = r
 
+    layout_cache = load_layout_cache(LAYOUT_CACHE) if LAYOUT_MODE else None
+
     pdfs = sorted(INPUT_DIR.glob("*.pdf"))
     for pdf in pdfs:
         print(f"[PDF] {pdf.name}")
         try:
             with pdfplumber.open(str(pdf)) as doc:
-                full_text = "\n".join(page.extract_text() or "" for page in doc.pages)
+                if LAYOUT_MODE:
+                    sections, how = read_report_layout(doc, layout_cache)
+                    print(f"  layout: {how}")
+                else:
+                    sections = read_report_text(doc)
         except:
             continue
 
-        start_dt, end_dt = parse_date_range(full_text)
+        start_dt, end_dt = parse_date_range(sections["header"])
         if not start_dt:
             continue
 
@@ -364,16 +731,8 @@ def process_all():
         if not week_id:
             continue
 
-        # NEW FIX: Remove entrainement section before totals
-        clean_text = remove_entrainement_section(full_text)
-
         # -------- ESCOMPTES --------
-        esc_block = extract_escompte_block(full_text)
-        for ln in esc_block:
-            parsed = parse_escompte_line(ln)
-            if not parsed:
-                continue
-            label, number, amount = parsed
+        for label, number, amount in sections["escomptes"]:
             eid = esc_map.get(label)
             if not eid:
                 write_unmatched(week_id, label)
@@ -391,12 +750,7 @@ def process_all():
                 existing_esc[key] = row
 
         # -------- PAIEMENT --------
-        pay_block = extract_payment_block(full_text)
-        for ln in pay_block:
-            parsed = parse_payment_line(ln)
-            if not parsed:
-                continue
-            label, number, percent = parsed
+        for label, number, percent in sections["paiements"]:
             mid = pay_map.get(label)
             if not mid:
                 write_unmatched(week_id, label)
@@ -414,9 +768,8 @@ def process_all():
                 existing_pay[key] = row
 
         # -------- TOTALS --------
-        tb = find_total_before_escompte(clean_text)
-        ta = find_total_after_escompte(clean_text)
-        tps, tvq, total_sale_val = find_taxes_and_total(clean_text)
+        amounts = AmountTable(sections["totals"])
+        tb, ta, tps, tvq, total_sale_val = settle_totals(amounts)
 
         if any(v is not None for v in (tb, ta, tps, tvq, total_sale_val)):
             row = {
@@ -429,6 +782,10 @@ def process_all():
             }
             existing_totals[week_id] = row
 
+    if DELTA_MODE:
+        rows = [existing_totals[wid] for wid in sorted(existing_totals.keys())]
+        write_changes(TOTAL_CSV, rows, TOTAL_FIELDS, ["week_id"])
+
     temp_path = OUTPUT_DIR / (TOTAL_CSV.name + ".tmp")
     with open(temp_path, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=TOTAL_FIELDS)
@@ -437,6 +794,8 @@ def process_all():
             writer.writerow(existing_totals[wid])
 
     os.replace(str(temp_path), str(TOTAL_CSV))
+    if LAYOUT_MODE:
+        save_layout_cache(LAYOUT_CACHE, layout_cache)
     print("[FINISHED] All PDFs processed.")
 
 if __name__ == "__main__":
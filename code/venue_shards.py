@@ -0,0 +1,361 @@
+import os
+import csv
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+
+import run_pipeline
+from checkpoint import atomic_output
+
+# ----------------------------------------------------
+# Multi-venue processing. Every venue is one shard: its own
+# PDFs, lookup tables, outputs and pipeline state under its
+# root folder (layout in VENUE_LAYOUT), and its own receipt
+# header for PDF_TO_TXT. venues.json lists the venues plus a
+# queue folder and a merged-output folder, all on a shared
+# drive.
+#
+# Work queue = one lock file per shard in the queue folder,
+# created with O_CREAT | O_EXCL (atomic on local disks, SMB
+# and NFS), so any number of workers on any number of machines
+# can run `work` against the same venues.json:
+#   <venue_id>.lock    claimed; mtime refreshed every
+#                      HEARTBEAT_SECONDS, taken over when
+#                      older than STALE_SECONDS (dead worker)
+#   <venue_id>.done    finished (stage status per stage)
+#   <venue_id>.failed  a stage failed (not retried until reset)
+#
+#   python venue_shards.py work [--workers 4] [--jobs 2]
+#   python venue_shards.py status
+#   python venue_shards.py merge
+#   python venue_shards.py reset [--failed-only]
+#
+# merge writes one CSV per fact / lookup table with venue_id
+# as the first column, so bill ids, item ids and employee ids
+# that repeat across venues stay distinct.
+# ----------------------------------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+VENUES_FILE = os.path.join(SCRIPT_DIR, "venues.json")
+
+HEARTBEAT_SECONDS = 30
+STALE_SECONDS = 600
+
+# config key -> folder under the venue root (run_pipeline config keys)
+VENUE_LAYOUT = {
+    "bill_input_dir": os.path.join("bills", "Input"),
+    "bill_process_dir": os.path.join("bills", "Process"),
+    "table_dir": "tables",
+    "sales_dir": "sales",
+    "vente_dir": "vente",
+    "price_dir": "price",
+}
+
+# merged file -> (config key of its folder, path under that folder)
+MERGE_TABLES = {
+    "bill_id.csv": ("bill_process_dir", "bill_id.csv"),
+    "bill_items.csv": ("bill_process_dir", "bill_items.csv"),
+    "bill_total.csv": ("bill_process_dir", "bill_total.csv"),
+    "bill_customers.csv": ("bill_process_dir", "bill_customers.csv"),
+    "bill_load.csv": ("bill_process_dir", "bill_load.csv"),
+    "total_sale.csv": ("vente_dir", os.path.join("Output", "total_sale.csv")),
+    "escompte_sale.csv": ("vente_dir", os.path.join("Output", "escompte_sale.csv")),
+    "methode_paiement_sale.csv": ("vente_dir", os.path.join("Output", "methode_paiement_sale.csv")),
+    "item_id.csv": ("table_dir", "item_id.csv"),
+    "Employee.csv": ("table_dir", "Employee.csv"),
+    "week_id_table.csv": ("vente_dir", os.path.join("Feed", "week_id_table.csv")),
+}
+
+# ----------------------------------------------------
+# VENUES
+# ----------------------------------------------------
+def load_spec(path=VENUES_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+
+    ids = [str(v["venue_id"]) for v in spec.get("venues", [])]
+    if not ids:
+        raise ValueError(f"No venues in {path}")
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Duplicate venue_id in {path}")
+    for key in ("queue_dir", "merged_dir"):
+        if key not in spec:
+            raise ValueError(f"'{key}' missing from {path}")
+    return spec
+
+
+def venue_config(venue):
+    """run_pipeline config for one venue: its folders, header and state file."""
+    root = venue["root"]
+    cfg = dict(run_pipeline.DEFAULT_CONFIG)
+    for key, folder in VENUE_LAYOUT.items():
+        cfg[key] = os.path.join(root, folder)
+    cfg["state_file"] = os.path.join(root, "pipeline_state.json")
+    cfg["venue_headers"] = list(venue.get("headers") or [venue.get("name", "")])
+    cfg.update(venue.get("paths", {}))       # per-venue exceptions to the layout
+    return cfg
+
+# ----------------------------------------------------
+# FILE-LOCK QUEUE
+# ----------------------------------------------------
+class ShardQueue:
+    def __init__(self, queue_dir):
+        self.dir = queue_dir
+        os.makedirs(queue_dir, exist_ok=True)
+
+    def _path(self, venue_id, kind):
+        return os.path.join(self.dir, f"{venue_id}.{kind}")
+
+    def state(self, venue_id):
+        for kind in ("done", "failed", "lock"):
+            if os.path.exists(self._path(venue_id, kind)):
+                return kind
+        return "todo"
+
+    def claim(self, venue_id, worker):
+        """Take the shard's lock; False if finished or held by a live worker."""
+        if self.state_done(venue_id):
+            return False
+        lock = self._path(venue_id, "lock")
+        for _ in range(2):
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._break_stale(lock):
+                    return False
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"worker": worker, "claimed": time.time()}, f)
+            # a worker may have finished the shard between state() and open()
+            if self.state_done(venue_id):
+                os.remove(lock)
+                return False
+            return True
+        return False
+
+    def state_done(self, venue_id):
+        return any(os.path.exists(self._path(venue_id, k)) for k in ("done", "failed"))
+
+    @staticmethod
+    def owner(lock):
+        """Worker named in a lock file; None if it is gone or still being written."""
+        try:
+            with open(lock, "r", encoding="utf-8") as f:
+                return json.load(f).get("worker")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _break_stale(self, lock):
+        try:
+            age = time.time() - os.path.getmtime(lock)
+        except FileNotFoundError:
+            return True
+        if age < STALE_SECONDS:
+            return False
+        holder = self.owner(lock)
+
+        # rename is atomic: only one worker wins the takeover
+        stale = f"{lock}.stale.{socket.gethostname()}.{os.getpid()}"
+        try:
+            os.replace(lock, stale)
+        except FileNotFoundError:
+            return True
+
+        # between the age check and the rename the holder may have beaten,
+        # or the lock may have been broken and re-claimed by another worker
+        age = time.time() - os.path.getmtime(stale)
+        if age < STALE_SECONDS or self.owner(stale) != holder:
+            try:
+                os.link(stale, lock)        # put it back unless a new lock exists
+            except FileExistsError:
+                pass
+            os.remove(stale)
+            return False
+
+        os.remove(stale)
+        print(f"[QUEUE] took over stale lock {os.path.basename(lock)} ({age:.0f}s old)")
+        return True
+
+    def heartbeat(self, venue_id, worker, stop):
+        lock = self._path(venue_id, "lock")
+        while not stop.wait(HEARTBEAT_SECONDS):
+            if self.owner(lock) != worker:
+                print(f"[QUEUE] {worker} lost the lock on venue {venue_id}")
+                return
+            try:
+                os.utime(lock)
+            except FileNotFoundError:
+                return
+
+    def finish(self, venue_id, worker, status, seconds):
+        failed = "failed" in status.values()
+        with atomic_output(self._path(venue_id, "failed" if failed else "done"), "w", encoding="utf-8") as f:
+            json.dump({"worker": worker, "finished": time.time(), "seconds": round(seconds, 2),
+                       "stages": status}, f, indent=2)
+        # the marker is written; only release the lock if it is still ours
+        lock = self._path(venue_id, "lock")
+        if self.owner(lock) == worker:
+            try:
+                os.remove(lock)
+            except FileNotFoundError:
+                pass
+        return not failed
+
+    def reset(self, venue_ids, failed_only=False):
+        kinds = ("failed",) if failed_only else ("done", "failed")
+        removed = 0
+        for venue_id in venue_ids:
+            for kind in kinds:
+                path = self._path(venue_id, kind)
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+# ----------------------------------------------------
+# WORKERS
+# ----------------------------------------------------
+def run_shard(venue, jobs=None, force=False):
+    cfg = venue_config(venue)
+    for key in VENUE_LAYOUT:
+        os.makedirs(cfg[key], exist_ok=True)
+    return run_pipeline.run_dag(cfg, force=force, jobs=jobs)
+
+
+def work(spec_path=VENUES_FILE, jobs=None, force=False, worker=None):
+    """Claim and run shards until none is left; return (ran, failed)."""
+    spec = load_spec(spec_path)
+    queue = ShardQueue(spec["queue_dir"])
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    ran, failed = 0, 0
+
+    for venue in spec["venues"]:
+        venue_id = str(venue["venue_id"])
+        if not queue.claim(venue_id, worker):
+            continue
+
+        print(f"[SHARD] {worker} → venue {venue_id} ({venue.get('name', '')})")
+        stop = threading.Event()
+        beat = threading.Thread(target=queue.heartbeat, args=(venue_id, worker, stop), daemon=True)
+        beat.start()
+        start = time.perf_counter()
+        try:
+            status = run_shard(venue, jobs, force)
+        except Exception as e:
+            status = {"_shard": "failed", "_error": str(e)}
+            print(f"[SHARD] venue {venue_id} failed: {e}")
+        finally:
+            stop.set()
+            beat.join()
+
+        if queue.finish(venue_id, worker, status, time.perf_counter() - start):
+            ran += 1
+        else:
+            failed += 1
+    return ran, failed
+
+
+def _work_process(spec_path, jobs, force, n):
+    ran, failed = work(spec_path, jobs, force, f"{socket.gethostname()}:{os.getpid()}#{n}")
+    sys.exit(1 if failed else 0)
+
+
+def work_local(spec_path=VENUES_FILE, workers=1, jobs=None, force=False):
+    """Run `workers` worker processes on this machine; other machines may run their own."""
+    if workers <= 1:
+        return 0 if work(spec_path, jobs, force)[1] == 0 else 1
+
+    import multiprocessing
+    procs = [multiprocessing.Process(target=_work_process, args=(spec_path, jobs, force, n))
+             for n in range(workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    return 1 if any(p.exitcode for p in procs) else 0
+
+# ----------------------------------------------------
+# STATUS / MERGE
+# ----------------------------------------------------
+def status(spec_path=VENUES_FILE):
+    spec = load_spec(spec_path)
+    queue = ShardQueue(spec["queue_dir"])
+    counts = {}
+    for venue in spec["venues"]:
+        venue_id = str(venue["venue_id"])
+        state = queue.state(venue_id)
+        counts[state] = counts.get(state, 0) + 1
+        print(f"  {venue_id:<8} {state:<7} {venue.get('name', '')}")
+    print(", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    return counts
+
+
+def merge(spec_path=VENUES_FILE, tables=None):
+    """Concatenate each table over all venues with a leading venue_id column."""
+    spec = load_spec(spec_path)
+    os.makedirs(spec["merged_dir"], exist_ok=True)
+    written = {}
+
+    for name in tables or MERGE_TABLES:
+        key, rel = MERGE_TABLES[name]
+        sources = []
+        fieldnames = []
+        for venue in spec["venues"]:
+            path = os.path.join(venue_config(venue)[key], rel)
+            if not os.path.exists(path):
+                continue
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                header = next(csv.reader(f), [])
+            fieldnames += [c for c in header if c not in fieldnames and c != "venue_id"]
+            sources.append((str(venue["venue_id"]), path))
+        if not sources:
+            continue
+
+        out = os.path.join(spec["merged_dir"], name)
+        rows = 0
+        with atomic_output(out, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["venue_id"] + fieldnames)
+            writer.writeheader()
+            for venue_id, path in sources:
+                with open(path, newline="", encoding="utf-8-sig") as src:
+                    for row in csv.DictReader(src):
+                        row["venue_id"] = venue_id
+                        writer.writerow(row)
+                        rows += 1
+        written[name] = (len(sources), rows)
+        print(f"  {name:<28} {len(sources)} venue(s), {rows} rows")
+
+    print(f"Merged tables → {spec['merged_dir']}")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process venues as shards through a file-lock queue.")
+    parser.add_argument("command", choices=["work", "status", "merge", "reset"])
+    parser.add_argument("--venues", default=VENUES_FILE, help="venues.json")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes on this machine")
+    parser.add_argument("--jobs", type=int, default=None, help="concurrent stages per shard")
+    parser.add_argument("--force", action="store_true", help="ignore stored input hashes")
+    parser.add_argument("--failed-only", action="store_true", help="reset: only clear failed shards")
+    args = parser.parse_args(argv)
+
+    if args.command == "work":
+        return work_local(args.venues, args.workers, args.jobs, args.force)
+    if args.command == "status":
+        status(args.venues)
+        return 0
+    if args.command == "merge":
+        merge(args.venues)
+        return 0
+
+    spec = load_spec(args.venues)
+    n = ShardQueue(spec["queue_dir"]).reset([str(v["venue_id"]) for v in spec["venues"]], args.failed_only)
+    print(f"{n} marker(s) cleared")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+-- PARTITION BENCHMARK (EXPLAIN)
+-- Database: PostgreSQL 12+
+-- Run with psql after migrate_to_partitioned.sql, while the *_heap tables
+-- still exist:
+--     psql -d <db> -f benchmark_partitions.sql > benchmark_partitions.txt
+--
+-- Each query runs once against the old heap tables and once against the
+-- partitioned ones. In the partitioned plans, look for:
+--   * only the summer months listed under the Append node, and
+--     "Subplans Removed" where pruning happens at run time
+--   * Bitmap Index Scan on brin_* / ix_bill_items_bill_item instead of
+--     Seq Scan on the whole history
+--   * Execution Time and "Buffers: shared hit/read" against the heap plan
+
+\timing on
+SET enable_partitionwise_join = on;
+SET enable_partitionwise_aggregate = on;
+
+-- ==========================================
+-- 1. DATE FILTER (DailyVolumes in analysis_query.sql)
+-- ==========================================
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT "date", COUNT(bill_id) AS total_bills_that_day
+FROM bill_id_heap
+WHERE "date" BETWEEN '2025-06-01' AND '2025-10-31'
+GROUP BY "date";
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT "date", COUNT(bill_id) AS total_bills_that_day
+FROM bill_id
+WHERE "date" BETWEEN '2025-06-01' AND '2025-10-31'
+GROUP BY "date";
+
+-- ==========================================
+-- 2. BILL x ITEM JOIN ON bill_id (as analysis_query.sql writes it)
+-- ==========================================
+-- bill_id is pruned to the summer months; bill_items is reached
+-- through (bill_id, item_id) in every partition.
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT b.employee_id, SUM(bi.quantity)
+FROM bill_id_heap b
+JOIN bill_items_heap bi ON bi.bill_id = b.bill_id
+JOIN item i ON i.item_id = bi.item_id
+WHERE b."date" BETWEEN '2025-06-01' AND '2025-10-31'
+  AND i.category_id = 2
+GROUP BY b.employee_id;
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT b.employee_id, SUM(bi.quantity)
+FROM bill_id b
+JOIN bill_items bi ON bi.bill_id = b.bill_id
+JOIN item i ON i.item_id = bi.item_id
+WHERE b."date" BETWEEN '2025-06-01' AND '2025-10-31'
+  AND i.category_id = 2
+GROUP BY b.employee_id;
+
+-- ==========================================
+-- 3. SAME JOIN ON THE PARTITION KEY
+-- ==========================================
+-- Joining on (bill_id, date) = (bill_id, bill_date) prunes bill_items
+-- too and lets the planner join partition by partition.
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT b.employee_id, SUM(bi.quantity)
+FROM bill_id b
+JOIN bill_items bi ON bi.bill_id = b.bill_id AND bi.bill_date = b."date"
+JOIN item i ON i.item_id = bi.item_id
+WHERE b."date" BETWEEN '2025-06-01' AND '2025-10-31'
+  AND bi.bill_date BETWEEN '2025-06-01' AND '2025-10-31'
+  AND i.category_id = 2
+GROUP BY b.employee_id;
+
+-- ==========================================
+-- 4. TIPS BY MONTH (bill_total co-partitioned with bill_id)
+-- ==========================================
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT date_trunc('month', b."date") AS month, AVG(bt.tip_percent)
+FROM bill_id_heap b
+JOIN bill_total_heap bt ON bt.bill_id = b.bill_id
+WHERE b."date" BETWEEN '2025-06-01' AND '2025-10-31'
+GROUP BY 1;
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT date_trunc('month', b."date") AS month, AVG(bt.tip_percent)
+FROM bill_id b
+JOIN bill_total bt ON bt.bill_id = b.bill_id AND bt.bill_date = b."date"
+WHERE b."date" BETWEEN '2025-06-01' AND '2025-10-31'
+GROUP BY 1;
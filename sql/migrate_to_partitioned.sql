@@ -0,0 +1,121 @@
+-- MIGRATION: heap transaction tables -> schema_partitioned.sql
+-- Database: PostgreSQL 12+
+-- Run with psql from the sql/ folder:
+--     psql -d <db> -f migrate_to_partitioned.sql
+--
+-- One transaction: the old tables are renamed to *_heap, the partitioned
+-- tables are created, every row is copied (bill_items / bill_total get
+-- their bill's date), and the row counts are checked before COMMIT.
+-- The *_heap tables are kept for benchmark_partitions.sql; drop them
+-- with the statements at the end once you are satisfied.
+
+\set ON_ERROR_STOP on
+
+BEGIN;
+
+-- ==========================================
+-- 1. MOVE THE HEAP TABLES ASIDE
+-- ==========================================
+
+-- bill_load references bill_id (bill_id), which is no longer unique on its own
+ALTER TABLE IF EXISTS bill_load DROP CONSTRAINT IF EXISTS fk_bill_load_bill;
+
+ALTER TABLE bill_total RENAME TO bill_total_heap;
+ALTER TABLE bill_items RENAME TO bill_items_heap;
+ALTER TABLE bill_id RENAME TO bill_id_heap;
+
+-- free the index / sequence names the new tables use
+ALTER INDEX IF EXISTS bill_id_pkey RENAME TO bill_id_heap_pkey;
+ALTER INDEX IF EXISTS bill_id_bill_id_key RENAME TO bill_id_heap_bill_id_key;
+ALTER INDEX IF EXISTS bill_items_pkey RENAME TO bill_items_heap_pkey;
+ALTER INDEX IF EXISTS bill_total_pkey RENAME TO bill_total_heap_pkey;
+ALTER SEQUENCE IF EXISTS bill_id_id_seq RENAME TO bill_id_heap_id_seq;
+ALTER SEQUENCE IF EXISTS bill_items_id_seq RENAME TO bill_items_heap_id_seq;
+ALTER SEQUENCE IF EXISTS bill_total_id_seq RENAME TO bill_total_heap_id_seq;
+
+-- ==========================================
+-- 2. CREATE THE PARTITIONED TABLES
+-- ==========================================
+
+\ir schema_partitioned.sql
+
+-- partitions for every month present in the data
+SELECT create_month_partitions(p.parent, r.min_date, r.max_date)
+FROM (SELECT MIN(date) AS min_date, MAX(date) AS max_date FROM bill_id_heap) r,
+     unnest(ARRAY['bill_id', 'bill_items', 'bill_total']) AS p(parent)
+WHERE min_date IS NOT NULL;
+
+-- ==========================================
+-- 3. COPY (ordered by date so BRIN ranges stay tight)
+-- ==========================================
+
+INSERT INTO bill_id (id, bill_id, employee_id, table_id, date, time, is_redistribuee)
+SELECT id, bill_id, employee_id, table_id, date, time, is_redistribuee
+FROM bill_id_heap
+ORDER BY date, bill_id;
+
+INSERT INTO bill_items (id, bill_id, bill_date, item_id, quantity)
+SELECT bi.id, bi.bill_id, b.date, bi.item_id, bi.quantity
+FROM bill_items_heap bi
+JOIN bill_id_heap b ON b.bill_id = bi.bill_id
+ORDER BY b.date, bi.bill_id;
+
+INSERT INTO bill_total (id, bill_id, bill_date, total, payment, tip_percent)
+SELECT bt.id, bt.bill_id, b.date, bt.total, bt.payment, bt.tip_percent
+FROM bill_total_heap bt
+JOIN bill_id_heap b ON b.bill_id = bt.bill_id
+ORDER BY b.date, bt.bill_id;
+
+-- keep the serial counters ahead of the copied ids
+SELECT setval(pg_get_serial_sequence('bill_id', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM bill_id;
+SELECT setval(pg_get_serial_sequence('bill_items', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM bill_items;
+SELECT setval(pg_get_serial_sequence('bill_total', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM bill_total;
+
+-- ==========================================
+-- 4. CHECK
+-- ==========================================
+-- Every bill is copied; child rows without a bill (orphans the old FK
+-- allowed through NULL bill_id) are reported, not copied.
+
+DO $$
+DECLARE
+    old_bills BIGINT; new_bills BIGINT;
+    old_items BIGINT; new_items BIGINT; orphan_items BIGINT;
+    old_totals BIGINT; new_totals BIGINT; orphan_totals BIGINT;
+BEGIN
+    SELECT COUNT(*) INTO old_bills FROM bill_id_heap;
+    SELECT COUNT(*) INTO new_bills FROM bill_id;
+    SELECT COUNT(*) INTO old_items FROM bill_items_heap;
+    SELECT COUNT(*) INTO new_items FROM bill_items;
+    SELECT COUNT(*) INTO old_totals FROM bill_total_heap;
+    SELECT COUNT(*) INTO new_totals FROM bill_total;
+
+    SELECT COUNT(*) INTO orphan_items FROM bill_items_heap bi
+    WHERE NOT EXISTS (SELECT 1 FROM bill_id_heap b WHERE b.bill_id = bi.bill_id);
+    SELECT COUNT(*) INTO orphan_totals FROM bill_total_heap bt
+    WHERE NOT EXISTS (SELECT 1 FROM bill_id_heap b WHERE b.bill_id = bt.bill_id);
+
+    IF new_bills <> old_bills
+       OR new_items <> old_items - orphan_items
+       OR new_totals <> old_totals - orphan_totals THEN
+        RAISE EXCEPTION 'row counts differ: bills %/%, items %/% (% orphans), totals %/% (% orphans)',
+            new_bills, old_bills, new_items, old_items, orphan_items, new_totals, old_totals, orphan_totals;
+    END IF;
+
+    RAISE NOTICE 'migrated % bills, % items, % totals (% / % orphan rows left in *_heap)',
+        new_bills, new_items, new_totals, orphan_items, orphan_totals;
+END;
+$$;
+
+COMMIT;
+
+ANALYZE bill_id;
+ANALYZE bill_items;
+ANALYZE bill_total;
+
+-- ==========================================
+-- 5. AFTER BENCHMARKING (run by hand)
+-- ==========================================
+-- DROP TABLE bill_total_heap;
+-- DROP TABLE bill_items_heap;
+-- DROP TABLE bill_id_heap;
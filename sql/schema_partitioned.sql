@@ -0,0 +1,116 @@
+-- PARTITIONED TRANSACTION TABLES
+-- Project: restaurant customer segmentatiom
+-- Database: PostgreSQL 12+
+--
+-- Drop-in variant of section 2 of schema_setup.sql. On a new database, use it
+-- in place of that section (the other sections run unchanged, except that
+-- bill_load's foreign key has to be left out: bill_id alone is no longer
+-- unique). Convert an existing database with migrate_to_partitioned.sql.
+--
+-- bill_id is range-partitioned by month on "date". bill_items and bill_total
+-- carry the bill's date as bill_date and are partitioned the same way, so a
+-- month of bills, its items and its totals live in matching partitions.
+-- Table and column names are unchanged: analysis_query.sql runs as is, and a
+-- "date" BETWEEN filter only reads the months it covers.
+
+-- ==========================================
+-- 1. MONTHLY PARTITION HELPER
+-- ==========================================
+
+-- Creates <parent>_YYYY_MM for every month in [from_month, to_month]
+-- (existing partitions are left alone). Run it again before a new season.
+CREATE OR REPLACE FUNCTION create_month_partitions(parent TEXT, from_month DATE, to_month DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    m DATE := date_trunc('month', from_month);
+    created INTEGER := 0;
+BEGIN
+    WHILE m <= to_month LOOP
+        IF to_regclass(format('%s_%s', parent, to_char(m, 'YYYY_MM'))) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                format('%s_%s', parent, to_char(m, 'YYYY_MM')), parent,
+                m, (m + INTERVAL '1 month')::DATE);
+            created := created + 1;
+        END IF;
+        m := (m + INTERVAL '1 month')::DATE;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- ==========================================
+-- 2. TRANSACTION TABLES (partitioned)
+-- ==========================================
+-- Unique keys on a partitioned table must include the partition key,
+-- so bills are unique on (bill_id, date) and the child tables reference
+-- that pair. There is no (id, date) primary key: it would make the date
+-- NOT NULL, and bills without a date belong in the DEFAULT partition.
+
+-- Bills ( The Main Ticket)
+CREATE TABLE IF NOT EXISTS bill_id (
+    id SERIAL,
+    bill_id INTEGER, -- The ID from the POS
+    employee_id INTEGER,
+    table_id INTEGER,
+    date DATE,
+    time TIME,
+    is_redistribuee BOOLEAN,
+    CONSTRAINT uq_bill_id_date UNIQUE (bill_id, date),
+    CONSTRAINT fk_bill_employee FOREIGN KEY (employee_id)
+        REFERENCES employee (employee_id)
+) PARTITION BY RANGE (date);
+
+-- Bill Items (Individual Rows on a Bill)
+CREATE TABLE IF NOT EXISTS bill_items (
+    id SERIAL,
+    bill_id INTEGER,
+    bill_date DATE, -- copy of bill_id.date (partition key)
+    item_id INTEGER,
+    quantity REAL,
+    CONSTRAINT fk_bill_items_bill FOREIGN KEY (bill_id, bill_date)
+        REFERENCES bill_id (bill_id, date),
+    CONSTRAINT fk_bill_items_item FOREIGN KEY (item_id)
+        REFERENCES item (item_id)
+) PARTITION BY RANGE (bill_date);
+
+-- Bill Totals (Payment Info)
+CREATE TABLE IF NOT EXISTS bill_total (
+    id SERIAL,
+    bill_id INTEGER,
+    bill_date DATE, -- copy of bill_id.date (partition key)
+    total REAL,
+    payment REAL,
+    tip_percent REAL,
+    CONSTRAINT fk_bill_total_bill FOREIGN KEY (bill_id, bill_date)
+        REFERENCES bill_id (bill_id, date)
+) PARTITION BY RANGE (bill_date);
+
+-- Months outside the created range, and bills without a date
+CREATE TABLE IF NOT EXISTS bill_id_default PARTITION OF bill_id DEFAULT;
+CREATE TABLE IF NOT EXISTS bill_items_default PARTITION OF bill_items DEFAULT;
+CREATE TABLE IF NOT EXISTS bill_total_default PARTITION OF bill_total DEFAULT;
+
+SELECT create_month_partitions('bill_id', '2024-01-01', '2026-12-01');
+SELECT create_month_partitions('bill_items', '2024-01-01', '2026-12-01');
+SELECT create_month_partitions('bill_total', '2024-01-01', '2026-12-01');
+
+
+-- ==========================================
+-- 3. INDEXES (created on every partition)
+-- ==========================================
+
+-- BRIN: bills are loaded in date order, so a few pages per block range
+-- are enough to skip most of a partition on a date filter
+CREATE INDEX IF NOT EXISTS brin_bill_id_date ON bill_id USING BRIN (date);
+CREATE INDEX IF NOT EXISTS brin_bill_items_date ON bill_items USING BRIN (bill_date);
+CREATE INDEX IF NOT EXISTS brin_bill_total_date ON bill_total USING BRIN (bill_date);
+
+-- Join paths used by analysis_query.sql
+CREATE INDEX IF NOT EXISTS ix_bill_id_bill ON bill_id (bill_id);
+CREATE INDEX IF NOT EXISTS ix_bill_id_employee_date ON bill_id (employee_id, date);
+CREATE INDEX IF NOT EXISTS ix_bill_items_bill_item ON bill_items (bill_id, item_id);
+CREATE INDEX IF NOT EXISTS ix_bill_items_item ON bill_items (item_id);
+CREATE INDEX IF NOT EXISTS ix_bill_total_bill ON bill_total (bill_id);
+CREATE INDEX IF NOT EXISTS ix_item_category ON item (category_id, item_id);
@@ -59,6 +59,8 @@ CREATE TABLE IF NOT EXISTS item (
 -- ==========================================
 -- 2. TRANSACTION TABLES (Create these SECOND)
 -- ==========================================
+-- Monthly-partitioned variant of these three tables: schema_partitioned.sql
+-- (existing databases: migrate_to_partitioned.sql)
 
 -- Bills ( The Main Ticket)
 CREATE TABLE IF NOT EXISTS bill_id (
@@ -152,3 +154,57 @@ CREATE TABLE IF NOT EXISTS methode_paiement_sales (
 );
 
 
+-- ==========================================
+-- 4. SUMMARY CUBE (Dashboards)
+-- ==========================================
+-- Loaded from cube_items.csv / cube_bills.csv (code/olap_cube.py).
+-- Coarser views are SUMs over these tables; bill counts across
+-- categories must come from cube_bills.
+
+-- Item measures at week x day x volume x employee x category
+CREATE TABLE IF NOT EXISTS cube_items (
+    week_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    volume_category INTEGER NOT NULL,
+    employee_id INTEGER,
+    category_id INTEGER,
+    quantity REAL,
+    lines INTEGER,
+    revenue REAL,
+    bills INTEGER, -- bills holding this category
+    CONSTRAINT fk_cube_items_week FOREIGN KEY (week_id)
+        REFERENCES week (week_id)
+);
+
+-- Bill measures at week x day x volume x employee
+CREATE TABLE IF NOT EXISTS cube_bills (
+    week_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    volume_category INTEGER NOT NULL,
+    employee_id INTEGER,
+    bills INTEGER,
+    quantity REAL,
+    revenue REAL,
+    CONSTRAINT fk_cube_bills_week FOREIGN KEY (week_id)
+        REFERENCES week (week_id)
+);
+
+
+-- ==========================================
+-- 5. BILL LOAD (Rolling Hourly Volume)
+-- ==========================================
+-- Loaded from bill_load.csv (code/rolling_load.py): bills opened
+-- within the hour around each bill, and its load level
+-- (1 slow / 2 medium / 3 high). Join on bill_id and use
+-- load_level wherever a report groups by volume_category.
+-- The CSV has exactly these columns; bills without a date/time
+-- have no load and no row:
+--   \copy bill_load FROM 'bill_load.csv' WITH (FORMAT csv, HEADER true)
+
+CREATE TABLE IF NOT EXISTS bill_load (
+    bill_id INTEGER PRIMARY KEY,
+    window_bills INTEGER NOT NULL,
+    load_level INTEGER NOT NULL,
+    CONSTRAINT fk_bill_load_bill FOREIGN KEY (bill_id)
+        REFERENCES bill_id (bill_id)
+);